@@ -1,23 +1,67 @@
 import argparse
 import sys
+from contextlib import nullcontext
 from functools import singledispatch
 from pathlib import Path
 
 from packaging.tags import interpreter_name
 
-from plox import interpreter, stmt
+from plox import (
+    collector,
+    deadcode,
+    dump,
+    flat_ast,
+    inference,
+    interpreter,
+    ir,
+    jit,
+    memprofile,
+    modules,
+    natives,
+    repl,
+    scopes,
+    snapshot,
+    stackless,
+    stmt,
+    streams,
+)
 from plox.ast_printer import ast_printer
+from plox.budget import Budget, BudgetExceeded, enforce
+from plox.environment import Environment
 from plox.parser import Parser
 from plox.scanner import Scanner, Token, TokenType
+from plox.stats import RunStats
 
 had_error = False
 had_runtime_error = False
 
 
-def run_file(path: Path):
+def run_file(
+    path: Path,
+    engine: str = "tree",
+    stats: RunStats | None = None,
+    optimize=1,
+    verbose=False,
+    budget: Budget | None = None,
+    bulk=True,
+):
+    # Imports in the file are relative to its directory.
+    modules.base_directory = Path(path).resolve().parent
     with open(path) as file:
         content = file.read()
-        run(content)
+        try:
+            run(
+                content,
+                engine=engine,
+                stats=stats,
+                optimize=optimize,
+                verbose=verbose,
+                budget=budget,
+                bulk=bulk,
+            )
+        except BudgetExceeded as error:
+            print(error, file=sys.stderr)
+            sys.exit(70)
         if had_error:
             sys.exit(65)
 
@@ -25,27 +69,139 @@ def run_file(path: Path):
             sys.exit(70)
 
 
-def run_prompt():
-    while True:
+def dump_file(path: Path, format: str, optimize=1, verbose=False):
+    """Write the AST of the program at ``path`` to stdout, after the passes."""
+    with open(path) as file:
+        statements = prepare(file.read(), optimize=optimize, verbose=verbose)
+    if statements is None:
+        sys.exit(65)
+
+    if format == "json":
+        dump.write_json(statements, sys.stdout)
+    else:
+        dump.write_text(statements, sys.stdout)
+
+
+def run_prompt(
+    engine: str = "tree",
+    stats: RunStats | None = None,
+    optimize=1,
+    verbose=False,
+    budget: Budget | None = None,
+    environment: Environment | None = None,
+):
+    repl.Session(
+        engine=engine,
+        stats=stats,
+        optimize=optimize,
+        verbose=verbose,
+        budget=budget,
+        environment=environment,
+    ).run()
+
+
+def run_prelude(
+    path: Path,
+    snapshot_path: Path | None = None,
+    engine: str = "tree",
+    stats: RunStats | None = None,
+    optimize=1,
+    verbose=False,
+    budget: Budget | None = None,
+) -> bool:
+    """Run the prelude at ``path`` in the global environment.
+
+    With ``snapshot_path`` the globals are restored from the snapshot there
+    if it was taken after this prelude. Otherwise the prelude runs and a new
+    snapshot is saved. Returns False if the prelude had errors.
+    """
+    source = Path(path).read_text()
+    if snapshot_path is not None:
         try:
-            line = input("> ")
-        except EOFError:
-            print("Exiting...")
-            break
+            data = Path(snapshot_path).read_bytes()
+            snapshot.restore(data, source, interpreter.environment)
+            return True
+        except (OSError, ValueError) as error:
+            if verbose:
+                print(f"Running the prelude: {error}", file=sys.stderr)
+
+    if stats is None:
+        stats = RunStats()
+    statements = prepare(source, stats=stats, optimize=optimize, keep_globals=True)
+    if statements is None:
+        return False
+    try:
+        execute(statements, engine, stats, optimize, budget)
+    except BudgetExceeded as error:
+        print(error, file=sys.stderr)
+        return False
+    if had_runtime_error:
+        return False
+
+    if snapshot_path is not None:
+        data = snapshot.take(source, interpreter.environment)
+        Path(snapshot_path).write_bytes(data)
+    return True
+
+
+def run(
+    source: str,
+    print_expressions=False,
+    engine: str = "tree",
+    stats: RunStats | None = None,
+    optimize=1,
+    verbose=False,
+    budget: Budget | None = None,
+    bulk=False,
+) -> RunStats:
+    """Run ``source``, raising ``BudgetExceeded`` if it exceeds ``budget``.
+
+    With ``bulk`` the garbage collector is paused while the program is
+    prepared, and the prepared program is frozen out of collections while it
+    runs, see ``plox.collector``.
+    """
+    if stats is None:
+        stats = RunStats()
 
-        run(line, print_expressions=True)
-        had_error = False
+    with collector.paused() if bulk else nullcontext():
+        statements = prepare(source, print_expressions, stats, optimize, verbose)
+    if statements is not None:
+        with collector.frozen(stats) if bulk else nullcontext():
+            execute(statements, engine, stats, optimize, budget)
 
+    return stats
 
-def run(source: str, print_expressions=False):
-    scanner = Scanner(source)
-    tokens = scanner.scan_tokens()
 
-    parser = Parser(tokens)
-    statements = parser.parse()
+def prepare(
+    source: str,
+    print_expressions=False,
+    stats: RunStats | None = None,
+    optimize=1,
+    verbose=False,
+    keep_globals=False,
+) -> list[stmt.Stmt] | None:
+    """Scan, parse and run the analysis passes, or return None on errors.
+
+    ``optimize`` picks the passes: 0 runs none, 1 elides scopes, infers
+    operand types and binds calls to natives, 2 also removes dead code. With
+    ``verbose`` each removal is reported to stderr. Globals are kept with
+    ``keep_globals`` and when printing expressions, since a later program or
+    REPL entry may read them.
+    """
+    if stats is None:
+        stats = RunStats()
+
+    with stats.phase("scan"):
+        scanner = Scanner(source)
+        tokens = scanner.scan_tokens()
+    stats.tokens += len(tokens)
+
+    with stats.phase("parse"):
+        parser = Parser(tokens)
+        statements = parser.parse()
 
     if had_error or statements is None:
-        return
+        return None
 
     if print_expressions:
         statements = [
@@ -53,12 +209,74 @@ def run(source: str, print_expressions=False):
             for s in statements
         ]
 
-    interpreter.interpret(statements)
+    return analyze(
+        statements, stats, optimize, verbose, keep_globals or print_expressions
+    )
+
+
+def analyze(
+    statements: list[stmt.Stmt],
+    stats: RunStats | None = None,
+    optimize=1,
+    verbose=False,
+    keep_globals=False,
+) -> list[stmt.Stmt]:
+    """Run the analysis passes of ``prepare`` on parsed ``statements``."""
+    if stats is None:
+        stats = RunStats()
+    if optimize < 1:
+        stats.count_nodes(statements)
+        return statements
+
+    with stats.phase("passes"):
+        natives.resolve(statements)
+        inference.infer(statements)
+        if optimize >= 2:
+            statements, removals = deadcode.eliminate(
+                statements, keep_globals=keep_globals
+            )
+            if verbose:
+                for removal in removals:
+                    print(removal, file=sys.stderr)
+        scopes.analyze(statements)
+
+    stats.count_nodes(statements)
+    return statements
+
+
+def execute(
+    statements: list[stmt.Stmt],
+    engine: str,
+    stats: RunStats,
+    optimize=1,
+    budget: Budget | None = None,
+):
+    if budget is not None:
+        with enforce(budget, interpreter.statements_executed):
+            execute(statements, engine, stats, optimize)
+        return
+
+    if engine == "ir":
+        with stats.phase("lower"):
+            program = ir.lower(statements)
+            if optimize >= 2:
+                ir.optimize(program)
+
+    with stats.phase("execute"), stats.execution():
+        if engine == "ir":
+            ir.interpret(program)
+        elif engine == "flat":
+            flat_ast.interpret(flat_ast.flatten(statements))
+        elif engine == "stackless":
+            stackless.interpret(statements)
+        else:
+            interpreter.interpret(statements)
 
 
 def runtime_error(error: RuntimeError):
+    global had_runtime_error
     token, message = error.args
-    print(message + "\n[line " + token.line + "]")
+    print(f"{message}\n[line {token.line}]", file=streams.errors())
     had_runtime_error = True
 
 
@@ -76,19 +294,151 @@ def _(token: Token, message: str):
 
 
 def report(line: int, where: str, message: str):
-    print(f"[line {line}] Error {where}: {message}", file=sys.stderr)
+    global had_error
+    had_error = True
+    print(f"[line {line}] Error {where}: {message}", file=streams.errors())
 
 
 def main() -> None:
     parser = argparse.ArgumentParser(description="Process a single file")
     parser.add_argument("file", nargs="?", type=str, help="Path to the input file")
+    parser.add_argument(
+        "--engine",
+        choices=["tree", "stackless", "flat", "ir"],
+        help="Execute the dataclass AST, recursively or with an explicit stack "
+        "for any nesting depth, its flat, array-backed form or the SSA IR "
+        "(default: ir at -O2, tree otherwise)",
+    )
+    parser.add_argument(
+        "-O",
+        dest="optimize",
+        type=int,
+        choices=[0, 1, 2],
+        default=1,
+        help="Optimization level: 0 runs no passes, 1 elides scopes and infers "
+        "types, 2 also removes dead code and optimizes the IR",
+    )
+    parser.add_argument(
+        "--jit",
+        action="store_true",
+        help="Compile hot blocks to specialized Python code (tree engine only)",
+    )
+    parser.add_argument(
+        "-v",
+        "--verbose",
+        action="store_true",
+        help="Report what the optimization passes removed to stderr",
+    )
+    parser.add_argument(
+        "--bulk",
+        action=argparse.BooleanOptionalAction,
+        default=True,
+        help="Pause the garbage collector while the file is scanned and parsed, "
+        "and freeze the parsed program out of collections while it runs",
+    )
+    parser.add_argument(
+        "--stats",
+        choices=["json"],
+        help="Write run statistics as a JSON record to stderr at exit",
+    )
+    parser.add_argument(
+        "--memprofile",
+        action="store_true",
+        help="Report allocation sites and live plox objects per phase to stderr",
+    )
+    parser.add_argument(
+        "--memprofile-interval",
+        type=float,
+        metavar="SECONDS",
+        help="Sample memory this often while the program executes, instead of "
+        "after doubling numbers of statements",
+    )
+    parser.add_argument(
+        "--dump-ast",
+        choices=["text", "json"],
+        help="Write the program's AST after the optimization passes to stdout, "
+        "parenthesized or as JSON lines, instead of running it",
+    )
+    parser.add_argument(
+        "--prelude",
+        metavar="FILE",
+        help="Run FILE first, in the same globals as the program or REPL",
+    )
+    parser.add_argument(
+        "--snapshot",
+        metavar="FILE",
+        help="Restore the prelude's globals from FILE if it was taken after "
+        "the same prelude, and save them there otherwise",
+    )
+    budgets = parser.add_argument_group(
+        "budgets", "Stop a program (or REPL entry) that exceeds any of these"
+    )
+    budgets.add_argument("--max-statements", type=int, metavar="N")
+    budgets.add_argument("--max-seconds", type=float, metavar="SECONDS")
+    budgets.add_argument("--max-depth", type=int, metavar="N")
+    budgets.add_argument("--max-string-length", type=int, metavar="N")
 
     args = parser.parse_args()
+    if args.dump_ast and not args.file:
+        parser.error("--dump-ast needs a file")
+    budget = None
+    limits = (
+        args.max_statements,
+        args.max_seconds,
+        args.max_depth,
+        args.max_string_length,
+    )
+    if any(limit is not None for limit in limits):
+        budget = Budget(*limits)
+    if args.engine is None:
+        args.engine = "ir" if args.optimize >= 2 and not args.jit else "tree"
+    if args.jit:
+        jit.enable()
+    stats = RunStats() if args.stats or args.memprofile else None
+    profiler = None
+    if args.memprofile:
+        profiler = memprofile.MemoryProfiler(interval=args.memprofile_interval)
+        stats.hooks.append(profiler.hook)
 
-    if args.file:
-        run_file(args.file)
-    else:
-        run_prompt()
+    try:
+        if args.dump_ast:
+            dump_file(args.file, args.dump_ast, args.optimize, args.verbose)
+            return
+        if args.prelude and not run_prelude(
+            args.prelude,
+            args.snapshot,
+            engine=args.engine,
+            stats=stats,
+            optimize=args.optimize,
+            verbose=args.verbose,
+            budget=budget,
+        ):
+            sys.exit(65 if had_error else 70)
+        if args.file:
+            run_file(
+                args.file,
+                engine=args.engine,
+                stats=stats,
+                optimize=args.optimize,
+                verbose=args.verbose,
+                budget=budget,
+                bulk=args.bulk,
+            )
+        else:
+            run_prompt(
+                engine=args.engine,
+                stats=stats,
+                optimize=args.optimize,
+                verbose=args.verbose,
+                budget=budget,
+                environment=interpreter.environment if args.prelude else None,
+            )
+    finally:
+        if profiler is not None:
+            profiler.stop()
+            profiler.report()
+        if args.stats:
+            print(stats.to_json(), file=sys.stderr)
 
 
 if __name__ == "__main__":
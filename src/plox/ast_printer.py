@@ -1,34 +1,43 @@
 from abc import ABC, abstractmethod
 from asyncio import Protocol
 from dataclasses import dataclass
-from functools import singledispatch
 
-from plox.expr import Binary, Expr, Grouping, Literal, Unary
+from plox import dump
+from plox.expr import Binary, Expr, Literal
+from plox.flat_ast import FlatAst, Kind
 from plox.scanner import Token, TokenType
-
-
-@singledispatch
-def ast_printer(expr: Binary):
-    return parenthesize(expr.operator.lexeme, expr.left, expr.right)
-
-
-@ast_printer.register
-def _(expr: Grouping):
-    return parenthesize("group", expr.expression)
-
-
-@ast_printer.register
-def _(expr: Literal):
-    return str(expr.value)
-
-
-@ast_printer.register
-def _(expr: Unary):
-    return parenthesize(expr.operator.lexeme, expr.right)
-
-
-def parenthesize(name: str, *exprs: Expr):
-    return f"({name} {' '.join(map(ast_printer, exprs))})"
+from plox.stmt import Stmt
+
+
+def ast_printer(node: Expr | Stmt) -> str:
+    return dump.text(node)
+
+
+def flat_ast_printer(flat: FlatAst, index: int) -> str:
+    first = flat.first[index]
+    match flat.kinds[index]:
+        case Kind.BINARY | Kind.LOGICAL:
+            return flat_parenthesize(
+                flat, flat.token(index).lexeme, first, flat.second[index]
+            )
+        case Kind.CALL:
+            return flat_parenthesize(flat, "call", *flat.statements(index))
+        case Kind.GROUPING:
+            return flat_parenthesize(flat, "group", first)
+        case Kind.LITERAL:
+            return dump.literal_text(flat.constant(index))
+        case Kind.UNARY:
+            return flat_parenthesize(flat, flat.token(index).lexeme, first)
+        case Kind.VARIABLE:
+            return flat.token(index).lexeme
+        case Kind.ASSIGN:
+            return flat_parenthesize(flat, f"= {flat.token(index).lexeme}", first)
+
+    raise TypeError(f"Cannot print {Kind(flat.kinds[index]).name} as an expression.")
+
+
+def flat_parenthesize(flat: FlatAst, name: str, *indices: int):
+    return f"({name} {' '.join(flat_ast_printer(flat, i) for i in indices)})"
 
 
 if __name__ == "__main__":
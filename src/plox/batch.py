@@ -0,0 +1,254 @@
+"""Column-at-a-time evaluation of one expression over many rows.
+
+A ``Formula`` compiles an expression once into a tree of closures, each of
+which evaluates its node for every row at once. Columns of numbers are
+``array('d')`` and arithmetic and comparisons on them are a single ``map``
+over an ``operator`` function, so the per-row cost is a C loop instead of a
+tree walk. Any other operands fall back to the interpreter's own operations
+row by row, which keeps Lox semantics per element, and a runtime error is
+reported as a ``RowError`` naming the row it happened on.
+
+``and``/``or`` only evaluate their right operand for the rows that need it,
+as the interpreter would. Inputs may be any sequence; integer arrays are
+read as doubles, and so are numbers from literals and globals, which keeps
+the columns ``array('d')`` where the interpreter would hold ints (see
+``plox.numbers``). A formula cannot assign variables.
+"""
+
+import operator
+from array import array
+from collections.abc import Callable, Sequence
+from functools import partial, singledispatch
+from itertools import repeat
+
+from plox import expr, interpreter, numbers, symbols
+from plox.scanner import Token, TokenType
+
+Column = array | list
+
+_ARITHMETIC = {
+    TokenType.PLUS: operator.add,
+    TokenType.MINUS: operator.sub,
+    TokenType.STAR: operator.mul,
+    TokenType.SLASH: operator.truediv,
+}
+
+_COMPARISONS = {
+    TokenType.GREATER: operator.gt,
+    TokenType.GREATER_EQUAL: operator.ge,
+    TokenType.LESS: operator.lt,
+    TokenType.LESS_EQUAL: operator.le,
+    TokenType.EQUAL_EQUAL: operator.eq,
+    TokenType.BANG_EQUAL: operator.ne,
+}
+
+
+class RowError(RuntimeError):
+    """A runtime error on one row, reported like any other runtime error."""
+
+    def __init__(self, token: Token, message: str, row: int):
+        super().__init__(token, f"{message} (row {row})")
+        self.row = row
+
+
+class _Constant:
+    """The same value on every row."""
+
+    __slots__ = ("value",)
+
+    def __init__(self, value: object):
+        self.value = float(value) if numbers.is_number(value) else value
+
+
+class _Batch:
+    def __init__(self, columns: dict[int, Column], size: int, rows: Sequence[int]):
+        self.columns = columns
+        self.size = size
+        self.rows = rows  # the row number of each position, for errors
+
+    def select(self, positions: list[int]) -> "_Batch":
+        columns = {
+            symbol: _column([column[position] for position in positions])
+            for symbol, column in self.columns.items()
+        }
+        rows = [self.rows[position] for position in positions]
+        return _Batch(columns, len(positions), rows)
+
+
+_Compiled = Callable[[_Batch], Column | _Constant]
+
+
+class Formula:
+    def __init__(self, expression: expr.Expr):
+        self.expression = expression
+        self._run = _compile(expression)
+
+    def evaluate(self, columns: dict[str, Sequence], size: int | None = None) -> Column:
+        """Evaluate the formula for every row of ``columns``.
+
+        Variables read the column of the same name, or the global when there
+        is none. ``size`` gives the number of rows when no column does.
+        """
+        inputs = {
+            symbols.intern(name): _column(values) for name, values in columns.items()
+        }
+        sizes = {len(values) for values in inputs.values()}
+        if size is not None:
+            sizes.add(size)
+        if not sizes:
+            raise ValueError("A size or at least one column is required.")
+        if len(sizes) != 1:
+            raise ValueError("Columns must have the same length.")
+        [size] = sizes
+
+        result = self._run(_Batch(inputs, size, range(size)))
+        if isinstance(result, _Constant):
+            return _column(list(repeat(result.value, size)))
+        return result
+
+
+def evaluate_batch(
+    expression: expr.Expr, columns: dict[str, Sequence], size: int | None = None
+) -> Column:
+    return Formula(expression).evaluate(columns, size)
+
+
+def _column(values: Sequence) -> Column:
+    if isinstance(values, array):
+        return values if values.typecode == "d" else array("d", values)
+    values = list(values)
+    if all(numbers.is_number(value) for value in values):
+        return array("d", values)
+    return values
+
+
+def _values(column: Column | _Constant, size: int):
+    if isinstance(column, _Constant):
+        return repeat(column.value, size)
+    return column
+
+
+def _is_numeric(column: Column | _Constant) -> bool:
+    if isinstance(column, _Constant):
+        return column.value.__class__ is float
+    return isinstance(column, array)
+
+
+def _per_row(
+    batch: _Batch, token: Token, function: Callable, *columns: Column | _Constant
+) -> Column:
+    results = array("d") if function in _ARITHMETIC.values() else []
+    try:
+        # Both ``list.extend`` and ``array.extend`` append as they consume
+        # the iterator, so on an error ``results`` ends at the failing row.
+        results.extend(map(function, *(_values(c, batch.size) for c in columns)))
+    except RuntimeError as error:
+        raise RowError(*error.args, batch.rows[len(results)]) from None
+    except ZeroDivisionError:
+        raise RowError(token, "Division by zero.", batch.rows[len(results)]) from None
+    return results if isinstance(results, array) else _column(results)
+
+
+@singledispatch
+def _compile(node: expr.Expr) -> _Compiled:
+    raise ValueError(f"Cannot evaluate {type(node).__name__} expressions in a batch.")
+
+
+@_compile.register
+def _(literal: expr.Literal):
+    constant = _Constant(literal.value)
+    return lambda batch: constant
+
+
+@_compile.register
+def _(grouping: expr.Grouping):
+    return _compile(grouping.expression)
+
+
+@_compile.register
+def _(variable: expr.Variable):
+    name = variable.name
+    symbol = name.symbol
+
+    def run(batch: _Batch):
+        column = batch.columns.get(symbol)
+        if column is None:
+            return _Constant(interpreter.environment.get(name))
+        return column
+
+    return run
+
+
+@_compile.register
+def _(binary: expr.Binary):
+    left, right = _compile(binary.left), _compile(binary.right)
+    token = binary.operator
+    numeric = _ARITHMETIC.get(token.type) or _COMPARISONS.get(token.type)
+    operation = partial(interpreter.binary_operation, token)
+    if token.type in (TokenType.EQUAL_EQUAL, TokenType.BANG_EQUAL):
+        operation = numeric  # defined for any operands
+
+    def run(batch: _Batch):
+        left_column, right_column = left(batch), right(batch)
+        if _is_numeric(left_column) and _is_numeric(right_column):
+            return _per_row(batch, token, numeric, left_column, right_column)
+        return _per_row(batch, token, operation, left_column, right_column)
+
+    return run
+
+
+@_compile.register
+def _(unary: expr.Unary):
+    right = _compile(unary.right)
+    token = unary.operator
+    operation = partial(interpreter.unary_operation, token)
+
+    def run(batch: _Batch):
+        column = right(batch)
+        if token.type is TokenType.MINUS and _is_numeric(column):
+            return array("d", map(operator.neg, _values(column, batch.size)))
+        return _per_row(batch, token, operation, column)
+
+    return run
+
+
+@_compile.register
+def _(logical: expr.Logical):
+    left, right = _compile(logical.left), _compile(logical.right)
+    is_or = logical.operator.type is TokenType.OR
+
+    def needs_right(value: object) -> bool:
+        """Whether the right operand decides the result, given the left one."""
+        return (value is None or value is False) is is_or
+
+    def run(batch: _Batch):
+        left_column = left(batch)
+        if isinstance(left_column, _Constant):
+            return right(batch) if needs_right(left_column.value) else left_column
+
+        positions = [i for i, value in enumerate(left_column) if needs_right(value)]
+        if len(positions) == batch.size:
+            return right(batch)
+        if not positions:
+            return left_column
+
+        results = list(left_column)
+        right_column = _values(right(batch.select(positions)), len(positions))
+        for position, value in zip(positions, right_column):
+            results[position] = value
+        return _column(results)
+
+    return run
+
+
+@_compile.register
+def _(call: expr.Call):
+    callee = _compile(call.callee)
+    arguments = [_compile(argument) for argument in call.arguments]
+    operation = partial(interpreter.call_value, call.paren)
+
+    def run(batch: _Batch):
+        columns = [callee(batch), *(argument(batch) for argument in arguments)]
+        return _per_row(batch, call.paren, operation, *columns)
+
+    return run
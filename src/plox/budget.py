@@ -0,0 +1,161 @@
+"""Execution budgets and cooperative yielding.
+
+``enforce`` puts a ``Budget`` in force while a program runs. The engines pay
+one comparison per statement for it: they compare the running statement
+count with ``next_check`` and only call ``checkpoint`` once it is reached,
+at most every ``Budget.interval`` statements. The checkpoint enforces the
+statement and time budgets and calls the ``on_yield`` hook. The IR
+interpreter and compiled JIT traces count statements in locals and compare
+at the jumps back to a loop head instead, which only lets straight-line code
+run past a check.
+
+Environment depth and string length are checked where environments are
+created and strings concatenated, against ``depth_limit`` and
+``string_length_limit``, since neither is bounded by the statement count.
+
+Time is measured while the program runs; ``pause`` lets a host exclude time
+spent waiting, for example for its turn in ``plox.scheduler``.
+
+``watch`` has the checkpoints also call a watcher at statement counts of its
+choosing, budget or not. ``plox.memprofile`` samples memory from there, on the
+thread that runs the program, while nothing is halfway through a statement.
+"""
+
+import math
+import sys
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+next_check = sys.maxsize  # statement count at which to call ``checkpoint``
+depth_limit = sys.maxsize
+string_length_limit = sys.maxsize
+
+_watcher: Callable[[int], int] | None = None
+_watch_at = sys.maxsize  # statement count at which to call ``_watcher``
+
+
+class BudgetExceeded(Exception):
+    pass
+
+
+@dataclass
+class Budget:
+    statements: int | None = None
+    seconds: float | None = None
+    depth: int | None = None
+    string_length: int | None = None
+    interval: int = 1000  # statements between checkpoints
+    on_yield: Callable[[], None] | None = None
+
+
+@dataclass
+class _Enforcement:
+    budget: Budget
+    last_statement: float = math.inf  # the count past which to stop
+    deadline: float = math.inf
+    next_check: int = sys.maxsize  # as ``next_check`` without a watcher
+
+
+_active: _Enforcement | None = None
+
+
+@contextmanager
+def enforce(budget: Budget, executed: int) -> Iterator[None]:
+    """Enforce ``budget`` inside the ``with`` block.
+
+    ``executed`` is the statement count the budget's statements start from.
+    """
+    global _active, next_check, depth_limit, string_length_limit
+    previous = save()
+    _active = enforcement = _Enforcement(budget)
+    if budget.statements is not None:
+        enforcement.last_statement = executed + budget.statements
+    if budget.seconds is not None:
+        enforcement.deadline = time.perf_counter() + budget.seconds
+    enforcement.next_check = _next_check(executed)
+    next_check = min(enforcement.next_check, _watch_at)
+    depth_limit = sys.maxsize if budget.depth is None else budget.depth
+    if budget.string_length is not None:
+        string_length_limit = budget.string_length
+    else:
+        string_length_limit = sys.maxsize
+    try:
+        yield
+    finally:
+        restore(previous)
+
+
+def checkpoint(executed: int):
+    """Enforce the budget in force, ``executed`` statements into the run."""
+    global next_check, _watch_at
+    if executed >= _watch_at:
+        _watch_at = _watcher(executed)
+
+    enforcement = _active
+    if enforcement is None:
+        next_check = _watch_at
+        return
+
+    if executed >= enforcement.next_check:
+        budget = enforcement.budget
+        if executed > enforcement.last_statement:
+            raise BudgetExceeded(
+                f"Exceeded the budget of {budget.statements} statements."
+            )
+        if time.perf_counter() > enforcement.deadline:
+            raise BudgetExceeded(f"Exceeded the budget of {budget.seconds:g} seconds.")
+        if budget.on_yield is not None:
+            budget.on_yield()
+        enforcement.next_check = _next_check(executed)
+
+    next_check = min(enforcement.next_check, _watch_at)
+
+
+def _next_check(executed: int) -> int:
+    last_statement = _active.last_statement
+    return int(min(executed + _active.budget.interval, last_statement + 1))
+
+
+@contextmanager
+def watch(watcher: Callable[[int], int], first: int) -> Iterator[None]:
+    """Call ``watcher`` from the checkpoints inside the ``with`` block.
+
+    It is first called once ``first`` statements have run, with the count,
+    and returns the count at which to call it next.
+    """
+    global _watcher, _watch_at, next_check
+    previous = _watcher, _watch_at
+    _watcher, _watch_at = watcher, first
+    next_check = min(next_check, first)
+    try:
+        yield
+    finally:
+        # A next_check left early only costs a checkpoint that sets it again.
+        _watcher, _watch_at = previous
+
+
+@contextmanager
+def pause() -> Iterator[None]:
+    """Stop the clock of the budget in force while the block runs."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if _active is not None:
+            _active.deadline += time.perf_counter() - start
+
+
+UNLIMITED = (None, sys.maxsize, sys.maxsize, sys.maxsize)  # as saved by ``save``
+
+
+def save() -> tuple:
+    """The budget state, for ``restore`` after running something else."""
+    return _active, next_check, depth_limit, string_length_limit
+
+
+def restore(state: tuple):
+    global _active, next_check, depth_limit, string_length_limit
+    _active, next_check, depth_limit, string_length_limit = state
+    next_check = min(next_check, _watch_at)
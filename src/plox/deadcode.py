@@ -0,0 +1,382 @@
+"""Dead-store and unreachable-code elimination.
+
+A forward pass resolves every variable reference to the declaration it binds
+to and records, per statement, which bindings it reads and stores. A backward
+liveness pass then drops:
+
+- expression statements whose expression is pure and cannot raise,
+- stores to bindings that are not read before the next store,
+- declarations whose binding is never referenced afterwards,
+- blocks left without statements,
+- branches and loops whose condition is a literal that never takes them.
+
+Anything that could raise or has a side effect survives: a dead store or an
+unused declaration whose value could raise is turned into an expression
+statement that still evaluates it. Variables are only known to be defined,
+and therefore safe to read, when their declaration is part of the program.
+Inside a loop every variable the loop reads is treated as live, since the
+next iteration may read it.
+
+Like those of ``plox.inference``, the rules that nest are generators run by
+``visit.trampoline``, so deeply nested programs do not hit the recursion limit.
+"""
+
+from collections.abc import Generator
+from dataclasses import dataclass, field
+from functools import singledispatch
+
+from plox import expr, stmt, visit
+from plox.scanner import Token, TokenType
+
+
+@dataclass
+class Removal:
+    line: int | None
+    description: str
+
+    def __str__(self):
+        where = "" if self.line is None else f"[line {self.line}] "
+        return f"{where}{self.description}"
+
+
+@dataclass
+class _Effects:
+    reads: set[int] = field(default_factory=set)
+    stores: set[int] = field(default_factory=set)
+    safe: bool = True
+
+
+@dataclass
+class _Info:
+    effects: _Effects
+    binding: int | None = None  # declared by a Var or stored by `x = ...;`
+    value: _Effects | None = None  # effects of the stored value alone
+    loop_reads: set[int] = field(default_factory=set)  # for While
+
+
+class _Analysis:
+    def __init__(self, keep_globals: bool):
+        self.keep_globals = keep_globals
+        self.scopes: list[dict[int, int]] = [{}]
+        self.bindings = 0
+        self.global_bindings: set[int] = set()
+        self.info: dict[int, _Info] = {}
+        self.loops: list[set[int]] = []  # reads of each loop being resolved
+        self.live: set[int] = set()
+        self.referenced: set[int] = set()
+        self.removals: list[Removal] = []
+
+    def resolve(self, name: Token) -> int | None:
+        for scope in reversed(self.scopes):
+            if name.symbol in scope:
+                return scope[name.symbol]
+        return None
+
+    def declare(self, name: Token) -> int:
+        binding = self.bindings
+        self.bindings += 1
+        self.scopes[-1][name.symbol] = binding
+        if len(self.scopes) == 1:
+            self.global_bindings.add(binding)
+        return binding
+
+    def removable(self, binding: int | None) -> bool:
+        if binding is None:
+            return False
+        return not (self.keep_globals and binding in self.global_bindings)
+
+    def use(self, effects: _Effects):
+        self.live |= effects.reads
+        self.referenced |= effects.reads | effects.stores
+
+    def remove(self, token: Token | None, description: str):
+        self.removals.append(Removal(token and token.line, description))
+
+
+def eliminate(
+    statements: list[stmt.Stmt], keep_globals: bool = False
+) -> tuple[list[stmt.Stmt], list[Removal]]:
+    """Return the statements without dead code, and what was removed.
+
+    With ``keep_globals`` top-level variables are assumed to be read later
+    (for example by the next REPL entry) and their declarations and stores
+    are kept.
+    """
+    analysis = _Analysis(keep_globals)
+    for statement in statements:
+        visit.trampoline(_forward(statement, analysis))
+
+    kept = visit.trampoline(_backward(statements, analysis))
+    analysis.removals.reverse()
+    return kept, analysis.removals
+
+
+def _effects(expression: expr.Expr, analysis: _Analysis) -> _Effects:
+    effects = _Effects(safe=visit.trampoline(_is_safe(expression, analysis)))
+    for node in visit.walk([expression]):
+        if isinstance(node, expr.Variable):
+            binding = analysis.resolve(node.name)
+            if binding is not None:
+                effects.reads.add(binding)
+        elif isinstance(node, expr.Assign):
+            binding = analysis.resolve(node.name)
+            if binding is not None:
+                effects.stores.add(binding)
+    for loop_reads in analysis.loops:
+        loop_reads |= effects.reads
+    return effects
+
+
+@singledispatch
+def _is_safe(node: expr.Expr, analysis: _Analysis) -> bool:
+    return False
+
+
+@_is_safe.register
+def _(literal: expr.Literal, analysis: _Analysis):
+    return True
+
+
+@_is_safe.register
+def _(grouping: expr.Grouping, analysis: _Analysis):
+    return (yield _is_safe(grouping.expression, analysis))
+
+
+@_is_safe.register
+def _(variable: expr.Variable, analysis: _Analysis):
+    return analysis.resolve(variable.name) is not None
+
+
+@_is_safe.register
+def _(logical: expr.Logical, analysis: _Analysis):
+    return (yield _is_safe(logical.left, analysis)) and (
+        yield _is_safe(logical.right, analysis)
+    )
+
+
+@_is_safe.register
+def _(unary: expr.Unary, analysis: _Analysis):
+    if unary.operator.type is TokenType.MINUS and unary.operand_type is None:
+        return False
+    return (yield _is_safe(unary.right, analysis))
+
+
+@_is_safe.register
+def _(binary: expr.Binary, analysis: _Analysis):
+    operator = binary.operator.type
+    if operator not in (TokenType.EQUAL_EQUAL, TokenType.BANG_EQUAL):
+        if binary.operand_type is None:
+            return False
+        if operator is TokenType.SLASH and not _nonzero_literal(binary.right):
+            return False
+    return (yield _is_safe(binary.left, analysis)) and (
+        yield _is_safe(binary.right, analysis)
+    )
+
+
+def _literal(node: expr.Expr) -> expr.Literal | None:
+    while isinstance(node, expr.Grouping):
+        node = node.expression
+    return node if isinstance(node, expr.Literal) else None
+
+
+def _nonzero_literal(node: expr.Expr) -> bool:
+    literal = _literal(node)
+    return literal is not None and literal.value not in (0, None, False)
+
+
+@singledispatch
+def _forward(statement: object, analysis: _Analysis):
+    pass
+
+
+@_forward.register
+def _(expression: stmt.Expression, analysis: _Analysis):
+    info = _Info(_effects(expression.expression, analysis))
+    if isinstance(expression.expression, expr.Assign):
+        info.binding = analysis.resolve(expression.expression.name)
+        info.value = _effects(expression.expression.value, analysis)
+    analysis.info[id(expression)] = info
+
+
+@_forward.register
+def _(print_: stmt.Print, analysis: _Analysis):
+    analysis.info[id(print_)] = _Info(_effects(print_.expression, analysis))
+
+
+@_forward.register
+def _(var: stmt.Var, analysis: _Analysis):
+    effects = _Effects()
+    if var.initializer:
+        effects = _effects(var.initializer, analysis)
+    analysis.info[id(var)] = _Info(effects, analysis.declare(var.name), effects)
+
+
+@_forward.register
+def _(block: stmt.Block, analysis: _Analysis):
+    analysis.scopes.append({})
+    for statement in block.statements:
+        yield _forward(statement, analysis)
+    analysis.scopes.pop()
+
+
+@_forward.register
+def _(if_: stmt.If, analysis: _Analysis):
+    analysis.info[id(if_)] = _Info(_effects(if_.condition, analysis))
+    yield _forward(if_.then_branch, analysis)
+    if if_.else_branch is not None:
+        yield _forward(if_.else_branch, analysis)
+
+
+@_forward.register
+def _(while_: stmt.While, analysis: _Analysis):
+    analysis.loops.append(set())
+    info = _Info(_effects(while_.condition, analysis))
+    yield _forward(while_.body, analysis)
+    info.loop_reads = analysis.loops.pop()
+    analysis.info[id(while_)] = info
+
+
+def _backward(statements: list[stmt.Stmt], analysis: _Analysis) -> Generator:
+    kept = []
+    for statement in reversed(statements):
+        statement = yield _eliminate(statement, analysis)
+        if statement is not None:
+            kept.append(statement)
+    kept.reverse()
+    return kept
+
+
+@singledispatch
+def _eliminate(statement: object, analysis: _Analysis):
+    # Statements this pass does not understand are kept, and everything they
+    # might reference stays live.
+    everything = set(range(analysis.bindings))
+    analysis.live |= everything
+    analysis.referenced |= everything
+    return statement
+
+
+@_eliminate.register
+def _(print_: stmt.Print, analysis: _Analysis):
+    analysis.use(analysis.info[id(print_)].effects)
+    return print_
+
+
+@_eliminate.register
+def _(expression: stmt.Expression, analysis: _Analysis):
+    info = analysis.info[id(expression)]
+    effects = info.effects
+
+    if (
+        info.binding is not None
+        and info.binding not in analysis.live
+        and analysis.removable(info.binding)
+    ):
+        assign = expression.expression
+        analysis.remove(assign.name, f"removed dead store to '{assign.name.lexeme}'")
+        expression = stmt.Expression(assign.value)
+        effects = info.value
+        info = _Info(effects)
+        analysis.info[id(expression)] = info
+
+    if effects.safe:
+        analysis.remove(_first_token(expression), "removed unused expression")
+        return None
+
+    if info.binding is not None:
+        analysis.live.discard(info.binding)
+    analysis.use(effects)
+    return expression
+
+
+@_eliminate.register
+def _(var: stmt.Var, analysis: _Analysis):
+    info = analysis.info[id(var)]
+
+    if info.binding not in analysis.referenced and analysis.removable(info.binding):
+        analysis.remove(var.name, f"removed unused variable '{var.name.lexeme}'")
+        if var.initializer is None or info.effects.safe:
+            return None
+        analysis.use(info.effects)
+        return stmt.Expression(var.initializer)
+
+    if (
+        var.initializer is not None
+        and info.binding not in analysis.live
+        and analysis.removable(info.binding)
+        and info.effects.safe
+    ):
+        analysis.remove(var.name, f"removed dead initializer of '{var.name.lexeme}'")
+        var.initializer = None
+        info.effects = _Effects()
+
+    analysis.live.discard(info.binding)
+    analysis.use(info.effects)
+    return var
+
+
+@_eliminate.register
+def _(block: stmt.Block, analysis: _Analysis):
+    block.statements = yield _backward(block.statements, analysis)
+    if not block.statements:
+        analysis.removals.append(Removal(None, "removed empty block"))
+        return None
+    return block
+
+
+def _first_token(node: expr.Expr | stmt.Stmt) -> Token | None:
+    for child in visit.walk([node]):
+        for value in vars(child).values():
+            if isinstance(value, Token):
+                return value
+    return None
+
+
+@_eliminate.register
+def _(if_: stmt.If, analysis: _Analysis):
+    info = analysis.info[id(if_)]
+    literal = _literal(if_.condition)
+    if literal is not None:
+        taken = if_.else_branch
+        if literal.value is not None and literal.value is not False:
+            taken = if_.then_branch
+        analysis.removals.append(Removal(None, "removed unreachable branch"))
+        return None if taken is None else (yield _eliminate(taken, analysis))
+
+    live_after = set(analysis.live)
+    then_branch = yield _eliminate(if_.then_branch, analysis)
+    live_then, analysis.live = analysis.live, live_after
+    else_branch = None
+    if if_.else_branch is not None:
+        else_branch = yield _eliminate(if_.else_branch, analysis)
+    analysis.live |= live_then
+
+    if then_branch is None and else_branch is None:
+        if info.effects.safe:
+            return None
+        analysis.use(info.effects)
+        return stmt.Expression(if_.condition)
+
+    analysis.use(info.effects)
+    if_.then_branch = then_branch or stmt.Block([], needs_scope=False)
+    if_.else_branch = else_branch
+    return if_
+
+
+@_eliminate.register
+def _(while_: stmt.While, analysis: _Analysis):
+    info = analysis.info[id(while_)]
+    literal = _literal(while_.condition)
+    if literal is not None and (literal.value is None or literal.value is False):
+        analysis.removals.append(Removal(None, "removed unreachable loop"))
+        return None
+
+    # The body may run no times, so what is live after the loop stays live.
+    live_after = analysis.live | info.loop_reads
+    analysis.live |= info.loop_reads
+    body = yield _eliminate(while_.body, analysis)
+    analysis.live |= live_after
+    analysis.use(info.effects)
+    while_.body = body or stmt.Block([], needs_scope=False)
+    return while_
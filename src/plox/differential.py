@@ -0,0 +1,555 @@
+"""Differential conformance and performance harness.
+
+``generate`` derives random, well-formed programs from the grammar of
+``Parser``: variable declarations, every statement form including ``for``,
+and expressions at every precedence level, with calls to the vector natives.
+Each variable holds values of one type, so most programs run to the end, but
+now and then an operand of another type or a division by zero makes one stop
+with a runtime error, which is compared like any other output. Loops only
+count a fresh counter up to a small bound, so every program terminates.
+
+``check`` runs a program through every path in ``PATHS``: the plain,
+incremental and hash-consing front ends and a JSON dump round trip under the
+tree interpreter, and every engine and optimization level, with and without
+the JIT, on the plain front end. A path's outcome is its stdout, its stderr
+with the error messages and their lines, and its exit code, 65 for compile
+errors and 70 for runtime errors as in ``plox.main``.
+The program fails when the outcomes differ or a path raises, and
+``minimize`` then shrinks it, dropping statements and replacing expressions
+by their operands or literals for as long as it keeps failing.
+
+``python -m plox.differential`` checks a batch of programs, prints a
+reproducer for each failure and a table of the time each path took.
+"""
+
+import argparse
+import io
+import random
+import sys
+import time
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass, field
+
+import plox
+from plox import dump, interpreter, jit, natives, stmt, streams
+from plox.budget import Budget, BudgetExceeded
+from plox.environment import Environment
+from plox.hashcons import NodeTable
+from plox.incremental import Document, Edit
+from plox.parser import Parser
+from plox.scanner import Scanner
+from plox.stats import RunStats
+
+# Generous, and only there so that a runaway program is skipped, not awaited.
+STATEMENT_BUDGET = 100_000
+
+# Variables of each type; loop counters are numbers too.
+_NAMES = {"number": ("a", "b"), "string": ("s",), "bool": ("p",), "vector": ("v",)}
+_TYPES = tuple(_NAMES)
+_NUMBERS = ("0", "1", "2", "3", "0.5", "10", "1.25", "9007199254740992")
+_STRINGS = ('""', '"a"', '"lox"')
+_WILD = 0.01  # chance of an operand of another type, for the error paths
+
+# Precedence levels of the grammar, for deciding where groupings are needed.
+ASSIGNMENT, OR, AND, EQUALITY, COMPARISON, TERM, FACTOR, UNARY, CALL = range(9)
+
+
+# Generation
+
+
+@dataclass(eq=False)
+class Fragment:
+    """A piece of generated source, made of text and nested fragments.
+
+    Statement fragments can be removed and expression fragments replaced by
+    one of their operands when minimizing.
+    """
+
+    parts: list["str | Fragment"]
+    expression: bool = False
+    precedence: int = CALL  # of an expression, by the levels above
+
+    def __str__(self):
+        return "".join(map(str, self.parts))
+
+    def fragments(self) -> Iterator["Fragment"]:
+        """This fragment and the ones nested in it, outermost first."""
+        stack = [self]
+        while stack:
+            fragment = stack.pop()
+            yield fragment
+            children = [part for part in fragment.parts if isinstance(part, Fragment)]
+            stack.extend(reversed(children))
+
+
+def _expression(precedence: int, *parts: "str | Fragment") -> Fragment:
+    return Fragment(list(parts), expression=True, precedence=precedence)
+
+
+class _Generator:
+    """Mostly well-typed programs, so that they get past their first lines."""
+
+    def __init__(self, rng: random.Random, size: int):
+        self.rng = rng
+        self.remaining = size  # nodes left to generate before only leaves
+        self.counters: list[str] = []  # loop counters in scope
+        self.loops = 0
+        self.declared: set[str] = set()
+        # Vectors all have one length, so their operations do not fail.
+        self.length = rng.randint(1, 3)
+
+    def chance(self, probability: float) -> bool:
+        if self.remaining > 0 and self.rng.random() < probability:
+            self.remaining -= 1
+            return True
+        return False
+
+    def program(self) -> Fragment:
+        declarations = []
+        for type_, names in _NAMES.items():
+            for name in names:
+                declarations.append(self.variable(name, type_))
+                self.declared.add(name)
+        while self.remaining > 0:
+            declarations.append(self.declaration(depth=0))
+        return Fragment(declarations)
+
+    def variable(self, name: str, type_: str) -> Fragment:
+        if type_ != "number" and self.rng.random() < 0.05:
+            return Fragment([f"var {name};\n"])
+        return Fragment([f"var {name} = ", self.typed(type_), ";\n"])
+
+    def declaration(self, depth: int) -> Fragment:
+        self.remaining -= 1
+        if depth > 0 and self.rng.random() < 0.25:
+            type_ = self.rng.choice(_TYPES)
+            return self.variable(self.rng.choice(_NAMES[type_]), type_)
+        return self.statement(depth)
+
+    def statement(self, depth: int) -> Fragment:
+        self.remaining -= 1
+        kinds = ["print", "print", "expression"]
+        if depth < 3:
+            kinds += ["block", "if", "for", "while"]
+        match self.rng.choice(kinds):
+            case "print":
+                return Fragment(["print ", self.any(ASSIGNMENT), ";\n"])
+            case "expression":
+                return Fragment([self.assignment(self.rng.choice(_TYPES)), ";\n"])
+            case "block":
+                count = self.rng.randint(0, 3)
+                declarations = [self.declaration(depth + 1) for _ in range(count)]
+                return Fragment(["{\n", *declarations, "}\n"])
+            case "if":
+                condition = self.any(ASSIGNMENT)
+                parts = ["if (", condition, ") ", self.statement(depth + 1)]
+                if self.rng.random() < 0.5:
+                    parts += ["else ", self.statement(depth + 1)]
+                return Fragment(parts)
+            case "for":
+                counter, bound = self.counter()
+                head = f"for (var {counter} = 0; {counter} < {bound}; "
+                body = self.loop_body(counter, depth)
+                return Fragment([head, f"{counter} = {counter} + 1) ", body])
+            case "while":
+                # A block declaring the counter, then a loop that increments it.
+                counter, bound = self.counter()
+                body = self.loop_body(counter, depth)
+                return Fragment(
+                    [
+                        f"{{\nvar {counter} = 0;\nwhile ({counter} < {bound}) {{\n",
+                        body,
+                        f"{counter} = {counter} + 1;\n}}\n}}\n",
+                    ]
+                )
+
+    def counter(self) -> tuple[str, int]:
+        self.loops += 1
+        return f"i{self.loops}", self.rng.randint(0, 3)
+
+    def loop_body(self, counter: str, depth: int) -> Fragment:
+        self.counters.append(counter)
+        try:
+            return self.statement(depth + 1)
+        finally:
+            self.counters.pop()
+
+    # Expressions
+
+    def any(self, precedence: int) -> Fragment:
+        return self.typed(self.rng.choice(_TYPES), precedence)
+
+    def typed(self, type_: str, precedence: int = ASSIGNMENT) -> Fragment:
+        """An expression of ``type_`` that binds at least at ``precedence``."""
+        if self.rng.random() < _WILD:
+            type_ = self.rng.choice(_TYPES)
+        if self.chance(0.05):
+            expression = self.assignment(type_)
+        elif self.chance(0.4):
+            expression = getattr(self, type_)()
+        else:
+            expression = self.leaf(type_)
+        if expression.precedence < precedence:
+            return _expression(CALL, "(", expression, ")")
+        return expression
+
+    def assignment(self, type_: str) -> Fragment:
+        names = [name for name in _NAMES[type_] if name in self.declared]
+        if not names:
+            return self.leaf(type_)
+        return _expression(
+            ASSIGNMENT, f"{self.rng.choice(names)} = ", self.typed(type_)
+        )
+
+    def leaf(self, type_: str) -> Fragment:
+        names = [name for name in _NAMES[type_] if name in self.declared]
+        if type_ == "number":
+            names += self.counters
+        if names and self.rng.random() < 0.5:
+            return _expression(CALL, self.rng.choice(names))
+        match type_:
+            case "number":
+                text = self.rng.choice(_NUMBERS)
+            case "string":
+                text = self.rng.choice(_STRINGS)
+            case "bool":
+                text = self.rng.choice(("true", "false", "nil"))
+            case "vector":
+                return self.call("vector", self.size(), self.leaf("number"))
+        return _expression(CALL, text)
+
+    def size(self) -> Fragment:
+        return _expression(CALL, str(self.length))
+
+    def index(self) -> Fragment:
+        return _expression(CALL, str(self.rng.randrange(self.length)))
+
+    def binary(self, level: int, left: str, operator: str, right: str) -> Fragment:
+        # Left associative: only the right operand needs a higher level.
+        left = self.typed(left, level)
+        return _expression(level, left, operator, self.typed(right, level + 1))
+
+    def call(self, name: str, *arguments: Fragment) -> Fragment:
+        parts = [f"{name}("]
+        for i, argument in enumerate(arguments):
+            parts += [", "] * (i > 0) + [argument]
+        return _expression(CALL, *parts, ")")
+
+    def number(self) -> Fragment:
+        match self.rng.randrange(5):
+            case 0:
+                operator = self.rng.choice((" * ", " / "))
+                return self.binary(FACTOR, "number", operator, "number")
+            case 1:
+                operator = self.rng.choice((" + ", " - "))
+                return self.binary(TERM, "number", operator, "number")
+            case 2:
+                return _expression(UNARY, "-", self.typed("number", UNARY))
+            case 3:
+                name = self.rng.choice(("size", "sum", "min", "max"))
+                return self.call(name, self.typed("vector"))
+            case 4:
+                if self.rng.random() < 0.5:
+                    vectors = self.typed("vector"), self.typed("vector")
+                    return self.call("dot", *vectors)
+                return self.call("at", self.typed("vector"), self.index())
+
+    def string(self) -> Fragment:
+        return self.binary(TERM, "string", " + ", "string")
+
+    def bool(self) -> Fragment:
+        match self.rng.randrange(5):
+            case 0:
+                return _expression(UNARY, "!", self.any(UNARY))
+            case 1:
+                operator = self.rng.choice((" > ", " >= ", " < ", " <= "))
+                return self.binary(COMPARISON, "number", operator, "number")
+            case 2:
+                type_ = self.rng.choice(_TYPES)
+                operator = self.rng.choice((" == ", " != "))
+                return self.binary(EQUALITY, type_, operator, type_)
+            case 3:
+                return self.binary(AND, "bool", " and ", "bool")
+            case 4:
+                return self.binary(OR, "bool", " or ", "bool")
+
+    def vector(self) -> Fragment:
+        match self.rng.randrange(4):
+            case 0:
+                return self.call("vector", self.size(), self.typed("number"))
+            case 1:
+                start = _expression(CALL, "0")
+                return self.call("slice", self.typed("vector"), start, self.size())
+            case 2:
+                return _expression(UNARY, "-", self.typed("vector", UNARY))
+            case 3:
+                operator = self.rng.choice((" + ", " - ", " * ", " / "))
+                level = TERM if operator in (" + ", " - ") else FACTOR
+                right = self.rng.choice(("number", "vector"))
+                return self.binary(level, "vector", operator, right)
+
+
+def generate(seed: int, size: int = 30) -> Fragment:
+    """A random program of about ``size`` statements and operators."""
+    return _Generator(random.Random(seed), size).program()
+
+
+# Paths
+
+
+@dataclass(frozen=True)
+class Path:
+    front_end: str  # "plain", "incremental", "hashcons" or "json"
+    engine: str
+    optimize: int
+    jit: bool = False
+
+    def __str__(self):
+        jit = " --jit" if self.jit else ""
+        return f"{self.front_end} {self.engine} -O{self.optimize}{jit}"
+
+
+PATHS = (
+    *(
+        Path("plain", engine, optimize)
+        for engine in ("tree", "stackless", "flat", "ir")
+        for optimize in (0, 1, 2)
+    ),
+    Path("plain", "tree", 1, jit=True),
+    Path("plain", "tree", 2, jit=True),
+    Path("incremental", "tree", 1),
+    Path("hashcons", "tree", 1),
+    Path("json", "tree", 1),
+)
+
+
+@dataclass(frozen=True)
+class Outcome:
+    output: str
+    code: int  # the exit code ``plox.main`` would give
+    errors: str = ""  # what the program wrote to stderr
+    error: str | None = None  # an exception that escaped, a bug in itself
+
+    def __str__(self):
+        error = f", raised {self.error}" if self.error else ""
+        errors = f", errors {self.errors!r}" if self.errors else ""
+        return f"exit {self.code}{error}, output {self.output!r}{errors}"
+
+
+class _Skip(Exception):
+    """The program ran out of budget, so paths may stop at different points."""
+
+
+def _parse(front_end: str, source: str) -> list[stmt.Stmt]:
+    if front_end == "incremental":
+        # Parse the program with its middle third cut out, then paste it back.
+        # Scan errors of either version are dropped: the document does not
+        # keep them, and generated programs have none.
+        start, end = len(source) // 3, 2 * len(source) // 3
+        with streams.redirect(streams.output(), io.StringIO()):
+            document = Document(source[:start] + source[end:])
+            document.apply(Edit(start, start, source[start:end]))
+        for error in document.errors:
+            print(error, file=streams.errors())
+        if document.errors or None in document.statements:
+            plox.had_error = True
+        return document.statements
+
+    nodes = NodeTable() if front_end == "hashcons" else None
+    statements = Parser(Scanner(source).scan_tokens(), nodes).parse()
+    # Runtime errors in shared nodes are reported at their own lines.
+    interpreter.nodes = nodes
+    if front_end == "json" and not plox.had_error:
+        file = io.StringIO()
+        dump.write_json(statements, file)
+        statements = dump.read_json(io.StringIO(file.getvalue()))
+    return statements
+
+
+def run_path(path: Path, source: str) -> Outcome:
+    plox.had_error = plox.had_runtime_error = False
+    interpreter.environment = natives.define(Environment())
+    output, errors = io.StringIO(), io.StringIO()
+    if path.jit:
+        jit.enable(threshold=2)
+    try:
+        with streams.redirect(output, errors):
+            statements = _parse(path.front_end, source)
+            if plox.had_error:
+                return Outcome(output.getvalue(), 65, errors.getvalue())
+            statements = plox.analyze(statements, optimize=path.optimize)
+            budget = Budget(statements=STATEMENT_BUDGET)
+            plox.execute(statements, path.engine, RunStats(), path.optimize, budget)
+    except BudgetExceeded:
+        raise _Skip from None
+    except Exception as error:
+        raised = f"{type(error).__name__}: {error}"
+        return Outcome(output.getvalue(), 1, errors.getvalue(), raised)
+    finally:
+        interpreter.nodes = None
+        if path.jit:
+            jit.disable()
+    code = 70 if plox.had_runtime_error else 0
+    return Outcome(output.getvalue(), code, errors.getvalue())
+
+
+@dataclass
+class Result:
+    source: str
+    outcomes: dict[Path, Outcome]
+
+    @property
+    def failed(self) -> bool:
+        outcomes = set(self.outcomes.values())
+        return len(outcomes) > 1 or any(outcome.error for outcome in outcomes)
+
+    def describe(self) -> str:
+        groups: dict[Outcome, list[Path]] = {}
+        for path, outcome in self.outcomes.items():
+            groups.setdefault(outcome, []).append(path)
+        return "\n".join(
+            f"  {', '.join(map(str, paths))}: {outcome}"
+            for outcome, paths in groups.items()
+        )
+
+
+def check(
+    source: str,
+    paths: tuple[Path, ...] = PATHS,
+    timings: dict[Path, float] | None = None,
+) -> Result | None:
+    """Run ``source`` through ``paths``, or return None if it ran out of budget."""
+    outcomes = {}
+    try:
+        for path in paths:
+            start = time.perf_counter()
+            outcomes[path] = run_path(path, source)
+            if timings is not None:
+                timings[path] = timings.get(path, 0.0) + time.perf_counter() - start
+    except _Skip:
+        return None
+    return Result(source, outcomes)
+
+
+def minimize(program: Fragment, failing: Callable[[str], bool]) -> str:
+    """Shrink ``program`` in place while ``failing`` holds for its source."""
+    progress = True
+    while progress:
+        progress = False
+        for fragment in list(program.fragments()):
+            if fragment is program:
+                continue
+            original = fragment.parts
+            for parts in _replacements(fragment):
+                before = len(str(program))
+                fragment.parts = parts
+                if len(str(program)) < before and failing(str(program)):
+                    progress = True
+                    break
+                fragment.parts = original
+            if progress:
+                break
+    return str(program)
+
+
+def _replacements(fragment: Fragment) -> Iterator[list["str | Fragment"]]:
+    children = [part for part in fragment.parts if isinstance(part, Fragment)]
+    if not fragment.expression:
+        yield []
+        for child in children:
+            if not child.expression:
+                yield child.parts
+        return
+    for child in children:
+        if child.expression:
+            yield child.parts
+    yield ["nil"]
+    yield ["1"]
+
+
+# Reports
+
+
+@dataclass
+class Failure:
+    seed: int
+    result: Result
+    reproducer: str
+
+
+@dataclass
+class Report:
+    programs: int = 0
+    skipped: int = 0
+    failures: list[Failure] = field(default_factory=list)
+    timings: dict[Path, float] = field(default_factory=dict)
+
+    def table(self) -> str:
+        """Time spent in each path, relative to the first one."""
+        if not self.timings:
+            return ""
+        baseline = next(iter(self.timings.values())) or 1.0
+        width = max(len(str(path)) for path in self.timings)
+        lines = [f"{'path':<{width}}  {'seconds':>8}  {'relative':>8}"]
+        for path, seconds in self.timings.items():
+            lines.append(
+                f"{str(path):<{width}}  {seconds:8.3f}  {seconds / baseline:8.2f}"
+            )
+        return "\n".join(lines)
+
+
+def run(
+    programs: int = 100,
+    seed: int = 0,
+    size: int = 30,
+    paths: tuple[Path, ...] = PATHS,
+) -> Report:
+    """Check ``programs`` generated programs, minimizing every failure."""
+    report = Report()
+    for program_seed in range(seed, seed + programs):
+        program = generate(program_seed, size)
+        result = check(str(program), paths, report.timings)
+        report.programs += 1
+        if result is None:
+            report.skipped += 1
+        elif result.failed:
+
+            def failing(source: str) -> bool:
+                result = check(source, paths)
+                if result is None or result.outcomes[paths[0]].code == 65:
+                    return False  # keep the reproducer well formed
+                return result.failed
+
+            reproducer = minimize(program, failing)
+            report.failures.append(Failure(program_seed, result, reproducer))
+    return report
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m plox.differential",
+        description="Run random programs through every engine and compare them",
+    )
+    parser.add_argument("--programs", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--size", type=int, default=30, help="Statements and operators per program"
+    )
+    args = parser.parse_args(argv)
+
+    report = run(args.programs, args.seed, args.size)
+    for failure in report.failures:
+        reproduced = check(failure.reproducer)
+        print(f"Program {failure.seed} failed. Minimized:\n{failure.reproducer}")
+        print((reproduced or failure.result).describe())
+        print()
+    print(
+        f"{report.programs} programs, {report.skipped} skipped, "
+        f"{len(report.failures)} failed\n"
+    )
+    print(report.table())
+    return 1 if report.failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
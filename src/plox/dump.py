@@ -0,0 +1,393 @@
+"""Streaming AST dumps.
+
+``write_text`` writes nodes in the parenthesized format of ``ast_printer``,
+one top-level node per line, and ``write_json`` writes them as JSON lines
+that ``read_json`` loads back. Both walk the tree with an explicit stack, so
+deep trees do not hit the recursion limit, and write to the file as they go
+instead of building the dump in memory first.
+
+JSON lines are in post-order: each node is a ``[kind, ...fields]`` record
+that follows the records of its children, with ``null`` for a missing child
+such as an absent else branch. The loader keeps a stack of built nodes and
+each record pops its children off it. Tokens are ``[type, lexeme, line]``.
+Blocks keep their ``needs_scope``, but other analysis results such as
+inferred types are not stored, so the passes have to run again on a loaded
+tree.
+"""
+
+import io
+import json
+from collections.abc import Callable, Iterable
+from functools import singledispatch
+from typing import TextIO
+
+from plox import expr, stmt
+from plox.scanner import Token, TokenType
+from plox.visit import Node
+
+_BUFFER_SIZE = 4096  # pieces written to the file at once
+
+
+class _Writer:
+    def __init__(self, file: TextIO):
+        self.file = file
+        self.pieces: list[str] = []
+
+    def write(self, piece: str):
+        self.pieces.append(piece)
+        if len(self.pieces) >= _BUFFER_SIZE:
+            self.flush()
+
+    def flush(self):
+        self.file.write("".join(self.pieces))
+        self.pieces.clear()
+
+
+# Text
+
+
+def write_text(nodes: Iterable[Node], file: TextIO):
+    writer = _Writer(file)
+    for node in nodes:
+        _write_text(node, writer)
+        writer.write("\n")
+    writer.flush()
+
+
+def text(node: Node) -> str:
+    writer = _Writer(io.StringIO())
+    _write_text(node, writer)
+    writer.flush()
+    return writer.file.getvalue()
+
+
+def _write_text(node: Node, writer: _Writer):
+    stack: list[Node | str] = [node]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, str):
+            writer.write(item)
+            continue
+
+        label, children = _text(item)
+        if children is None:
+            writer.write(label)
+            continue
+
+        writer.write(f"({label}")
+        stack.append(")")
+        for child in reversed(children):
+            stack.append(child)
+            stack.append(" ")
+
+
+@singledispatch
+def _text(node: Node) -> tuple[str, list[Node] | None]:
+    """The label and children of ``node``, with None for leaves."""
+    raise TypeError(f"Cannot dump {type(node).__name__}.")
+
+
+@_text.register
+def _(binary: expr.Binary):
+    return binary.operator.lexeme, [binary.left, binary.right]
+
+
+@_text.register
+def _(call: expr.Call):
+    return "call", [call.callee, *call.arguments]
+
+
+@_text.register
+def _(grouping: expr.Grouping):
+    return "group", [grouping.expression]
+
+
+def literal_text(value: object) -> str:
+    # Numbers print as the double they stand for, also those held as ints.
+    return str(float(value) if value.__class__ is int else value)
+
+
+@_text.register
+def _(literal: expr.Literal):
+    return literal_text(literal.value), None
+
+
+@_text.register
+def _(logical: expr.Logical):
+    return logical.operator.lexeme, [logical.left, logical.right]
+
+
+@_text.register
+def _(unary: expr.Unary):
+    return unary.operator.lexeme, [unary.right]
+
+
+@_text.register
+def _(variable: expr.Variable):
+    return variable.name.lexeme, None
+
+
+@_text.register
+def _(assign: expr.Assign):
+    return f"= {assign.name.lexeme}", [assign.value]
+
+
+@_text.register
+def _(expression: stmt.Expression):
+    return "expr", [expression.expression]
+
+
+@_text.register
+def _(print_: stmt.Print):
+    return "print", [print_.expression]
+
+
+@_text.register
+def _(var: stmt.Var):
+    initializer = [] if var.initializer is None else [var.initializer]
+    return f"var {var.name.lexeme}", initializer
+
+
+@_text.register
+def _(block: stmt.Block):
+    return "block", block.statements
+
+
+@_text.register
+def _(if_: stmt.If):
+    branches = [if_.then_branch]
+    if if_.else_branch is not None:
+        branches.append(if_.else_branch)
+    return "if", [if_.condition, *branches]
+
+
+@_text.register
+def _(while_: stmt.While):
+    return "while", [while_.condition, while_.body]
+
+
+@_text.register
+def _(import_: stmt.Import):
+    return f'import "{import_.path}"', []
+
+
+# JSON lines
+
+
+def write_json(nodes: Iterable[Node], file: TextIO):
+    writer = _Writer(file)
+    encode = json.JSONEncoder(separators=(",", ":")).encode
+    for node in nodes:
+        stack: list[tuple[Node | None, bool]] = [(node, False)]
+        while stack:
+            item, expanded = stack.pop()
+            if item is None:
+                writer.write("null\n")
+                continue
+
+            record, children = _json(item)
+            if expanded or not children:
+                writer.write(encode(record))
+                writer.write("\n")
+                continue
+
+            stack.append((item, True))
+            stack.extend((child, False) for child in reversed(children))
+    writer.flush()
+
+
+def _token(token: Token) -> list:
+    return [token.type.name, token.lexeme, token.line]
+
+
+@singledispatch
+def _json(node: Node) -> tuple[list, list[Node | None]]:
+    """The record and children of ``node``."""
+    raise TypeError(f"Cannot dump {type(node).__name__}.")
+
+
+@_json.register
+def _(binary: expr.Binary):
+    return ["Binary", _token(binary.operator)], [binary.left, binary.right]
+
+
+@_json.register
+def _(call: expr.Call):
+    record = ["Call", _token(call.paren), len(call.arguments)]
+    return record, [call.callee, *call.arguments]
+
+
+@_json.register
+def _(grouping: expr.Grouping):
+    return ["Grouping"], [grouping.expression]
+
+
+@_json.register
+def _(literal: expr.Literal):
+    return ["Literal", literal.value], []
+
+
+@_json.register
+def _(logical: expr.Logical):
+    return ["Logical", _token(logical.operator)], [logical.left, logical.right]
+
+
+@_json.register
+def _(unary: expr.Unary):
+    return ["Unary", _token(unary.operator)], [unary.right]
+
+
+@_json.register
+def _(variable: expr.Variable):
+    return ["Variable", _token(variable.name)], []
+
+
+@_json.register
+def _(assign: expr.Assign):
+    return ["Assign", _token(assign.name)], [assign.value]
+
+
+@_json.register
+def _(expression: stmt.Expression):
+    return ["Expression"], [expression.expression]
+
+
+@_json.register
+def _(print_: stmt.Print):
+    return ["Print"], [print_.expression]
+
+
+@_json.register
+def _(var: stmt.Var):
+    return ["Var", _token(var.name)], [var.initializer]
+
+
+@_json.register
+def _(block: stmt.Block):
+    record = ["Block", len(block.statements), block.needs_scope]
+    return record, block.statements
+
+
+@_json.register
+def _(if_: stmt.If):
+    return ["If"], [if_.condition, if_.then_branch, if_.else_branch]
+
+
+@_json.register
+def _(while_: stmt.While):
+    return ["While"], [while_.condition, while_.body]
+
+
+@_json.register
+def _(import_: stmt.Import):
+    return ["Import", _token(import_.keyword), import_.path], []
+
+
+def read_json(file: Iterable[str]) -> list[Node]:
+    """Load the nodes written by ``write_json``."""
+    stack: list[Node | None] = []
+    for number, line in enumerate(file, 1):
+        record = json.loads(line)
+        if record is None:
+            stack.append(None)
+            continue
+        kind, *fields = record
+        try:
+            stack.append(_BUILDERS[kind](stack, *fields))
+        except (KeyError, IndexError, TypeError, ValueError):
+            raise ValueError(f"Invalid AST record on line {number}: {line}") from None
+    return stack
+
+
+def _load_token(type_: str, lexeme: str, line: int) -> Token:
+    return Token(TokenType[type_], lexeme, None, line)
+
+
+def _pop(stack: list, count: int) -> list:
+    if count > len(stack):
+        raise IndexError
+    children = stack[len(stack) - count :]
+    del stack[len(stack) - count :]
+    return children
+
+
+def _binary(stack: list, operator: list):
+    left, right = _pop(stack, 2)
+    return expr.Binary(left, _load_token(*operator), right)
+
+
+def _call(stack: list, paren: list, arguments: int):
+    callee, *arguments = _pop(stack, arguments + 1)
+    return expr.Call(callee, _load_token(*paren), arguments)
+
+
+def _grouping(stack: list):
+    return expr.Grouping(stack.pop())
+
+
+def _literal(stack: list, value: object):
+    return expr.Literal(value)
+
+
+def _logical(stack: list, operator: list):
+    left, right = _pop(stack, 2)
+    return expr.Logical(left, _load_token(*operator), right)
+
+
+def _unary(stack: list, operator: list):
+    return expr.Unary(_load_token(*operator), stack.pop())
+
+
+def _variable(stack: list, name: list):
+    return expr.Variable(_load_token(*name))
+
+
+def _assign(stack: list, name: list):
+    return expr.Assign(_load_token(*name), stack.pop())
+
+
+def _expression(stack: list):
+    return stmt.Expression(stack.pop())
+
+
+def _print(stack: list):
+    return stmt.Print(stack.pop())
+
+
+def _var(stack: list, name: list):
+    return stmt.Var(_load_token(*name), stack.pop())
+
+
+def _block(stack: list, statements: int, needs_scope: bool):
+    return stmt.Block(_pop(stack, statements), needs_scope=needs_scope)
+
+
+def _if(stack: list):
+    return stmt.If(*_pop(stack, 3))
+
+
+def _while(stack: list):
+    return stmt.While(*_pop(stack, 2))
+
+
+def _import(stack: list, keyword: list, path: str):
+    return stmt.Import(_load_token(*keyword), path)
+
+
+_BUILDERS: dict[str, Callable[..., Node]] = {
+    "Binary": _binary,
+    "Call": _call,
+    "Grouping": _grouping,
+    "Literal": _literal,
+    "Logical": _logical,
+    "Unary": _unary,
+    "Variable": _variable,
+    "Assign": _assign,
+    "Expression": _expression,
+    "Print": _print,
+    "Var": _var,
+    "Block": _block,
+    "If": _if,
+    "While": _while,
+    "Import": _import,
+}
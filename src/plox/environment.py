@@ -1,29 +1,107 @@
+from collections.abc import Callable
+
+from plox import budget
+from plox.budget import BudgetExceeded
 from plox.scanner import Token
 
+environments_created = 0
+max_depth = 0
+
+_MISSING = object()
+_nested_symbols: set[int] = set()  # ever defined in a scope other than globals
+
+
+class GlobalCache:
+    """Inline cache of one variable access site.
+
+    It holds the ``Environment.version`` at which the site's name was found
+    in the globals. While the version is unchanged, the name has not been
+    defined in any nested scope, so from wherever the site runs the name
+    can only be in the globals and one lookup there finds it.
+    """
+
+    __slots__ = ("version",)
+
+    def __init__(self):
+        self.version = -1
+
 
 class Environment:
+    # Names bound by an import whose module has not run yet (see
+    # ``plox.modules``), consulted only when a name is missing.
+    imports: "dict[int, Callable[[], None]] | None" = None
+    # Bumped when a name is first defined in a nested scope, which is the one
+    # change of scope shape that can make a name stop resolving to a global.
+    version = 0
+
     def __init__(self, enclosing: "Environment | None" = None):
+        global environments_created, max_depth
         self.enclosing = enclosing
-        self.values: dict[str, object] = {}
+        self.values: dict[int, object] = {}
+        self.globals: Environment = self if enclosing is None else enclosing.globals
+        self.depth: int = 0 if enclosing is None else enclosing.depth + 1
 
-    def define(self, name: str, value: object):
-        self.values[name] = value
+        environments_created += 1
+        if self.depth > max_depth:
+            max_depth = self.depth
+        if self.depth > budget.depth_limit:
+            raise BudgetExceeded(
+                f"Exceeded the budget of {budget.depth_limit} nested environments."
+            )
 
-    def get(self, name: Token):
-        if name.lexeme in self.values:
-            return self.values[name.lexeme]
+    def define(self, symbol: int, value: object):
+        if self.enclosing is not None and symbol not in _nested_symbols:
+            _nested_symbols.add(symbol)
+            Environment.version += 1
+        self.values[symbol] = value
 
-        if self.enclosing:
-            return self.enclosing.get(name)
+    def get(self, name: Token, cache: GlobalCache | None = None):
+        symbol = name.symbol
+        if cache is not None and cache.version == Environment.version:
+            value = self.globals.values.get(symbol, _MISSING)
+            if value is not _MISSING:
+                return value
 
+        environment = self
+        while environment is not None:
+            value = environment.values.get(symbol, _MISSING)
+            if value is not _MISSING:
+                if cache is not None and symbol not in _nested_symbols:
+                    cache.version = Environment.version
+                return value
+            environment = environment.enclosing
+
+        if self._import(symbol):
+            return self.get(name, cache)
         raise RuntimeError(name, f"Undefined variable {name.lexeme}.")
 
-    def assign(self, name: Token, value: object):
-        if name.lexeme in self.values:
-            self.values[name.lexeme] = value
+    def assign(self, name: Token, value: object, cache: GlobalCache | None = None):
+        symbol = name.symbol
+        if cache is not None and cache.version == Environment.version:
+            values = self.globals.values
+            if symbol in values:
+                values[symbol] = value
+                return
 
-        if self.enclosing:
-            self.enclosing.assign(name, value)
-            return
+        environment = self
+        while environment is not None:
+            if symbol in environment.values:
+                environment.values[symbol] = value
+                if cache is not None and symbol not in _nested_symbols:
+                    cache.version = Environment.version
+                return
+            environment = environment.enclosing
 
+        if self._import(symbol):
+            return self.assign(name, value, cache)
         raise RuntimeError(name, f"Undefined variable {name.lexeme}.")
+
+    def _import(self, symbol: int) -> bool:
+        """Run the module a pending import of ``symbol`` binds it from."""
+        environment = self
+        while environment is not None:
+            if environment.imports and symbol in environment.imports:
+                environment.imports[symbol]()
+                return True
+            environment = environment.enclosing
+        return False
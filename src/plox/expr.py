@@ -1,9 +1,15 @@
 from abc import ABC, abstractmethod
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from functools import singledispatch
+from typing import TYPE_CHECKING
 
+from plox.environment import GlobalCache
 from plox.scanner import Token, TokenType
 
+if TYPE_CHECKING:
+    from plox.inference import LoxType
+    from plox.natives import NativeFunction
+
 
 class Expr(ABC):
     pass
@@ -14,6 +20,15 @@ class Binary(Expr):
     left: Expr
     operator: Token
     right: Expr
+    operand_type: "LoxType | None" = field(default=None, compare=False, repr=False)
+
+
+@dataclass
+class Call(Expr):
+    callee: Expr
+    paren: Token
+    arguments: list[Expr]
+    native: "NativeFunction | None" = field(default=None, compare=False, repr=False)
 
 
 @dataclass
@@ -26,18 +41,28 @@ class Literal(Expr):
     value: object
 
 
+@dataclass
+class Logical(Expr):
+    left: Expr
+    operator: Token
+    right: Expr
+
+
 @dataclass
 class Unary(Expr):
     operator: Token
     right: Expr
+    operand_type: "LoxType | None" = field(default=None, compare=False, repr=False)
 
 
 @dataclass
 class Variable(Expr):
     name: Token
+    cache: GlobalCache = field(default_factory=GlobalCache, compare=False, repr=False)
 
 
 @dataclass
 class Assign(Expr):
     name: Token
     value: Expr
+    cache: GlobalCache = field(default_factory=GlobalCache, compare=False, repr=False)
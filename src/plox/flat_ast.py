@@ -0,0 +1,518 @@
+"""Flat, array-backed AST.
+
+Nodes are integer indices into parallel typed arrays instead of dataclass
+instances. ``kinds[i]`` says what node ``i`` is and ``first[i]``/``second[i]``
+hold its operands: child node indices, an index into the constant table for
+literals, or a ``(start, length)`` slice of ``lists`` for block statements
+and for the callee followed by the arguments of a call.
+Blocks that need no scope of their own are stored as ``INLINE_BLOCK``. An
+``IF`` keeps its condition in ``first`` and in ``second`` the start of a
+``[then, else]`` pair in ``lists``, with ``NONE`` when there is no else.
+An ``IMPORT`` keeps the constant index of its path in ``first``.
+``token_ids[i]`` points into a deduplicated token table (-1 when the node has
+no token) and ``operand_types[i]`` holds the ``LoxType`` value type inference
+proved for the operands of a binary or unary node (0 when unproven).
+``caches[i]`` is the inline cache of a variable or assignment node, and None
+for other nodes; it is runtime state and not serialized.
+"""
+
+import marshal
+from array import array
+from enum import IntEnum
+from functools import singledispatch
+
+import plox
+from plox import budget, expr, interpreter, modules, numbers, stmt, streams
+from plox.environment import Environment, GlobalCache
+from plox.inference import LoxType
+from plox.scanner import Token, TokenType
+
+NONE = -1
+_FORMAT_VERSION = 5
+_NUMBER = LoxType.NUMBER.value
+
+
+class Kind(IntEnum):
+    BINARY = 0
+    GROUPING = 1
+    LITERAL = 2
+    UNARY = 3
+    VARIABLE = 4
+    ASSIGN = 5
+    EXPRESSION = 6
+    PRINT = 7
+    VAR = 8
+    BLOCK = 9
+    INLINE_BLOCK = 10
+    LOGICAL = 11
+    IF = 12
+    WHILE = 13
+    CALL = 14
+    IMPORT = 15
+
+
+class FlatAst:
+    def __init__(self):
+        self.kinds = array("B")
+        self.first = array("i")
+        self.second = array("i")
+        self.token_ids = array("i")
+        self.operand_types = array("B")
+        self.lists = array("i")
+        self.roots = array("i")
+        self.constants: list[object] = []
+        self.tokens: list[Token] = []
+        self.caches: list[GlobalCache | None] = []
+        self._constant_index: dict[tuple[type, object], int] = {}
+        self._token_index: dict[int, int] = {}
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def add(
+        self,
+        kind: Kind,
+        first=NONE,
+        second=NONE,
+        token: Token | None = None,
+        operand_type: LoxType | None = None,
+    ):
+        self.kinds.append(kind)
+        self.first.append(first)
+        self.second.append(second)
+        self.token_ids.append(NONE if token is None else self.add_token(token))
+        self.operand_types.append(0 if operand_type is None else operand_type.value)
+        self.caches.append(_cache(kind))
+        return len(self.kinds) - 1
+
+    def add_constant(self, value: object) -> int:
+        key = (type(value), value)
+        if key not in self._constant_index:
+            self._constant_index[key] = len(self.constants)
+            self.constants.append(value)
+        return self._constant_index[key]
+
+    def add_token(self, token: Token) -> int:
+        if id(token) not in self._token_index:
+            self._token_index[id(token)] = len(self.tokens)
+            self.tokens.append(token)
+        return self._token_index[id(token)]
+
+    def add_list(self, indices: list[int]) -> int:
+        start = len(self.lists)
+        self.lists.extend(indices)
+        return start
+
+    def token(self, index: int) -> Token:
+        return self.tokens[self.token_ids[index]]
+
+    def operand_type(self, index: int) -> LoxType | None:
+        value = self.operand_types[index]
+        return LoxType(value) if value else None
+
+    def constant(self, index: int) -> object:
+        return self.constants[self.first[index]]
+
+    def statements(self, index: int) -> array:
+        start = self.first[index]
+        return self.lists[start : start + self.second[index]]
+
+    def branches(self, index: int) -> tuple[int, int]:
+        start = self.second[index]
+        return self.lists[start], self.lists[start + 1]
+
+    def to_bytes(self) -> bytes:
+        """Serialize to a compact byte string.
+
+        Arrays are stored in machine byte order, so the result is meant for
+        caches on the same platform rather than for interchange.
+        """
+        return marshal.dumps(
+            (
+                _FORMAT_VERSION,
+                self.kinds.tobytes(),
+                self.first.tobytes(),
+                self.second.tobytes(),
+                self.token_ids.tobytes(),
+                self.operand_types.tobytes(),
+                self.lists.tobytes(),
+                self.roots.tobytes(),
+                tuple(self.constants),
+                tuple(
+                    (token.type.name, token.lexeme, token.literal, token.line)
+                    for token in self.tokens
+                ),
+            )
+        )
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "FlatAst":
+        version, *arrays, constants, tokens = marshal.loads(data)
+        if version != _FORMAT_VERSION:
+            raise ValueError(f"Unsupported flat AST format version {version}.")
+
+        flat = cls()
+        columns = (
+            flat.kinds,
+            flat.first,
+            flat.second,
+            flat.token_ids,
+            flat.operand_types,
+            flat.lists,
+            flat.roots,
+        )
+        for column, raw in zip(columns, arrays):
+            column.frombytes(raw)
+        flat.constants = list(constants)
+        flat.caches = [_cache(kind) for kind in flat.kinds]
+        flat.tokens = [
+            Token(TokenType[type_], lexeme, literal, line)
+            for type_, lexeme, literal, line in tokens
+        ]
+        return flat
+
+
+def _cache(kind: Kind) -> GlobalCache | None:
+    return GlobalCache() if kind in (Kind.VARIABLE, Kind.ASSIGN) else None
+
+
+def flatten(statements: list[stmt.Stmt]) -> FlatAst:
+    flat = FlatAst()
+    flat.roots.extend(_flatten(statement, flat) for statement in statements)
+    return flat
+
+
+@singledispatch
+def _flatten(node: object, flat: FlatAst) -> int:
+    raise TypeError(f"Cannot flatten {type(node).__name__}.")
+
+
+@_flatten.register
+def _(binary: expr.Binary, flat: FlatAst):
+    left = _flatten(binary.left, flat)
+    right = _flatten(binary.right, flat)
+    return flat.add(Kind.BINARY, left, right, binary.operator, binary.operand_type)
+
+
+@_flatten.register
+def _(grouping: expr.Grouping, flat: FlatAst):
+    return flat.add(Kind.GROUPING, _flatten(grouping.expression, flat))
+
+
+@_flatten.register
+def _(literal: expr.Literal, flat: FlatAst):
+    return flat.add(Kind.LITERAL, flat.add_constant(literal.value))
+
+
+@_flatten.register
+def _(unary: expr.Unary, flat: FlatAst):
+    right = _flatten(unary.right, flat)
+    return flat.add(
+        Kind.UNARY, right, token=unary.operator, operand_type=unary.operand_type
+    )
+
+
+@_flatten.register
+def _(variable: expr.Variable, flat: FlatAst):
+    return flat.add(Kind.VARIABLE, token=variable.name)
+
+
+@_flatten.register
+def _(assign: expr.Assign, flat: FlatAst):
+    return flat.add(Kind.ASSIGN, _flatten(assign.value, flat), token=assign.name)
+
+
+@_flatten.register
+def _(logical: expr.Logical, flat: FlatAst):
+    left = _flatten(logical.left, flat)
+    right = _flatten(logical.right, flat)
+    return flat.add(Kind.LOGICAL, left, right, logical.operator)
+
+
+@_flatten.register
+def _(call: expr.Call, flat: FlatAst):
+    children = [_flatten(node, flat) for node in [call.callee, *call.arguments]]
+    return flat.add(Kind.CALL, flat.add_list(children), len(children), call.paren)
+
+
+@_flatten.register
+def _(expression: stmt.Expression, flat: FlatAst):
+    return flat.add(Kind.EXPRESSION, _flatten(expression.expression, flat))
+
+
+@_flatten.register
+def _(print_: stmt.Print, flat: FlatAst):
+    return flat.add(Kind.PRINT, _flatten(print_.expression, flat))
+
+
+@_flatten.register
+def _(var: stmt.Var, flat: FlatAst):
+    initializer = NONE
+    if var.initializer:
+        initializer = _flatten(var.initializer, flat)
+    return flat.add(Kind.VAR, initializer, token=var.name)
+
+
+@_flatten.register
+def _(block: stmt.Block, flat: FlatAst):
+    children = [_flatten(statement, flat) for statement in block.statements]
+    kind = Kind.BLOCK if block.needs_scope else Kind.INLINE_BLOCK
+    return flat.add(kind, flat.add_list(children), len(children))
+
+
+@_flatten.register
+def _(if_: stmt.If, flat: FlatAst):
+    condition = _flatten(if_.condition, flat)
+    then_branch = _flatten(if_.then_branch, flat)
+    else_branch = NONE
+    if if_.else_branch is not None:
+        else_branch = _flatten(if_.else_branch, flat)
+    return flat.add(Kind.IF, condition, flat.add_list([then_branch, else_branch]))
+
+
+@_flatten.register
+def _(while_: stmt.While, flat: FlatAst):
+    condition = _flatten(while_.condition, flat)
+    return flat.add(Kind.WHILE, condition, _flatten(while_.body, flat))
+
+
+@_flatten.register
+def _(import_: stmt.Import, flat: FlatAst):
+    path = flat.add_constant(import_.path)
+    return flat.add(Kind.IMPORT, path, token=import_.keyword)
+
+
+def unflatten(flat: FlatAst) -> list[stmt.Stmt]:
+    return [_unflatten(flat, index) for index in flat.roots]
+
+
+def _unflatten(flat: FlatAst, index: int):
+    first = flat.first[index]
+    match flat.kinds[index]:
+        case Kind.BINARY:
+            return expr.Binary(
+                _unflatten(flat, first),
+                flat.token(index),
+                _unflatten(flat, flat.second[index]),
+                flat.operand_type(index),
+            )
+        case Kind.GROUPING:
+            return expr.Grouping(_unflatten(flat, first))
+        case Kind.LITERAL:
+            return expr.Literal(flat.constant(index))
+        case Kind.UNARY:
+            return expr.Unary(
+                flat.token(index), _unflatten(flat, first), flat.operand_type(index)
+            )
+        case Kind.VARIABLE:
+            return expr.Variable(flat.token(index))
+        case Kind.ASSIGN:
+            return expr.Assign(flat.token(index), _unflatten(flat, first))
+        case Kind.EXPRESSION:
+            return stmt.Expression(_unflatten(flat, first))
+        case Kind.PRINT:
+            return stmt.Print(_unflatten(flat, first))
+        case Kind.VAR:
+            initializer = None if first == NONE else _unflatten(flat, first)
+            return stmt.Var(flat.token(index), initializer)
+        case Kind.BLOCK | Kind.INLINE_BLOCK:
+            return stmt.Block(
+                [_unflatten(flat, i) for i in flat.statements(index)],
+                needs_scope=flat.kinds[index] == Kind.BLOCK,
+            )
+        case Kind.LOGICAL:
+            return expr.Logical(
+                _unflatten(flat, first),
+                flat.token(index),
+                _unflatten(flat, flat.second[index]),
+            )
+        case Kind.CALL:
+            callee, *arguments = [_unflatten(flat, i) for i in flat.statements(index)]
+            return expr.Call(callee, flat.token(index), arguments)
+        case Kind.IF:
+            then_branch, else_branch = flat.branches(index)
+            return stmt.If(
+                _unflatten(flat, first),
+                _unflatten(flat, then_branch),
+                None if else_branch == NONE else _unflatten(flat, else_branch),
+            )
+        case Kind.WHILE:
+            return stmt.While(
+                _unflatten(flat, first), _unflatten(flat, flat.second[index])
+            )
+        case Kind.IMPORT:
+            return stmt.Import(flat.token(index), flat.constant(index))
+
+
+def interpret(flat: FlatAst):
+    try:
+        for index in flat.roots:
+            execute(flat, index)
+    except RuntimeError as error:
+        plox.runtime_error(error)
+
+
+def execute(flat: FlatAst, index: int):
+    interpreter.statements_executed += 1
+    if interpreter.statements_executed >= budget.next_check:
+        budget.checkpoint(interpreter.statements_executed)
+    _HANDLERS[flat.kinds[index]](flat, index)
+
+
+def evaluate(flat: FlatAst, index: int):
+    return _HANDLERS[flat.kinds[index]](flat, index)
+
+
+def _binary(flat: FlatAst, index: int):
+    left = evaluate(flat, flat.first[index])
+    right = evaluate(flat, flat.second[index])
+    operator = flat.token(index)
+    if flat.operand_types[index] == _NUMBER:
+        try:
+            return interpreter.UNCHECKED_BINARY_OPERATIONS[operator.type](left, right)
+        except ZeroDivisionError:
+            raise interpreter.division_by_zero(operator) from None
+    return interpreter.binary_operation(operator, left, right)
+
+
+def _grouping(flat: FlatAst, index: int):
+    return evaluate(flat, flat.first[index])
+
+
+def _literal(flat: FlatAst, index: int):
+    return flat.constants[flat.first[index]]
+
+
+def _unary(flat: FlatAst, index: int):
+    right = evaluate(flat, flat.first[index])
+    if flat.operand_types[index]:
+        return numbers.negate(right)
+    return interpreter.unary_operation(flat.token(index), right)
+
+
+def _variable(flat: FlatAst, index: int):
+    return interpreter.environment.get(flat.token(index), flat.caches[index])
+
+
+def _assign(flat: FlatAst, index: int):
+    value = evaluate(flat, flat.first[index])
+    interpreter.environment.assign(flat.token(index), value, flat.caches[index])
+    return value
+
+
+def _expression(flat: FlatAst, index: int):
+    evaluate(flat, flat.first[index])
+
+
+def _print(flat: FlatAst, index: int):
+    value = evaluate(flat, flat.first[index])
+    print(interpreter.stringfy(value), file=streams.output())
+
+
+def _var(flat: FlatAst, index: int):
+    value = None
+    if flat.first[index] != NONE:
+        value = evaluate(flat, flat.first[index])
+
+    interpreter.environment.define(flat.token(index).symbol, value)
+
+
+def _block(flat: FlatAst, index: int):
+    previous_environment = interpreter.environment
+    try:
+        interpreter.environment = Environment(previous_environment)
+        for statement in flat.statements(index):
+            execute(flat, statement)
+    finally:
+        interpreter.environment = previous_environment
+
+
+def _inline_block(flat: FlatAst, index: int):
+    for statement in flat.statements(index):
+        execute(flat, statement)
+
+
+def _logical(flat: FlatAst, index: int):
+    left = evaluate(flat, flat.first[index])
+    if flat.token(index).type is TokenType.OR:
+        if left is not None and left is not False:
+            return left
+    elif left is None or left is False:
+        return left
+
+    return evaluate(flat, flat.second[index])
+
+
+def _call(flat: FlatAst, index: int):
+    start = flat.first[index]
+    end = start + flat.second[index]
+    callee = evaluate(flat, flat.lists[start])
+    arguments = (evaluate(flat, i) for i in flat.lists[start + 1 : end])
+    return interpreter.call_value(flat.token(index), callee, *arguments)
+
+
+def _if(flat: FlatAst, index: int):
+    then_branch, else_branch = flat.branches(index)
+    condition = evaluate(flat, flat.first[index])
+    if condition is not None and condition is not False:
+        execute(flat, then_branch)
+    elif else_branch != NONE:
+        execute(flat, else_branch)
+
+
+def _while(flat: FlatAst, index: int):
+    condition, body = flat.first[index], flat.second[index]
+    scoped, after, blocks = body, [], 1
+    if flat.kinds[body] == Kind.INLINE_BLOCK:
+        # A for loop's body and increment, as in interpreter.loop_scope.
+        statements = flat.statements(body)
+        if statements and flat.kinds[statements[0]] == Kind.BLOCK:
+            scoped, after, blocks = statements[0], statements[1:], 2
+    if flat.kinds[scoped] != Kind.BLOCK:
+        while (value := evaluate(flat, condition)) is not None and value is not False:
+            execute(flat, body)
+        return
+
+    # As in the tree interpreter, the body's scope is reused across iterations.
+    statements = flat.statements(scoped)
+    previous_environment = interpreter.environment
+    loop_environment = Environment(previous_environment)
+    try:
+        while (value := evaluate(flat, condition)) is not None and value is not False:
+            interpreter.statements_executed += blocks
+            if interpreter.statements_executed >= budget.next_check:
+                budget.checkpoint(interpreter.statements_executed)
+            loop_environment.values.clear()
+            interpreter.environment = loop_environment
+            for statement in statements:
+                execute(flat, statement)
+            interpreter.environment = previous_environment
+            for statement in after:
+                execute(flat, statement)
+    finally:
+        interpreter.environment = previous_environment
+
+
+def _import(flat: FlatAst, index: int):
+    path = flat.constant(index)
+    modules.import_module(flat.token(index), path, interpreter.environment)
+
+
+_HANDLERS = (
+    _binary,
+    _grouping,
+    _literal,
+    _unary,
+    _variable,
+    _assign,
+    _expression,
+    _print,
+    _var,
+    _block,
+    _inline_block,
+    _logical,
+    _if,
+    _while,
+    _call,
+    _import,
+)
@@ -0,0 +1,106 @@
+"""Hash-consing of expression nodes.
+
+A ``NodeTable`` hands out one shared instance per structurally identical
+expression subtree, so repeated subexpressions in generated code cost one
+object and any cache stored on a node is shared by every occurrence.
+
+Shared nodes are the ordinary mutable dataclasses rather than frozen ones,
+because the passes and engines annotate nodes in place whether or not they
+are shared. The structural fields must not be written. The annotations,
+the ``compare=False`` fields, hold for every occurrence: ``operand_type`` is
+only set when every occurrence is proven to have it (see
+``plox.inference``), ``native`` depends only on the callee's name, the
+argument count and the whole program, and a ``GlobalCache`` holds wherever
+its name is read.
+
+Because one node stands for several occurrences, its tokens are those of the
+first occurrence. The table keeps the line of every occurrence in
+``positions``, and for each statement the lines of the tokens of the
+expressions parsed as part of it. While ``interpreter.nodes`` is the table,
+``locate`` moves a runtime error to the line of the occurrence that failed.
+"""
+
+import dataclasses
+
+from plox.expr import Expr
+from plox.scanner import Token
+
+
+class NodeTable:
+    def __init__(self):
+        self.nodes: dict[tuple, Expr] = {}
+        self.positions: dict[int, list[int]] = {}
+        # Statement id -> shared token id -> line of the token in the statement.
+        self.sites: dict[int, dict[int, int]] = {}
+        self._parsing: list[dict[int, int]] = []
+        self._statements: list[object] = []  # keeps the ids in ``sites`` valid
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def make(self, cls: type[Expr], fields: tuple, line: int) -> Expr:
+        """The shared node for ``cls(*fields)``.
+
+        The occurrence is on the line of its first token, or on ``line`` if
+        it has none.
+        """
+        key = (cls, *map(_key, fields))
+        node = self.nodes.get(key)
+        if node is None:
+            node = self.nodes[key] = cls(*fields)
+            self.positions[id(node)] = []
+
+        shared = [getattr(node, field.name) for field in dataclasses.fields(node)]
+        tokens = [
+            (token, mine)
+            for token, mine in zip(shared, fields)
+            if isinstance(mine, Token)
+        ]
+        if tokens:
+            line = tokens[0][1].line
+        self.positions[id(node)].append(line)
+        if self._parsing:
+            site = self._parsing[-1]
+            for token, mine in tokens:
+                site.setdefault(id(token), mine.line)
+        return node
+
+    def lines(self, node: Expr) -> list[int]:
+        return self.positions.get(id(node), [])
+
+    def begin(self):
+        """Start parsing a statement."""
+        self._parsing.append({})
+
+    def end(self, statement: object):
+        """Finish parsing ``statement``, None if it failed to parse."""
+        site = self._parsing.pop()
+        if statement is None or not site:
+            return
+        if id(statement) not in self.sites:
+            self._statements.append(statement)
+        self.sites.setdefault(id(statement), {}).update(site)
+
+    def locate(self, error: RuntimeError, statement: object):
+        """Move ``error`` to its line in ``statement``, if it is known there.
+
+        Called for each statement the error propagates out of, innermost
+        first, so it lands in the innermost statement it was parsed in.
+        """
+        if len(error.args) != 2:
+            return  # not a Lox runtime error
+        token, message = error.args
+        line = self.sites.get(id(statement), {}).get(id(token))
+        if line is not None:
+            error.args = (dataclasses.replace(token, line=line), message)
+
+
+def _key(field: object) -> object:
+    if isinstance(field, Token):
+        return field.type, field.lexeme
+    if isinstance(field, Expr):
+        # Children are already shared, so identity is structural equality.
+        return id(field)
+    if isinstance(field, list):
+        return tuple(map(_key, field))
+    return type(field), field
@@ -0,0 +1,471 @@
+"""Incremental re-scanning and re-parsing for editor integrations.
+
+A ``Document`` keeps the source as a list of top-level declarations, each
+with the tokens it was parsed from. After an edit it re-scans from the token
+before the damaged region until the new tokens line up with the old ones
+again, then re-parses only the declarations that touch the damaged tokens.
+Every other ``stmt`` subtree is reused as is.
+
+An edit moves everything after it, so nothing after it stores an absolute
+position. A declaration keeps the offsets of its tokens relative to its start,
+and its tokens keep their ``line`` relative to its first line, so references
+to them from reused subtrees read the right line without being updated. The
+declarations after the last edit store their own start and line minus a
+pending shift they all share, so the next edit moves them all by updating
+that shift, like the gap of a gap buffer. An edit therefore costs time for
+the tokens it re-scans and re-parses and for the declarations between it and
+the previous edit, but not for the rest of the file.
+
+Parse errors are kept with the declaration they were found in, and replaced
+when it is re-parsed, rather than reported: ``Document.errors`` lists them.
+Scanning still reports errors the usual way, but neither changes
+``plox.had_error`` for the program the editor may be running.
+"""
+
+from bisect import bisect_left, bisect_right
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from operator import attrgetter
+
+import plox
+from plox import stmt
+from plox.parser import Parser, ParserError
+from plox.scanner import Scanner, Token, TokenType
+
+
+@dataclass
+class Edit:
+    """Replace ``source[start:end]`` with ``text``."""
+
+    start: int
+    end: int
+    text: str
+
+
+@dataclass
+class Diagnostic:
+    token: Token  # whose line follows edits before it
+    message: str
+
+    def __str__(self):
+        if self.token.type == TokenType.EOF:
+            where = "at end"
+        else:
+            where = f"at '{self.token.lexeme}'"
+        return f"[line {self.token.line}] Error {where}: {self.message}"
+
+
+@dataclass
+class Reparse:
+    tokens_scanned: int
+    declarations_parsed: int
+    tokens_parsed: int  # including those of declarations parsed again
+    declarations_moved: int  # whose stored position was updated
+
+
+@dataclass
+class _Shift:
+    """How far the declarations after the last edit have moved since their
+    position was stored."""
+
+    offset: int = 0
+    lines: int = 0
+
+
+class Declaration:
+    def __init__(
+        self,
+        statement: stmt.Stmt | None,
+        errors: list[Diagnostic],
+        tokens: list["_Token"],
+        offsets: list[int],
+        lines: list[int],
+    ):
+        self.statement = statement  # None when it failed to parse
+        self.errors = errors
+        self.tokens = tokens
+        self._start = offsets[0]
+        self._line = lines[0]
+        self._shift: _Shift | None = None
+        # Where each token starts, relative to the first.
+        self.offsets = [offset - self._start for offset in offsets]
+        for token, line in zip(tokens, lines):
+            token.adopt(self, line)
+
+    @property
+    def start(self) -> int:
+        """Where its first token starts."""
+        if self._shift is None:
+            return self._start
+        return self._start + self._shift.offset
+
+    @property
+    def line(self) -> int:
+        """The line of its first token."""
+        if self._shift is None:
+            return self._line
+        return self._line + self._shift.lines
+
+    def defer(self, shift: _Shift):
+        """Store the position relative to ``shift``, which moves it from now on."""
+        self._start -= shift.offset
+        self._line -= shift.lines
+        self._shift = shift
+
+    def settle(self):
+        """Store the position as it is, so ``shift`` no longer moves it."""
+        self._start, self._line, self._shift = self.start, self.line, None
+
+
+class _Token(Token):
+    """A token whose line is stored relative to its declaration's first line.
+
+    Until a declaration adopts it, for example while it is being parsed, the
+    line is stored as is.
+    """
+
+    declaration: Declaration | None = None
+
+    @property
+    def line(self) -> int:
+        if self.declaration is None:
+            return self._line
+        return self.declaration.line + self._line
+
+    @line.setter
+    def line(self, line: int):
+        if self.declaration is not None:
+            line -= self.declaration.line
+        self._line = line
+
+    def adopt(self, declaration: Declaration, line: int):
+        """Move into ``declaration``, on ``line``."""
+        self.declaration = declaration
+        self.line = line
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Token):
+            return NotImplemented
+        return (self.type, self.lexeme, self.literal, self.line, self.symbol) == (
+            other.type,
+            other.lexeme,
+            other.literal,
+            other.line,
+            other.symbol,
+        )
+
+
+class _OffsetScanner(Scanner):
+    def __init__(self, source: str, start: int = 0, line: int = 1):
+        super().__init__(source)
+        self.current = start
+        self.line = line
+        self.offsets: list[int] = []
+
+    def scan_token(self):
+        count = len(self.tokens)
+        super().scan_token()
+        if len(self.tokens) > count:
+            token = self.tokens[-1]
+            self.tokens[-1] = _Token(
+                token.type, token.lexeme, token.literal, token.line, token.symbol
+            )
+            self.offsets.append(self.start)
+
+    def add_eof(self):
+        self.tokens.append(Token(TokenType.EOF, "", None, self.line))
+        self.offsets.append(len(self.source))
+
+
+class _Run:
+    """The tokens a parse reads, with their offsets and lines after the edit.
+
+    Old declarations are only added when the parser reaches them, and parsing
+    stops at the first one it reaches at a declaration boundary.
+    """
+
+    def __init__(
+        self, eof: Token, declarations: list[Declaration], following: Iterator[int]
+    ):
+        self.tokens: list[_Token] = []
+        self.offsets: list[int] = []
+        self.lines: list[int] = []
+        self.eof = eof
+        self.starts: dict[int, int] = {}  # run index -> old declaration index
+        self.moved_by = (0, 0)  # how far the edit moves the old tokens added next
+        self._declarations = declarations
+        self._following = following
+
+    def add(self, tokens: list[_Token], offsets: list[int], lines: list[int]):
+        self.tokens += tokens
+        self.offsets += offsets
+        self.lines += lines
+
+    def add_old(self, index: int, first: int = 0, end: int | None = None):
+        """Add tokens ``first:end`` of the old declaration ``index``."""
+        declaration = self._declarations[index]
+        tokens = declaration.tokens[first:end]
+        start = declaration.start
+        offset_delta, line_delta = self.moved_by
+        self.add(
+            tokens,
+            [
+                start + offset + offset_delta
+                for offset in declaration.offsets[first:end]
+            ],
+            [token.line + line_delta for token in tokens],
+        )
+
+    def __getitem__(self, index: int) -> Token:
+        while index >= len(self.tokens):
+            following = next(self._following, None)
+            if following is None:
+                return self.eof
+            self.starts[len(self.tokens)] = following
+            self.add_old(following)
+        return self.tokens[index]
+
+    def declaration(
+        self, first: int, end: int, statement: stmt.Stmt | None, errors: list
+    ) -> Declaration:
+        return Declaration(
+            statement,
+            errors,
+            self.tokens[first:end],
+            self.offsets[first:end],
+            self.lines[first:end],
+        )
+
+
+class _CollectingParser(Parser):
+    def __init__(self, tokens: _Run):
+        super().__init__(tokens)
+        self.errors: list[Diagnostic] = []
+
+    def error(self, token: Token, message: str):
+        self.errors.append(Diagnostic(token, message))
+        return ParserError()
+
+
+@contextmanager
+def _keeping_had_error() -> Iterator[None]:
+    had_error = plox.had_error
+    try:
+        yield
+    finally:
+        plox.had_error = had_error
+
+
+# A token's place in a document: declaration index and index in it.
+_Place = tuple[int, int]
+
+
+class Document:
+    def __init__(self, source: str):
+        self.source = source
+        scanner = _OffsetScanner(source)
+        with _keeping_had_error():
+            scanner.scan_tokens()
+        self.declarations: list[Declaration] = []
+        self._shift = _Shift()
+        # Declarations from this one on store their position minus ``_shift``.
+        self._settled = 0
+        self._eof = scanner.tokens.pop()
+
+        run = _Run(self._eof, self.declarations, iter(()))
+        run.add(
+            scanner.tokens,
+            scanner.offsets,
+            [token.line for token in scanner.tokens],
+        )
+        self.declarations, _ = self._parse(run)
+        self._settled = len(self.declarations)
+
+    @property
+    def statements(self) -> list[stmt.Stmt | None]:
+        return [declaration.statement for declaration in self.declarations]
+
+    @property
+    def errors(self) -> list[Diagnostic]:
+        return [
+            error for declaration in self.declarations for error in declaration.errors
+        ]
+
+    @property
+    def tokens(self) -> list[Token]:
+        tokens = [
+            token for declaration in self.declarations for token in declaration.tokens
+        ]
+        return tokens + [self._eof]
+
+    def apply(self, edit: Edit) -> Reparse:
+        with _keeping_had_error():
+            return self._apply(edit)
+
+    def _apply(self, edit: Edit) -> Reparse:
+        source = self.source[: edit.start] + edit.text + self.source[edit.end :]
+        offset_delta = len(edit.text) - (edit.end - edit.start)
+        line_delta = 0
+
+        # Restart at the last token that starts before the edit: token starts
+        # are always outside strings and comments, and the edit may extend it.
+        first = self._token_before(edit.start)
+        if first is not None and self._splits_number(first):
+            first = self._previous(first)  # digits after "1." make it one number again
+        if first is None:
+            first = (0, 0)
+            scanner = _OffsetScanner(source)
+        else:
+            token = self._token(first)
+            line = token.line - token.lexeme.count("\n")
+            scanner = _OffsetScanner(source, self._offset(first), line)
+
+        edited_end = edit.start + len(edit.text)
+        resume = None
+        while not scanner.is_at_end():
+            scanner.start = scanner.current
+            count = len(scanner.tokens)
+            scanner.scan_token()
+            if len(scanner.tokens) == count or scanner.offsets[-1] < edited_end:
+                continue
+
+            match = self._token_at(scanner.offsets[-1] - offset_delta, edit.end)
+            if match is not None and _same(self._token(match), scanner.tokens[-1]):
+                # Count lines the way the scanner does, which is not always
+                # the number of newlines in the edit (block comments).
+                line_delta = scanner.tokens[-1].line - self._token(match).line
+                scanner.tokens.pop()
+                scanner.offsets.pop()
+                resume = match
+                break
+        else:
+            scanner.add_eof()
+            self._eof = scanner.tokens.pop()
+            scanner.offsets.pop()
+        if resume is not None:
+            self._eof.line += line_delta
+
+        # Parse again from the declaration holding the token before the
+        # damage, which may now continue into it.
+        index, position = first
+        reparse_from = index - 1 if position == 0 and index > 0 else index
+        following = len(self.declarations)
+        if resume is not None:
+            following = resume[0] if resume[1] == 0 else resume[0] + 1
+        following = iter(range(following, len(self.declarations)))
+        run = _Run(self._eof, self.declarations, following)
+        for old in range(reparse_from, index):
+            run.add_old(old)
+        if position > 0:
+            run.add_old(index, 0, position)
+        run.add(
+            scanner.tokens,
+            scanner.offsets,
+            [token.line for token in scanner.tokens],
+        )
+        run.moved_by = (offset_delta, line_delta)
+        if resume is not None and resume[1] > 0:
+            run.add_old(resume[0], resume[1])
+        parsed, stop = self._parse(run)
+
+        # Whatever follows the re-parsed declarations moves with the edit.
+        moved = 0
+        for old in range(self._settled, reparse_from):
+            self.declarations[old].settle()
+            moved += 1
+        for old in range(stop, self._settled):
+            self.declarations[old].defer(self._shift)
+            moved += 1
+        self._shift.offset += offset_delta
+        self._shift.lines += line_delta
+        self.declarations[reparse_from:stop] = parsed
+        self._settled = reparse_from + len(parsed)
+        self.source = source
+
+        return Reparse(
+            tokens_scanned=len(scanner.tokens),
+            declarations_parsed=len(parsed),
+            tokens_parsed=len(run.tokens),
+            declarations_moved=moved,
+        )
+
+    def _parse(self, run: _Run) -> tuple[list[Declaration], int]:
+        """Parse declarations from ``run`` until one can be reused.
+
+        Returns them and the index of the declaration parsing stopped at, or
+        the number of declarations if it reached the end.
+        """
+        parser = _CollectingParser(run)
+        declarations = []
+        while not parser.is_at_end():
+            if parser.current in run.starts:
+                return declarations, run.starts[parser.current]
+
+            first = parser.current
+            statement = parser.declaration(top_level=True)
+            errors, parser.errors = parser.errors, []
+            declarations.append(
+                run.declaration(first, parser.current, statement, errors)
+            )
+
+        return declarations, len(self.declarations)
+
+    def _token(self, place: _Place) -> Token:
+        index, position = place
+        return self.declarations[index].tokens[position]
+
+    def _offset(self, place: _Place) -> int:
+        declaration = self.declarations[place[0]]
+        return declaration.start + declaration.offsets[place[1]]
+
+    def _previous(self, place: _Place) -> _Place | None:
+        index, position = place
+        if position > 0:
+            return index, position - 1
+        if index > 0:
+            return index - 1, len(self.declarations[index - 1].tokens) - 1
+        return None
+
+    def _token_before(self, offset: int) -> _Place | None:
+        index = bisect_left(self.declarations, offset, key=_start) - 1
+        if index < 0:
+            return None
+        declaration = self.declarations[index]
+        relative = offset - declaration.start
+        return index, bisect_left(declaration.offsets, relative) - 1
+
+    def _token_at(self, offset: int, minimum: int) -> _Place | None:
+        if offset < minimum:
+            return None
+        index = bisect_right(self.declarations, offset, key=_start) - 1
+        if index < 0:
+            return None
+        declaration = self.declarations[index]
+        relative = offset - declaration.start
+        position = bisect_left(declaration.offsets, relative)
+        if position < len(declaration.offsets):
+            if declaration.offsets[position] == relative:
+                return index, position
+        return None
+
+    def _splits_number(self, dot: _Place) -> bool:
+        """Whether the token at ``dot`` is a dot right after a number."""
+        before = self._previous(dot)
+        if before is None:
+            return False
+        number = self._token(before)
+        return (
+            self._token(dot).type is TokenType.DOT
+            and number.type is TokenType.NUMBER
+            and self._offset(before) + len(number.lexeme) == self._offset(dot)
+        )
+
+
+_start = attrgetter("start")
+
+
+def _same(old: Token, new: Token) -> bool:
+    return (
+        old.type == new.type and old.lexeme == new.lexeme and old.literal == new.literal
+    )
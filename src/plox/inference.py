@@ -0,0 +1,254 @@
+"""Flow-sensitive type inference over the AST.
+
+The pass walks statements in execution order and tracks what it can prove
+about each variable. ``Binary`` and ``Unary`` nodes whose operands are proven
+to be numbers (or, for ``+``, strings) get their ``operand_type`` set, and the
+execution engines skip the runtime operand checks for them. Anything the pass
+cannot prove is left unannotated and keeps the checks and their errors.
+
+A node shared by several occurrences (see ``plox.hashcons``) is only annotated
+when every occurrence proves the same type.
+
+The rules for nodes with children are generators that yield the inference of
+each child to ``visit.trampoline``, so nesting depth is bounded by memory
+rather than by the recursion limit.
+"""
+
+from dataclasses import dataclass, field
+from enum import Enum
+from functools import singledispatch
+
+from plox import expr, numbers, stmt
+from plox.scanner import TokenType
+from plox.visit import trampoline
+
+
+class LoxType(Enum):
+    NUMBER = 1
+    STRING = 2
+    BOOL = 3
+    NIL = 4
+    UNKNOWN = 5
+
+
+@dataclass
+class Context:
+    scopes: list[dict[int, LoxType]] = field(default_factory=lambda: [{}])
+    annotated: set[int] = field(default_factory=set)
+
+    def lookup(self, symbol: int) -> dict[int, LoxType] | None:
+        for scope in reversed(self.scopes):
+            if symbol in scope:
+                return scope
+        return None
+
+    def annotate(self, node: expr.Binary | expr.Unary, operand_type: LoxType | None):
+        if id(node) not in self.annotated:
+            self.annotated.add(id(node))
+            node.operand_type = operand_type
+        elif node.operand_type is not operand_type:
+            node.operand_type = None
+
+
+_NUMERIC_OPERATORS = {
+    TokenType.MINUS,
+    TokenType.SLASH,
+    TokenType.STAR,
+    TokenType.GREATER,
+    TokenType.GREATER_EQUAL,
+    TokenType.LESS,
+    TokenType.LESS_EQUAL,
+}
+_COMPARISON_OPERATORS = {
+    TokenType.GREATER,
+    TokenType.GREATER_EQUAL,
+    TokenType.LESS,
+    TokenType.LESS_EQUAL,
+    TokenType.EQUAL_EQUAL,
+    TokenType.BANG_EQUAL,
+}
+
+
+def join(left: LoxType, right: LoxType) -> LoxType:
+    return left if left is right else LoxType.UNKNOWN
+
+
+def _snapshot(context: Context) -> list[dict[int, LoxType]]:
+    return [dict(scope) for scope in context.scopes]
+
+
+def _merge(context: Context, other: list[dict[int, LoxType]]):
+    """Join every variable's type with its type in the ``other`` scopes."""
+    for scope, other_scope in zip(context.scopes, other):
+        for symbol, value in scope.items():
+            scope[symbol] = join(value, other_scope.get(symbol, value))
+
+
+def infer(statements: list[stmt.Stmt]) -> list[stmt.Stmt]:
+    context = Context()
+    for statement in statements:
+        if statement is not None:
+            trampoline(_infer(statement, context))
+
+    return statements
+
+
+def type_of(value: object) -> LoxType:
+    if value is None:
+        return LoxType.NIL
+    if isinstance(value, bool):
+        return LoxType.BOOL
+    if numbers.is_number(value):
+        return LoxType.NUMBER
+    if isinstance(value, str):
+        return LoxType.STRING
+    return LoxType.UNKNOWN
+
+
+@singledispatch
+def _infer(node: object, context: Context) -> LoxType:
+    return LoxType.UNKNOWN
+
+
+@_infer.register
+def _(binary: expr.Binary, context: Context):
+    left = yield _infer(binary.left, context)
+    right = yield _infer(binary.right, context)
+    operator = binary.operator.type
+
+    if operator in _NUMERIC_OPERATORS:
+        proven = left is right is LoxType.NUMBER
+        context.annotate(binary, LoxType.NUMBER if proven else None)
+        if operator in _COMPARISON_OPERATORS:
+            return LoxType.BOOL
+        # Arithmetic on a vector operand returns a vector.
+        return LoxType.NUMBER if proven else LoxType.UNKNOWN
+
+    if operator is TokenType.PLUS:
+        if left is right and left in (LoxType.NUMBER, LoxType.STRING):
+            context.annotate(binary, left)
+            return left
+        context.annotate(binary, None)
+        # Once the operation returns with a string operand, it added strings.
+        if LoxType.STRING in (left, right):
+            return LoxType.STRING
+        return LoxType.UNKNOWN
+
+    return LoxType.BOOL
+
+
+@_infer.register
+def _(grouping: expr.Grouping, context: Context):
+    return (yield _infer(grouping.expression, context))
+
+
+@_infer.register
+def _(literal: expr.Literal, context: Context):
+    return type_of(literal.value)
+
+
+@_infer.register
+def _(unary: expr.Unary, context: Context):
+    right = yield _infer(unary.right, context)
+    if unary.operator.type is TokenType.MINUS:
+        proven = right is LoxType.NUMBER
+        context.annotate(unary, LoxType.NUMBER if proven else None)
+        return LoxType.NUMBER if proven else LoxType.UNKNOWN
+
+    return LoxType.BOOL
+
+
+@_infer.register
+def _(variable: expr.Variable, context: Context):
+    scope = context.lookup(variable.name.symbol)
+    return LoxType.UNKNOWN if scope is None else scope[variable.name.symbol]
+
+
+@_infer.register
+def _(logical: expr.Logical, context: Context):
+    left = yield _infer(logical.left, context)
+    skipped = _snapshot(context)
+    right = yield _infer(logical.right, context)
+    _merge(context, skipped)
+    return join(left, right)
+
+
+@_infer.register
+def _(call: expr.Call, context: Context):
+    yield _infer(call.callee, context)
+    for argument in call.arguments:
+        yield _infer(argument, context)
+    return LoxType.UNKNOWN
+
+
+@_infer.register
+def _(assign: expr.Assign, context: Context):
+    value = yield _infer(assign.value, context)
+    scope = context.lookup(assign.name.symbol)
+    if scope is not None:
+        scope[assign.name.symbol] = value
+    return value
+
+
+@_infer.register
+def _(expression: stmt.Expression, context: Context):
+    yield _infer(expression.expression, context)
+
+
+@_infer.register
+def _(print_: stmt.Print, context: Context):
+    yield _infer(print_.expression, context)
+
+
+@_infer.register
+def _(var: stmt.Var, context: Context):
+    value = LoxType.NIL
+    if var.initializer:
+        value = yield _infer(var.initializer, context)
+    context.scopes[-1][var.name.symbol] = value
+
+
+@_infer.register
+def _(block: stmt.Block, context: Context):
+    context.scopes.append({})
+    try:
+        for statement in block.statements:
+            if statement is not None:
+                yield _infer(statement, context)
+    finally:
+        context.scopes.pop()
+
+
+@_infer.register
+def _(if_: stmt.If, context: Context):
+    yield _infer(if_.condition, context)
+    before = _snapshot(context)
+    yield _infer(if_.then_branch, context)
+    after_then = _snapshot(context)
+    context.scopes = before
+    if if_.else_branch is not None:
+        yield _infer(if_.else_branch, context)
+    _merge(context, after_then)
+
+
+@_infer.register
+def _(while_: stmt.While, context: Context):
+    # Types can only widen to UNKNOWN, so this reaches a fixed point quickly.
+    while True:
+        head = _snapshot(context)
+        yield _infer(while_.condition, context)
+        yield _infer(while_.body, context)
+        _merge(context, head)
+        if context.scopes == head:
+            break
+
+    # The loop exits right after evaluating the condition.
+    yield _infer(while_.condition, context)
+
+
+@_infer.register
+def _(import_: stmt.Import, context: Context):
+    # The module may bind any global name, to a value of any type.
+    globals_ = context.scopes[0]
+    for symbol in globals_:
+        globals_[symbol] = LoxType.UNKNOWN
@@ -1,3 +1,4 @@
+import operator
 from abc import ABC, abstractmethod
 from ast import stmt
 from asyncio import Protocol
@@ -5,11 +6,18 @@ from dataclasses import dataclass
 from functools import singledispatch
 
 import plox
-from plox import expr, stmt
+from plox import budget, expr, modules, natives, numbers, stmt, streams, vector
+from plox.budget import BudgetExceeded
 from plox.environment import Environment
+from plox.hashcons import NodeTable
+from plox.inference import LoxType
+from plox.natives import LoxCallable, NativeError
 from plox.scanner import Token, TokenType
+from plox.vector import Vector
 
-environment = Environment()
+environment = natives.define(Environment())
+statements_executed = 0
+nodes: NodeTable | None = None  # that the running statements were parsed with
 
 
 def interpret(statements: list[stmt.Stmt]):
@@ -21,7 +29,16 @@ def interpret(statements: list[stmt.Stmt]):
 
 
 def execute(statement: stmt.Stmt):
-    _interpret(statement)
+    global statements_executed
+    statements_executed += 1
+    if statements_executed >= budget.next_check:
+        budget.checkpoint(statements_executed)
+    try:
+        _interpret(statement)
+    except RuntimeError as error:
+        if nodes is not None:
+            nodes.locate(error, statement)
+        raise
 
 
 def evaluate(expr: expr.Expr):
@@ -32,44 +49,89 @@ def evaluate(expr: expr.Expr):
 def _interpret(binary: expr.Binary):
     left = evaluate(binary.left)
     right = evaluate(binary.right)
+    if binary.operand_type is LoxType.NUMBER:
+        try:
+            return UNCHECKED_BINARY_OPERATIONS[binary.operator.type](left, right)
+        except ZeroDivisionError:
+            raise division_by_zero(binary.operator) from None
+    return binary_operation(binary.operator, left, right)
+
 
-    match binary.operator.type:
+def binary_operation(operator: Token, left: object, right: object):
+    if left.__class__ is Vector or right.__class__ is Vector:
+        if operator.type not in (TokenType.EQUAL_EQUAL, TokenType.BANG_EQUAL):
+            return vector.binary_operation(operator, left, right)
+
+    match operator.type:
         case TokenType.GREATER:
-            check_number_operands(binary.operator, left, right)
-            return float(left) > float(right)
+            check_number_operands(operator, left, right)
+            return left > right
         case TokenType.GREATER_EQUAL:
-            check_number_operands(binary.operator, left, right)
-            return float(left) >= float(right)
+            check_number_operands(operator, left, right)
+            return left >= right
         case TokenType.LESS:
-            check_number_operands(binary.operator, left, right)
-            return float(left) < float(right)
+            check_number_operands(operator, left, right)
+            return left < right
         case TokenType.LESS_EQUAL:
-            check_number_operands(binary.operator, left, right)
-            return float(left) <= float(right)
+            check_number_operands(operator, left, right)
+            return left <= right
 
         case TokenType.MINUS:
-            check_number_operands(binary.operator, left, right)
-            return float(left) - float(right)
+            check_number_operands(operator, left, right)
+            return numbers.subtract(left, right)
         case TokenType.SLASH:
-            check_number_operands(binary.operator, left, right)
-            return float(left) / float(right)
+            check_number_operands(operator, left, right)
+            return divide(operator, left, right)
         case TokenType.STAR:
-            check_number_operands(binary.operator, left, right)
-            return float(left) * float(right)
+            check_number_operands(operator, left, right)
+            return numbers.multiply(left, right)
 
-        case TokenType.EQUAL:
+        case TokenType.EQUAL_EQUAL:
             return left == right
         case TokenType.BANG_EQUAL:
             return not (left == right)
 
         case TokenType.PLUS:
-            if isinstance(left, float) and isinstance(right, float):
-                return float(left) + float(right)
+            if numbers.is_number(left) and numbers.is_number(right):
+                return numbers.add(left, right)
             if isinstance(left, str) and isinstance(right, str):
-                return str(left) + str(right)
-            raise RuntimeError(
-                binary.operator, "Operands must be both string or numbers"
-            )
+                return concatenate(left, right)
+            raise RuntimeError(operator, "Operands must be both string or numbers")
+
+
+def divide(operator: Token, left: int | float, right: int | float) -> float:
+    try:
+        return left / right
+    except ZeroDivisionError:
+        raise division_by_zero(operator) from None
+
+
+def division_by_zero(operator: Token) -> RuntimeError:
+    return RuntimeError(operator, "Division by zero.")
+
+
+def concatenate(left: str, right: str) -> str:
+    if len(left) + len(right) > budget.string_length_limit:
+        raise BudgetExceeded(
+            f"Exceeded the budget of {budget.string_length_limit} characters "
+            "per string."
+        )
+    return left + right
+
+
+# Used when type inference proved the operands are numbers, so no checks are
+# needed. Strings still go through ``concatenate`` for the length budget.
+# Callers turn the ``ZeroDivisionError`` of ``/`` into ``division_by_zero``.
+UNCHECKED_BINARY_OPERATIONS = {
+    TokenType.GREATER: operator.gt,
+    TokenType.GREATER_EQUAL: operator.ge,
+    TokenType.LESS: operator.lt,
+    TokenType.LESS_EQUAL: operator.le,
+    TokenType.MINUS: numbers.subtract,
+    TokenType.SLASH: operator.truediv,
+    TokenType.STAR: numbers.multiply,
+    TokenType.PLUS: numbers.add,
+}
 
 
 @_interpret.register
@@ -85,24 +147,76 @@ def _(literal: expr.Literal):
 @_interpret.register
 def _(unary: expr.Unary):
     right = evaluate(unary.right)
+    if unary.operand_type is not None:
+        return numbers.negate(right)
+    return unary_operation(unary.operator, right)
+
 
-    match unary.operator.type:
+def unary_operation(operator: Token, right: object):
+    match operator.type:
         case TokenType.MINUS:
-            check_number_operand(unary.operator, right)
-            return -float(right)
+            if right.__class__ is Vector:
+                return vector.negate(right)
+            check_number_operand(operator, right)
+            return numbers.negate(right)
         case TokenType.BANG:
             return not is_truthy(right)
 
 
 @_interpret.register
 def _(variable: expr.Variable):
-    return environment.get(variable.name)
+    return environment.get(variable.name, variable.cache)
+
+
+@_interpret.register
+def _(logical: expr.Logical):
+    left = evaluate(logical.left)
+    if logical.operator.type is TokenType.OR:
+        if left is not None and left is not False:
+            return left
+    elif left is None or left is False:
+        return left
+
+    return evaluate(logical.right)
+
+
+@_interpret.register
+def _(call: expr.Call):
+    callee = evaluate(call.callee)
+    if callee is call.native and callee is not None:
+        # The arity was checked when the call was resolved.
+        try:
+            return callee.function(*map(evaluate, call.arguments))
+        except NativeError as error:
+            raise RuntimeError(call.paren, str(error)) from None
+    return call_value(call.paren, callee, *map(evaluate, call.arguments))
+
+
+def call_value(paren: Token, callee: object, *arguments: object):
+    if not isinstance(callee, LoxCallable):
+        raise RuntimeError(paren, "Can only call functions and classes.")
+    if len(arguments) != callee.arity():
+        raise RuntimeError(
+            paren, f"Expected {callee.arity()} arguments but got {len(arguments)}."
+        )
+    try:
+        return callee.call(*arguments)
+    except NativeError as error:
+        raise RuntimeError(paren, str(error)) from None
+
+
+def call_native(paren: Token, native: natives.NativeFunction, *arguments: object):
+    """Call a native whose arity is known to match ``arguments``."""
+    try:
+        return native.function(*arguments)
+    except NativeError as error:
+        raise RuntimeError(paren, str(error)) from None
 
 
 @_interpret.register
 def _(assignment: expr.Assign):
     value = evaluate(assignment.value)
-    environment.assign(assignment.name, value)
+    environment.assign(assignment.name, value, assignment.cache)
     return value
 
 
@@ -114,7 +228,7 @@ def _(expression_statement: stmt.Expression):
 @_interpret.register
 def _(print_statement: stmt.Print):
     value = evaluate(print_statement.expression)
-    print(stringfy(value))
+    print(stringfy(value), file=streams.output())
 
 
 @_interpret.register
@@ -123,19 +237,78 @@ def _(var_declaration: stmt.Var):
     if var_declaration.initializer:
         value = evaluate(var_declaration.initializer)
 
-    environment.define(var_declaration.name.lexeme, value)
+    environment.define(var_declaration.name.symbol, value)
 
 
 @_interpret.register
 def _(block: stmt.Block):
-    execute_block(block.statements, Environment(environment))
+    if block.needs_scope:
+        execute_block(block.statements, Environment(environment))
+        return
+
+    for statement in block.statements:
+        execute(statement)
+
 
+@_interpret.register
+def _(if_statement: stmt.If):
+    condition = evaluate(if_statement.condition)
+    if condition is not None and condition is not False:
+        execute(if_statement.then_branch)
+    elif if_statement.else_branch is not None:
+        execute(if_statement.else_branch)
+
+
+@_interpret.register
+def _(while_statement: stmt.While):
+    global statements_executed
+    condition, body = while_statement.condition, while_statement.body
+    scoped, after = loop_scope(body)
+    if scoped is None:
+        while (value := evaluate(condition)) is not None and value is not False:
+            execute(body)
+        return
 
-def execute_block(statements: list[stmt.Stmt], previous_environment: Environment):
+    # Nothing can hold on to the body's scope once an iteration ends, so a
+    # single environment is cleared and reused for every iteration.
+    blocks = 1 if scoped is body else 2
+    loop_environment = Environment(environment)
+    while (value := evaluate(condition)) is not None and value is not False:
+        statements_executed += blocks
+        if statements_executed >= budget.next_check:
+            budget.checkpoint(statements_executed)
+        loop_environment.values.clear()
+        execute_block(scoped.statements, loop_environment)
+        for statement in after:
+            execute(statement)
+
+
+def loop_scope(body: stmt.Stmt) -> tuple[stmt.Block | None, list[stmt.Stmt]]:
+    """The scoped block a loop body starts with, and the statements after it.
+
+    That is the body itself when it is a scoped block, or the first statement
+    of the unscoped block a ``for`` loop pairs its body and increment in.
+    Executing the blocks themselves only counts them as statements.
+    """
+    if isinstance(body, stmt.Block):
+        if body.needs_scope:
+            return body, []
+        first = body.statements[0] if body.statements else None
+        if isinstance(first, stmt.Block) and first.needs_scope:
+            return first, body.statements[1:]
+    return None, []
+
+
+@_interpret.register
+def _(import_: stmt.Import):
+    modules.import_module(import_.keyword, import_.path, environment)
+
+
+def execute_block(statements: list[stmt.Stmt], block_environment: Environment):
     global environment
     previous_environment = environment
     try:
-        environment = previous_environment
+        environment = block_environment
         for statement in statements:
             execute(statement)
     finally:
@@ -153,14 +326,14 @@ def is_truthy(obj: object):
 
 
 def check_number_operand(operator: Token, operand: object):
-    if isinstance(operand, float):
+    if operand.__class__ in numbers.TYPES:
         return
 
     raise RuntimeError(operator, "Operand must be numbers.")
 
 
 def check_number_operands(operator: Token, left: object, right: object):
-    if isinstance(left, float) and isinstance(right, float):
+    if left.__class__ in numbers.TYPES and right.__class__ in numbers.TYPES:
         return
 
     raise RuntimeError(operator, "Operands must be numbers.")
@@ -170,7 +343,7 @@ def stringfy(value: object):
     if value is None:
         return "nil"
 
-    if isinstance(value, float):
+    if numbers.is_number(value):
         return str(f"{value:g}")
 
     return str(value)
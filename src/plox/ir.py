@@ -0,0 +1,706 @@
+"""Mid-level SSA intermediate representation.
+
+Statements are lowered into a linear list of instructions over virtual
+registers, each written by exactly one instruction. Variables declared in a
+block never reach an environment: every declaration and assignment writes a
+fresh register and reads use the register that currently holds the variable.
+Only top-level variables are defined in, and names declared outside the
+program are loaded from, the current environment, so the REPL and embedders
+still see globals. A block that would have a scope starts with ``ENTER``,
+which holds it to the environment depth budget all the same.
+
+Control flow is lowered to labels and jumps. A local variable assigned inside
+a branch or loop it was declared outside of is moved into a slot, a register
+that ``SET`` overwrites and ``GET`` reads, before the branch; slots take the
+place of phi nodes. Registers keep a single definition, and every use of a
+register comes after its definition in the code and in the same or a nested
+region, so the passes below stay valid across regions.
+
+The optimization passes work on that form:
+
+- ``propagate_copies`` replaces every use of a ``COPY`` with its source,
+- ``propagate_constants`` folds operations whose operands are constants,
+- ``eliminate_common_subexpressions`` reuses the register of an earlier,
+  identical pure operation in the same basic block, unless it is arithmetic
+  that could make a new vector,
+- ``eliminate_dead_values`` drops pure instructions nobody reads.
+"""
+
+import math
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from enum import IntEnum
+from functools import singledispatch
+
+import plox
+from plox import budget, expr, interpreter, modules, numbers, stmt, streams, visit
+from plox.inference import LoxType
+from plox.scanner import Token, TokenType
+
+NONE = -1
+
+
+class Op(IntEnum):
+    CONST = 0  # dest <- value
+    COPY = 1  # dest <- a
+    LOAD = 2  # dest <- environment[token]
+    DEFINE = 3  # environment[token] := a
+    STORE = 4  # environment[token] = a
+    BINARY = 5  # dest <- a token b
+    UNARY = 6  # dest <- token a
+    PRINT = 7  # print a
+    LABEL = 8  # jump target number value
+    JUMP = 9  # go to label value
+    JUMP_IF_FALSE = 10  # go to label value if a is falsey
+    JUMP_IF_TRUE = 11  # go to label value if a is truthy
+    GET = 12  # dest <- slot value
+    SET = 13  # slot value <- a
+    NOP = 14  # only carries statement counts
+    CALL = 15  # dest <- a(*registers in value)
+    IMPORT = 16  # import the module at path value
+    ENTER = 17  # enter a scope value levels below the environment
+
+
+PURE = {Op.CONST, Op.COPY, Op.BINARY, Op.UNARY, Op.GET}
+_NO_DEST = {
+    Op.DEFINE,
+    Op.STORE,
+    Op.PRINT,
+    Op.LABEL,
+    Op.JUMP,
+    Op.JUMP_IF_FALSE,
+    Op.JUMP_IF_TRUE,
+    Op.SET,
+    Op.NOP,
+    Op.IMPORT,
+    Op.ENTER,
+}
+_JUMPS = {Op.JUMP, Op.JUMP_IF_FALSE, Op.JUMP_IF_TRUE}
+_ARITHMETIC = {TokenType.PLUS, TokenType.MINUS, TokenType.STAR, TokenType.SLASH}
+
+
+@dataclass(slots=True)
+class Instruction:
+    op: Op
+    dest: int = NONE
+    a: int = NONE
+    b: int = NONE
+    token: Token | None = None
+    value: object = None
+    operand_type: LoxType | None = None
+    statements: int = 0  # how many source statements start here
+
+    def uses(self) -> tuple[int, ...]:
+        registers = tuple(register for register in (self.a, self.b) if register != NONE)
+        if self.op is Op.CALL:
+            registers += self.value
+        return registers
+
+    def may_raise(self) -> bool:
+        match self.op:
+            case Op.CONST | Op.COPY | Op.GET | Op.DEFINE | Op.PRINT:
+                return False
+            case Op.BINARY:
+                if self.token.type in (TokenType.EQUAL_EQUAL, TokenType.BANG_EQUAL):
+                    return False
+                return self.operand_type is None or self.token.type is TokenType.SLASH
+            case Op.UNARY:
+                return self.token.type is TokenType.MINUS and self.operand_type is None
+        return True
+
+
+@dataclass
+class Program:
+    code: list[Instruction] = field(default_factory=list)
+    registers: int = 0
+    statements: int = 0  # statements that start after the last instruction
+
+    def __str__(self):
+        return "\n".join(_format(instruction) for instruction in self.code)
+
+
+def _format(instruction: Instruction) -> str:
+    op = instruction.op
+    if op is Op.LABEL:
+        return f"L{instruction.value}:"
+
+    dest = f"r{instruction.dest} = " if instruction.dest != NONE else ""
+    operands = [f"r{register}" for register in instruction.uses()]
+    if op in (Op.CONST, Op.IMPORT, Op.ENTER):
+        operands = [repr(instruction.value)]
+    elif op in _JUMPS:
+        operands.append(f"L{instruction.value}")
+    elif op in (Op.GET, Op.SET):
+        operands.insert(0, f"s{instruction.value}")
+    elif instruction.token is not None and op is not Op.CALL:
+        operands.insert(0, instruction.token.lexeme)
+    return f"{dest}{op.name.lower()} {' '.join(operands)}".rstrip()
+
+
+# Lowering
+
+
+@dataclass
+class _Slot:
+    register: int
+
+
+class _Lowering:
+    def __init__(self):
+        self.program = Program()
+        self.scopes: list[dict[int, int | _Slot]] = []
+        self.depth = 0  # scoped blocks the code being lowered is nested in
+        self.globals: dict[int, int] = {}  # known values of global names
+        self.pending_statements = 0
+        self.labels = 0
+
+    def register(self) -> int:
+        self.program.registers += 1
+        return self.program.registers - 1
+
+    def emit(self, op: Op, **fields) -> int:
+        if op not in _NO_DEST:
+            fields["dest"] = self.register()
+        instruction = Instruction(op, statements=self.pending_statements, **fields)
+        self.pending_statements = 0
+        self.program.code.append(instruction)
+        return instruction.dest
+
+    def label(self) -> int:
+        self.labels += 1
+        return self.labels - 1
+
+    def place(self, label: int):
+        # Statements starting here run once, not every time the label is hit.
+        if self.pending_statements:
+            self.emit(Op.NOP)
+        self.program.code.append(Instruction(Op.LABEL, value=label))
+
+    def lookup(self, symbol: int) -> dict | None:
+        for scope in reversed(self.scopes):
+            if symbol in scope:
+                return scope
+        if symbol in self.globals:
+            return self.globals
+        return None
+
+    def read(self, name: Token) -> int:
+        scope = self.lookup(name.symbol)
+        if scope is None:
+            # The first load of an outside name either fails or tells us its
+            # value.
+            register = self.emit(Op.LOAD, token=name)
+            self.globals[name.symbol] = register
+            return register
+
+        value = scope[name.symbol]
+        if isinstance(value, _Slot):
+            return self.emit(Op.GET, value=value.register)
+        return value
+
+    def write(self, name: Token, register: int):
+        scope = self.lookup(name.symbol)
+        if scope is None or scope is self.globals:
+            self.emit(Op.STORE, a=register, token=name)
+            self.globals[name.symbol] = register
+        elif isinstance(scope[name.symbol], _Slot):
+            self.emit(Op.SET, a=register, value=scope[name.symbol].register)
+        else:
+            scope[name.symbol] = register
+
+    def demote(self, nodes: list[expr.Expr | stmt.Stmt]):
+        """Move locals that ``nodes`` assign into slots before branching."""
+        for symbol in _assigned(nodes):
+            scope = self.lookup(symbol)
+            if scope is None or scope is self.globals:
+                continue
+            if not isinstance(scope[symbol], _Slot):
+                slot = _Slot(self.register())
+                self.emit(Op.SET, a=scope[symbol], value=slot.register)
+                scope[symbol] = slot
+
+    @contextmanager
+    def region(self, nodes: list[expr.Expr | stmt.Stmt]):
+        """Lower code that may run zero or several times.
+
+        Known global values the region assigns are forgotten inside it, and
+        whatever it learns about globals is forgotten after it.
+        """
+        assigned = _assigned(nodes)
+        known = {s: r for s, r in self.globals.items() if s not in assigned}
+        self.globals = dict(known)
+        try:
+            yield
+        finally:
+            self.globals = known
+
+
+def _assigned(nodes: list[expr.Expr | stmt.Stmt]) -> set[int]:
+    return {
+        node.name.symbol for node in visit.walk(nodes) if isinstance(node, expr.Assign)
+    }
+
+
+def lower(statements: list[stmt.Stmt]) -> Program:
+    lowering = _Lowering()
+    for statement in statements:
+        _lower_statement(statement, lowering)
+    lowering.program.statements = lowering.pending_statements
+    return lowering.program
+
+
+@singledispatch
+def _lower_statement(statement: stmt.Stmt, lowering: _Lowering):
+    raise TypeError(f"Cannot lower {type(statement).__name__}")
+
+
+@_lower_statement.register
+def _(expression: stmt.Expression, lowering: _Lowering):
+    lowering.pending_statements += 1
+    _lower(expression.expression, lowering)
+
+
+@_lower_statement.register
+def _(print_: stmt.Print, lowering: _Lowering):
+    lowering.pending_statements += 1
+    lowering.emit(Op.PRINT, a=_lower(print_.expression, lowering))
+
+
+@_lower_statement.register
+def _(var: stmt.Var, lowering: _Lowering):
+    lowering.pending_statements += 1
+    if var.initializer is None:
+        value = lowering.emit(Op.CONST, value=None)
+    else:
+        value = _lower(var.initializer, lowering)
+
+    register = lowering.emit(Op.COPY, a=value)
+    if lowering.scopes:
+        lowering.scopes[-1][var.name.symbol] = register
+    else:
+        lowering.emit(Op.DEFINE, a=register, token=var.name)
+        lowering.globals[var.name.symbol] = register
+
+
+@_lower_statement.register
+def _(block: stmt.Block, lowering: _Lowering):
+    lowering.pending_statements += 1
+    if block.needs_scope:
+        lowering.depth += 1
+        lowering.emit(Op.ENTER, value=lowering.depth)
+    lowering.scopes.append({})
+    for statement in block.statements:
+        _lower_statement(statement, lowering)
+    lowering.scopes.pop()
+    if block.needs_scope:
+        lowering.depth -= 1
+
+
+@_lower_statement.register
+def _(if_: stmt.If, lowering: _Lowering):
+    lowering.pending_statements += 1
+    condition = _lower(if_.condition, lowering)
+    branches = [if_.then_branch, if_.else_branch]
+    lowering.demote(branches)
+
+    otherwise, end = lowering.label(), lowering.label()
+    lowering.emit(Op.JUMP_IF_FALSE, a=condition, value=otherwise)
+    with lowering.region(branches):
+        _lower_statement(if_.then_branch, lowering)
+    if if_.else_branch is not None:
+        lowering.emit(Op.JUMP, value=end)
+    lowering.place(otherwise)
+    if if_.else_branch is not None:
+        with lowering.region(branches):
+            _lower_statement(if_.else_branch, lowering)
+        lowering.place(end)
+
+
+@_lower_statement.register
+def _(while_: stmt.While, lowering: _Lowering):
+    lowering.pending_statements += 1
+    loop = [while_.condition, while_.body]
+    lowering.demote(loop)
+
+    head, end = lowering.label(), lowering.label()
+    with lowering.region(loop):
+        lowering.place(head)
+        condition = _lower(while_.condition, lowering)
+        lowering.emit(Op.JUMP_IF_FALSE, a=condition, value=end)
+        _lower_statement(while_.body, lowering)
+        lowering.emit(Op.JUMP, value=head)
+        lowering.place(end)
+
+
+@_lower_statement.register
+def _(import_: stmt.Import, lowering: _Lowering):
+    lowering.pending_statements += 1
+    lowering.emit(Op.IMPORT, token=import_.keyword, value=import_.path)
+    # The module may bind any global name.
+    lowering.globals.clear()
+
+
+@singledispatch
+def _lower(node: expr.Expr, lowering: _Lowering) -> int:
+    raise TypeError(f"Cannot lower {type(node).__name__}")
+
+
+@_lower.register
+def _(literal: expr.Literal, lowering: _Lowering):
+    return lowering.emit(Op.CONST, value=literal.value)
+
+
+@_lower.register
+def _(grouping: expr.Grouping, lowering: _Lowering):
+    return _lower(grouping.expression, lowering)
+
+
+@_lower.register
+def _(binary: expr.Binary, lowering: _Lowering):
+    left = _lower(binary.left, lowering)
+    right = _lower(binary.right, lowering)
+    return lowering.emit(
+        Op.BINARY,
+        a=left,
+        b=right,
+        token=binary.operator,
+        operand_type=binary.operand_type,
+    )
+
+
+@_lower.register
+def _(logical: expr.Logical, lowering: _Lowering):
+    left = _lower(logical.left, lowering)
+    lowering.demote([logical.right])
+    result = _Slot(lowering.register())
+    lowering.emit(Op.SET, a=left, value=result.register)
+
+    end = lowering.label()
+    jump = (
+        Op.JUMP_IF_TRUE if logical.operator.type is TokenType.OR else Op.JUMP_IF_FALSE
+    )
+    lowering.emit(jump, a=left, value=end)
+    with lowering.region([logical.right]):
+        right = _lower(logical.right, lowering)
+        lowering.emit(Op.SET, a=right, value=result.register)
+    lowering.place(end)
+    return lowering.emit(Op.GET, value=result.register)
+
+
+@_lower.register
+def _(call: expr.Call, lowering: _Lowering):
+    callee = _lower(call.callee, lowering)
+    arguments = tuple(_lower(argument, lowering) for argument in call.arguments)
+    return lowering.emit(Op.CALL, a=callee, token=call.paren, value=arguments)
+
+
+@_lower.register
+def _(unary: expr.Unary, lowering: _Lowering):
+    right = _lower(unary.right, lowering)
+    return lowering.emit(
+        Op.UNARY, a=right, token=unary.operator, operand_type=unary.operand_type
+    )
+
+
+@_lower.register
+def _(variable: expr.Variable, lowering: _Lowering):
+    return lowering.read(variable.name)
+
+
+@_lower.register
+def _(assign: expr.Assign, lowering: _Lowering):
+    value = _lower(assign.value, lowering)
+    register = lowering.emit(Op.COPY, a=value)
+    lowering.write(assign.name, register)
+    return register
+
+
+# Passes
+
+
+def optimize(program: Program) -> Program:
+    propagate_copies(program)
+    propagate_constants(program)
+    eliminate_common_subexpressions(program)
+    eliminate_dead_values(program)
+    return program
+
+
+def propagate_copies(program: Program):
+    sources: dict[int, int] = {}
+    for instruction in program.code:
+        _rename(instruction, sources)
+        if instruction.op is Op.COPY:
+            sources[instruction.dest] = instruction.a
+    _compact(program, lambda instruction: instruction.op is not Op.COPY)
+
+
+def propagate_constants(program: Program):
+    constants: dict[int, object] = {}
+    for instruction in program.code:
+        if instruction.op is Op.CONST:
+            constants[instruction.dest] = instruction.value
+            continue
+
+        if instruction.op not in (Op.BINARY, Op.UNARY):
+            continue
+        if not all(register in constants for register in instruction.uses()):
+            continue
+
+        operands = [constants[register] for register in instruction.uses()]
+        try:
+            value = _evaluate(instruction, *operands)
+        except (RuntimeError, ArithmeticError):
+            continue  # leave it for the error to happen at run time
+
+        instruction.op = Op.CONST
+        instruction.value = value
+        instruction.a = instruction.b = NONE
+        instruction.token = None
+        instruction.operand_type = None
+        constants[instruction.dest] = value
+
+
+def eliminate_common_subexpressions(program: Program):
+    available: dict[tuple, int] = {}
+    replacements: dict[int, int] = {}
+    for instruction in program.code:
+        _rename(instruction, replacements)
+        if instruction.op is Op.LABEL or instruction.op in _JUMPS:
+            available.clear()  # a new basic block starts
+            continue
+        key = _expression_key(instruction)
+        if key is None:
+            continue
+        if key in available:
+            replacements[instruction.dest] = available[key]
+        else:
+            available[key] = instruction.dest
+    _compact(program, lambda instruction: instruction.dest not in replacements)
+
+
+def eliminate_dead_values(program: Program):
+    used: set[int] = set()
+    dead: set[int] = set()
+    for instruction in reversed(program.code):
+        if (
+            instruction.op in PURE
+            and instruction.dest not in used
+            and not instruction.may_raise()
+        ):
+            dead.add(instruction.dest)
+        else:
+            used.update(instruction.uses())
+    _compact(program, lambda instruction: instruction.dest not in dead)
+
+
+def _expression_key(instruction: Instruction) -> tuple | None:
+    match instruction.op:
+        case Op.CONST:
+            value = instruction.value
+            # Keep 0.0 and -0.0 apart, they print differently.
+            sign = math.copysign(1, value) if isinstance(value, float) else None
+            return (Op.CONST, type(value), value, sign)
+        case Op.BINARY | Op.UNARY:
+            # Arithmetic on a vector makes a new one, and vectors compare by
+            # identity, so only proven numbers are reused.
+            if (
+                instruction.operand_type is None
+                and instruction.token.type in _ARITHMETIC
+            ):
+                return None
+            return (
+                instruction.op,
+                instruction.token.type,
+                instruction.a,
+                instruction.b,
+            )
+    return None
+
+
+def _rename(instruction: Instruction, replacements: dict[int, int]):
+    if instruction.a in replacements:
+        instruction.a = replacements[instruction.a]
+    if instruction.b in replacements:
+        instruction.b = replacements[instruction.b]
+    if instruction.op is Op.CALL:
+        instruction.value = tuple(replacements.get(r, r) for r in instruction.value)
+
+
+def _compact(program: Program, keep):
+    """Remove instructions, moving their statement starts to the next one."""
+    code = []
+    carried = 0
+    for instruction in program.code:
+        if instruction.op is Op.LABEL and carried:
+            code.append(Instruction(Op.NOP, statements=carried))
+            carried = 0
+        if keep(instruction):
+            instruction.statements += carried
+            carried = 0
+            code.append(instruction)
+        else:
+            carried += instruction.statements
+    program.code = code
+    program.statements += carried
+
+
+def _evaluate(instruction: Instruction, *operands):
+    if instruction.op is Op.UNARY:
+        return interpreter.unary_operation(instruction.token, *operands)
+    return interpreter.binary_operation(instruction.token, *operands)
+
+
+# Execution
+
+
+def interpret(program: Program):
+    registers = [None] * program.registers
+    code = program.code
+    labels = {
+        instruction.value: index
+        for index, instruction in enumerate(code)
+        if instruction.op is Op.LABEL
+    }
+    executed = 0
+    check = budget.next_check - interpreter.statements_executed
+    pc = 0
+    try:
+        while pc < len(code):
+            instruction = code[pc]
+            executed += instruction.statements
+            pc += 1
+            label = _HANDLERS[instruction.op](instruction, registers)
+            if label is not None:
+                pc = labels[label]
+                if executed >= check:
+                    interpreter.statements_executed += executed
+                    executed = 0
+                    budget.checkpoint(interpreter.statements_executed)
+                    check = budget.next_check - interpreter.statements_executed
+    except RuntimeError as error:
+        plox.runtime_error(error)
+    else:
+        executed += program.statements
+    finally:
+        interpreter.statements_executed += executed
+
+
+def _const(instruction: Instruction, registers: list):
+    registers[instruction.dest] = instruction.value
+
+
+def _copy(instruction: Instruction, registers: list):
+    registers[instruction.dest] = registers[instruction.a]
+
+
+def _load(instruction: Instruction, registers: list):
+    registers[instruction.dest] = interpreter.environment.get(instruction.token)
+
+
+def _define(instruction: Instruction, registers: list):
+    interpreter.environment.define(instruction.token.symbol, registers[instruction.a])
+
+
+def _store(instruction: Instruction, registers: list):
+    interpreter.environment.assign(instruction.token, registers[instruction.a])
+
+
+def _binary(instruction: Instruction, registers: list):
+    left = registers[instruction.a]
+    right = registers[instruction.b]
+    if instruction.operand_type is LoxType.NUMBER:
+        operation = interpreter.UNCHECKED_BINARY_OPERATIONS[instruction.token.type]
+        try:
+            registers[instruction.dest] = operation(left, right)
+        except ZeroDivisionError:
+            raise interpreter.division_by_zero(instruction.token) from None
+    else:
+        registers[instruction.dest] = interpreter.binary_operation(
+            instruction.token, left, right
+        )
+
+
+def _unary(instruction: Instruction, registers: list):
+    right = registers[instruction.a]
+    if instruction.operand_type is not None:
+        registers[instruction.dest] = numbers.negate(right)
+    else:
+        registers[instruction.dest] = interpreter.unary_operation(
+            instruction.token, right
+        )
+
+
+def _print(instruction: Instruction, registers: list):
+    print(interpreter.stringfy(registers[instruction.a]), file=streams.output())
+
+
+def _call(instruction: Instruction, registers: list):
+    callee = registers[instruction.a]
+    arguments = map(registers.__getitem__, instruction.value)
+    registers[instruction.dest] = interpreter.call_value(
+        instruction.token, callee, *arguments
+    )
+
+
+def _import(instruction: Instruction, registers: list):
+    modules.import_module(instruction.token, instruction.value, interpreter.environment)
+
+
+def _nothing(instruction: Instruction, registers: list):
+    pass
+
+
+def _enter(instruction: Instruction, registers: list):
+    # No environment is made, but the scope counts against the depth budget
+    # as if it were.
+    if interpreter.environment.depth + instruction.value > budget.depth_limit:
+        raise budget.BudgetExceeded(
+            f"Exceeded the budget of {budget.depth_limit} nested environments."
+        )
+
+
+def _jump(instruction: Instruction, registers: list):
+    return instruction.value
+
+
+def _jump_if_false(instruction: Instruction, registers: list):
+    value = registers[instruction.a]
+    if value is None or value is False:
+        return instruction.value
+
+
+def _jump_if_true(instruction: Instruction, registers: list):
+    value = registers[instruction.a]
+    if value is not None and value is not False:
+        return instruction.value
+
+
+def _get(instruction: Instruction, registers: list):
+    registers[instruction.dest] = registers[instruction.value]
+
+
+def _set(instruction: Instruction, registers: list):
+    registers[instruction.value] = registers[instruction.a]
+
+
+_HANDLERS = (
+    _const,
+    _copy,
+    _load,
+    _define,
+    _store,
+    _binary,
+    _unary,
+    _print,
+    _nothing,
+    _jump,
+    _jump_if_false,
+    _jump_if_true,
+    _get,
+    _set,
+    _nothing,
+    _call,
+    _import,
+    _enter,
+)
@@ -0,0 +1,481 @@
+"""Tracing JIT for hot blocks of the tree-walking interpreter.
+
+Once enabled, every execution of a ``stmt.Block`` is counted, including each
+iteration of a loop whose body is a block. When a block
+crosses the threshold, the next execution records the environment shape it
+runs in (which enclosing environment holds each outer variable) and the types
+of those variables, and generates a Python function specialized for them:
+
+- outer variables are read from the environment dict that held them and kept
+  in Python locals, assignments are written back to that dict,
+- variables declared in the block (and nested blocks) are plain locals, so no
+  ``Environment`` is created,
+- operations whose operand types are known along the trace use Python
+  operators directly, with the range check that keeps int results exact
+  (see ``plox.numbers``), the rest call the interpreter's checked operations,
+- ``if``, ``while``, ``and`` and ``or`` become their Python counterparts,
+  with the types at a loop head computed as a fixed point over its body,
+- a call bound to a native skips the callable and arity checks,
+- loops check the budget in force (see ``plox.budget``) at their head.
+
+The function starts with guards that re-check the recorded shape and types
+before anything is executed. When a guard fails, the block runs through the
+generic interpreter instead; a block whose guards keep failing is traced
+again.
+"""
+
+from collections.abc import Callable
+from dataclasses import dataclass
+
+from plox import budget, expr, interpreter, numbers, stmt, streams
+from plox.environment import Environment
+from plox.inference import LoxType, join, type_of
+from plox.scanner import Token, TokenType
+
+THRESHOLD = 50
+
+_threshold = THRESHOLD
+_generic_block = None
+_MISSING = object()
+
+
+@dataclass
+class Trace:
+    function: Callable[[Environment], bool] | None  # None if it can't compile
+    source: str = ""
+    guard_failures: int = 0
+
+
+def enable(threshold: int = THRESHOLD):
+    """Install the tracing ``stmt.Block`` handler in the interpreter."""
+    global _threshold, _generic_block
+    _threshold = threshold
+    if _generic_block is None:
+        _generic_handlers.update(
+            (cls, interpreter._interpret.dispatch(cls)) for cls in _HANDLERS
+        )
+        _generic_block = _generic_handlers[stmt.Block]
+        for cls, handler in _HANDLERS.items():
+            interpreter._interpret.register(cls, handler)
+
+
+def disable():
+    global _generic_block
+    if _generic_block is not None:
+        for cls, handler in _generic_handlers.items():
+            interpreter._interpret.register(cls, handler)
+        _generic_block = None
+
+
+def _block(block: stmt.Block):
+    trace = block.trace
+    if trace is None:
+        block.executions += 1
+        if block.executions < _threshold:
+            return _generic_block(block)
+        trace = block.trace = record(block, interpreter.environment)
+
+    if trace.function is not None:
+        if trace.function(interpreter.environment):
+            return
+        trace.guard_failures += 1
+        if trace.guard_failures >= _threshold:
+            block.trace = None
+            block.executions = 0
+
+    _generic_block(block)
+
+
+def _while(while_: stmt.While):
+    # Run every iteration through the handlers so a block body is counted and
+    # its trace used; a cold body gets a fresh environment per iteration.
+    condition, body = while_.condition, while_.body
+    while (value := interpreter.evaluate(condition)) is not None and value is not False:
+        interpreter.execute(body)
+
+
+_HANDLERS = {stmt.Block: _block, stmt.While: _while}
+_generic_handlers = {}
+
+
+def record(block: stmt.Block, environment: Environment) -> Trace:
+    """Compile ``block`` for the shape and types of ``environment``."""
+    compiler = _Compiler(environment)
+    try:
+        compiler.block(block)
+    except _Unsupported:
+        return Trace(None)
+
+    source = compiler.source()
+    namespace = dict(compiler.constants)
+    exec(compile(source, f"<trace {id(block):x}>", "exec"), namespace)
+    return Trace(namespace["trace"], source)
+
+
+class _Unsupported(Exception):
+    pass
+
+
+# Code generation
+
+_GUARDS = {
+    LoxType.NUMBER: "{0}.__class__ is not float and {0}.__class__ is not int",
+    LoxType.STRING: "{0}.__class__ is not str",
+    LoxType.BOOL: "{0}.__class__ is not bool",
+    LoxType.NIL: "{0} is not None",
+    LoxType.UNKNOWN: "{0} is _MISSING",
+}
+_OPERATORS = {
+    TokenType.GREATER: ">",
+    TokenType.GREATER_EQUAL: ">=",
+    TokenType.LESS: "<",
+    TokenType.LESS_EQUAL: "<=",
+    TokenType.MINUS: "-",
+    TokenType.STAR: "*",
+    TokenType.PLUS: "+",
+}
+_COMPARISONS = {
+    TokenType.GREATER,
+    TokenType.GREATER_EQUAL,
+    TokenType.LESS,
+    TokenType.LESS_EQUAL,
+}
+
+
+@dataclass
+class _Outer:
+    local: str  # the Python local holding its current value
+    hops: int  # how many environments up it lives
+
+
+class _Compiler:
+    def __init__(self, environment: Environment):
+        self.environment = environment
+        self.constants: dict[str, object] = {
+            "_MISSING": _MISSING,
+            "_interpreter": interpreter,
+            "_binary": interpreter.binary_operation,
+            "_unary": interpreter.unary_operation,
+            "_truthy": interpreter.is_truthy,
+            "_stringfy": interpreter.stringfy,
+            "_output": streams.output,
+            "_call": interpreter.call_value,
+            "_native": interpreter.call_native,
+            "_concat": interpreter.concatenate,
+            "_multiply": numbers.multiply,
+            "_divide": interpreter.divide,
+            "_negate": numbers.negate,
+            "_checkpoint": _checkpoint,
+            "_budget": budget,
+            "_set": _set,
+        }
+        self.guards: list[str] = []
+        self.body: list[str] = []
+        self.indent = 2
+        self.scopes: list[dict[int, str]] = []
+        self.outer: dict[int, _Outer] = {}
+        self.types: dict[str, LoxType] = {}
+        self.entry_types: dict[str, LoxType] = {}  # of outer variables
+        self.depth = 0  # deepest environment the guards walk to
+        self.locals = 0
+
+    def source(self) -> str:
+        lines = ["def trace(environment):", "    d0 = environment.values"]
+        for hop in range(1, self.depth + 1):
+            previous = "environment" if hop == 1 else f"e{hop - 1}"
+            lines += [
+                f"    e{hop} = {previous}.enclosing",
+                f"    if e{hop} is None:",
+                "        return False",
+                f"    d{hop} = e{hop}.values",
+            ]
+        lines += self.guards
+        lines += [
+            "    s = 0",
+            "    c = _budget.next_check - _interpreter.statements_executed",
+            "    try:",
+        ]
+        lines += self.body or ["        pass"]
+        lines += [
+            "    finally:",
+            "        _interpreter.statements_executed += s",
+            "    return True",
+        ]
+        return "\n".join(lines) + "\n"
+
+    def constant(self, value: object) -> str:
+        name = f"k{len(self.constants)}"
+        self.constants[name] = value
+        return name
+
+    def emit(self, line: str):
+        self.body.append("    " * self.indent + line)
+
+    def fresh(self, prefix: str = "v") -> str:
+        self.locals += 1
+        return f"{prefix}{self.locals}"
+
+    def block(self, block: stmt.Block):
+        self.scopes.append({})
+        for statement in block.statements:
+            self.statement(statement)
+        self.scopes.pop()
+
+    def statement(self, statement: stmt.Stmt):
+        self.emit("s += 1")
+        _compile_statement(statement, self)
+
+    def nested(self, statement: stmt.Stmt):
+        self.indent += 1
+        self.statement(statement)
+        self.indent -= 1
+
+    def join(self, other: dict[str, LoxType]):
+        """Join ``types`` with the ``other`` types of a path not taken.
+
+        An outer variable first seen on this path still has its entry type
+        on the other one.
+        """
+        for local, value_type in self.types.items():
+            other_type = other.get(local, self.entry_types.get(local, value_type))
+            self.types[local] = join(value_type, other_type)
+
+    def loop_types(self, while_: stmt.While):
+        """Widen ``types`` to what holds at the head of every iteration."""
+        body = len(self.body)
+        while True:
+            head = dict(self.types)
+            outer = len(self.outer)
+            _compile(while_.condition, self)
+            self.statement(while_.body)
+            self.join(head)
+            # Locals declared in the body are fresh on every pass; only the
+            # variables live at the head matter.
+            widened = any(self.types[local] != head[local] for local in head)
+            if not widened and len(self.outer) == outer:
+                break
+        del self.body[body:]
+
+    def variable(self, name: Token) -> tuple[str, _Outer | None]:
+        """The local holding ``name``, and where it lives if it is outer."""
+        for scope in reversed(self.scopes):
+            if name.symbol in scope:
+                return scope[name.symbol], None
+
+        if name.symbol not in self.outer:
+            self.outer[name.symbol] = self.guard(name)
+        outer = self.outer[name.symbol]
+        return outer.local, outer
+
+    def guard(self, name: Token) -> _Outer:
+        hops = 0
+        environment = self.environment
+        while environment is not None and name.symbol not in environment.values:
+            environment = environment.enclosing
+            hops += 1
+        if environment is None:
+            raise _Unsupported(name.lexeme)
+
+        symbol = name.symbol
+        local = self.fresh("o")
+        value_type = type_of(environment.values[symbol])
+        self.depth = max(self.depth, hops)
+        self.types[local] = self.entry_types[local] = value_type
+        for nearer in range(hops):
+            self.guards += [f"    if {symbol} in d{nearer}:", "        return False"]
+        self.guards += [
+            f"    {local} = d{hops}.get({symbol}, _MISSING)",
+            f"    if {_GUARDS[value_type].format(local)}:",
+            "        return False",
+        ]
+        return _Outer(local, hops)
+
+
+def _checkpoint() -> int:
+    budget.checkpoint(interpreter.statements_executed)
+    return budget.next_check - interpreter.statements_executed
+
+
+def _set(values: dict[int, object], symbol: int, value: object):
+    values[symbol] = value
+    return value
+
+
+def _compile_statement(statement: stmt.Stmt, compiler: _Compiler):
+    match statement:
+        case stmt.Expression(expr.Assign() as assign):
+            value, value_type = _compile(assign.value, compiler)
+            compiler.emit(_store(assign.name, value, value_type, compiler))
+        case stmt.Expression(expression):
+            compiler.emit(_compile(expression, compiler)[0])
+        case stmt.Print(expression):
+            value = _compile(expression, compiler)[0]
+            compiler.emit(f"print(_stringfy({value}), file=_output())")
+        case stmt.Var(name, initializer):
+            value, value_type = "None", LoxType.NIL
+            if initializer is not None:
+                value, value_type = _compile(initializer, compiler)
+            local = compiler.fresh()
+            compiler.emit(f"{local} = {value}")
+            compiler.types[local] = value_type
+            compiler.scopes[-1][name.symbol] = local
+        case stmt.Block():
+            compiler.block(statement)
+        case stmt.If(condition, then_branch, else_branch):
+            condition, condition_type = _compile(condition, compiler)
+            compiler.emit(f"if {_test(condition, condition_type, compiler)}:")
+            before = dict(compiler.types)
+            compiler.nested(then_branch)
+            if else_branch is not None:
+                after_then = compiler.types
+                compiler.types = compiler.entry_types | before
+                compiler.emit("else:")
+                compiler.nested(else_branch)
+                compiler.join(after_then)
+            else:
+                compiler.join(before)
+        case stmt.While(condition, body):
+            compiler.loop_types(statement)
+            compiler.emit("while True:")
+            compiler.indent += 1
+            compiler.emit("if s >= c:")
+            compiler.emit("    _interpreter.statements_executed += s")
+            compiler.emit("    s = 0")
+            compiler.emit("    c = _checkpoint()")
+            condition, condition_type = _compile(condition, compiler)
+            after_condition = dict(compiler.types)
+            compiler.emit(f"if not {_test(condition, condition_type, compiler)}:")
+            compiler.emit("    break")
+            compiler.statement(body)
+            compiler.indent -= 1
+            compiler.types = after_condition
+        case _:
+            raise _Unsupported(type(statement).__name__)
+
+
+def _test(source: str, source_type: LoxType, compiler: _Compiler) -> str:
+    """A Python condition that is true when the Lox value is truthy."""
+    if source_type is LoxType.BOOL:
+        return source
+    return _truthy(compiler.fresh("t"), source)
+
+
+def _truthy(temporary: str, source: str) -> str:
+    return f"(({temporary} := {source}) is not None and {temporary} is not False)"
+
+
+def _store(name: Token, value: str, value_type: LoxType, compiler: _Compiler) -> str:
+    local, outer = compiler.variable(name)
+    compiler.types[local] = value_type
+    if outer is None:
+        return f"{local} = {value}"
+    return f"{local} = d{outer.hops}[{name.symbol}] = {value}"
+
+
+def _compile(node: expr.Expr, compiler: _Compiler) -> tuple[str, LoxType]:
+    """Python source for ``node`` and the type its value is known to have."""
+    match node:
+        case expr.Literal(value):
+            return compiler.constant(value), type_of(value)
+        case expr.Grouping(expression):
+            return _compile(expression, compiler)
+        case expr.Variable(name):
+            local, _ = compiler.variable(name)
+            return local, compiler.types[local]
+        case expr.Assign(name, value):
+            value, value_type = _compile(value, compiler)
+            local, outer = compiler.variable(name)
+            compiler.types[local] = value_type
+            if outer is None:
+                return f"({local} := {value})", value_type
+            return (
+                f"_set(d{outer.hops}, {name.symbol}, ({local} := {value}))",
+                value_type,
+            )
+        case expr.Logical(left, operator, right):
+            left, left_type = _compile(left, compiler)
+            temporary = compiler.fresh("t")
+            test = _truthy(temporary, left)
+            before = dict(compiler.types)
+            right, right_type = _compile(right, compiler)
+            compiler.join(before)
+            if operator.type is TokenType.OR:
+                source = f"({temporary} if {test} else {right})"
+            else:
+                source = f"({right} if {test} else {temporary})"
+            return source, join(left_type, right_type)
+        case expr.Unary(operator, right):
+            right, right_type = _compile(right, compiler)
+            if operator.type is TokenType.BANG:
+                if right_type is LoxType.BOOL:
+                    return f"(not {right})", LoxType.BOOL
+                return f"(not _truthy({right}))", LoxType.BOOL
+            if right_type is LoxType.NUMBER:
+                return f"_negate({right})", LoxType.NUMBER
+            return f"_unary({compiler.constant(operator)}, {right})", LoxType.UNKNOWN
+        case expr.Binary(left, operator, right):
+            return _compile_binary(node, compiler)
+        case expr.Call(callee, paren, arguments):
+            return _compile_call(node, compiler), LoxType.UNKNOWN
+    raise _Unsupported(type(node).__name__)
+
+
+def _compile_call(call: expr.Call, compiler: _Compiler) -> str:
+    callee, _ = _compile(call.callee, compiler)
+    arguments = [_compile(argument, compiler)[0] for argument in call.arguments]
+    paren = compiler.constant(call.paren)
+    if call.native is None:
+        return f"_call({', '.join([paren, callee, *arguments])})"
+
+    native = compiler.constant(call.native)
+    temporary = compiler.fresh("t")
+    return (
+        f"(_native({', '.join([paren, native, *arguments])}) "
+        f"if ({temporary} := {callee}) is {native} "
+        f"else _call({', '.join([paren, temporary, *arguments])}))"
+    )
+
+
+def _compile_arithmetic(
+    token: Token, left: str, right: str, compiler: _Compiler
+) -> str:
+    """``left operator right`` on numbers, with ``numbers.add``'s check inlined."""
+    operator = token.type
+    if operator is TokenType.STAR:
+        return f"_multiply({left}, {right})"
+    if operator is TokenType.SLASH:
+        return f"_divide({compiler.constant(token)}, {left}, {right})"
+    source = f"({left} {_OPERATORS[operator]} {right})"
+    if operator not in (TokenType.PLUS, TokenType.MINUS):
+        return source
+    temporary = compiler.fresh("t")
+    return (
+        f"({temporary} if {-numbers.EXACT} <= ({temporary} := {source}) "
+        f"<= {numbers.EXACT} else float({temporary}))"
+    )
+
+
+def _compile_binary(binary: expr.Binary, compiler: _Compiler) -> tuple[str, LoxType]:
+    left, left_type = _compile(binary.left, compiler)
+    right, right_type = _compile(binary.right, compiler)
+    operator = binary.operator.type
+
+    if operator is TokenType.EQUAL_EQUAL:
+        return f"({left} == {right})", LoxType.BOOL
+    if operator is TokenType.BANG_EQUAL:
+        return f"(not ({left} == {right}))", LoxType.BOOL
+
+    result_type = LoxType.BOOL if operator in _COMPARISONS else LoxType.NUMBER
+    if left_type is right_type is LoxType.NUMBER:
+        source = _compile_arithmetic(binary.operator, left, right, compiler)
+        return source, result_type
+    if operator is TokenType.PLUS and left_type is right_type is LoxType.STRING:
+        return f"_concat({left}, {right})", LoxType.STRING
+
+    # Arithmetic on a vector operand returns a vector.
+    if operator not in _COMPARISONS:
+        result_type = LoxType.UNKNOWN
+        if LoxType.STRING in (left_type, right_type):
+            result_type = LoxType.STRING
+    token = compiler.constant(binary.operator)
+    return f"_binary({token}, {left}, {right})", result_type
@@ -0,0 +1,148 @@
+"""Allocation profiling tied to the phases of ``plox.run``.
+
+``MemoryProfiler.hook`` is a ``RunStats`` hook: it starts ``tracemalloc`` when
+scanning begins and takes a sample after scanning, after parsing and after
+execution. It also samples while the program runs, from the checkpoints
+between statements (see ``budget.watch``): once an interval has passed if it
+has one, and otherwise after 1, 2, 4, 8... statements, so the last of these
+samples is from the second half of the run. Each sample records the top
+allocation sites and how many live objects of each plox type (tokens, AST
+nodes, environments) exist at that point.
+"""
+
+import gc
+import sys
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import ExitStack
+from dataclasses import dataclass, field
+from typing import TextIO
+
+from plox import budget, expr, interpreter, stmt
+from plox.environment import Environment
+from plox.scanner import Token
+from plox.stats import PhaseEvent
+
+_SAMPLE_POINTS = {("scan", "end"), ("parse", "end"), ("execute", "end")}
+_STATEMENTS_BETWEEN_CHECKS = 1000  # of the clock, with an interval
+
+
+@dataclass
+class Sample:
+    label: str
+    current: int
+    peak: int
+    sites: list[tuple[str, int, int]]
+    objects: Counter = field(default_factory=Counter)
+
+
+def plox_types() -> list[type]:
+    return [
+        Token,
+        *_subclasses(expr.Expr),
+        *_subclasses(stmt.Stmt),
+        Environment,
+    ]
+
+
+def _subclasses(cls: type) -> list[type]:
+    found = []
+    for subclass in cls.__subclasses__():
+        found.append(subclass)
+        found.extend(_subclasses(subclass))
+    return found
+
+
+def count_objects() -> Counter:
+    tracked = set(plox_types())
+    counts = Counter()
+    for obj in gc.get_objects():
+        cls = type(obj)
+        if cls not in tracked:
+            continue
+
+        counts[cls.__name__] += 1
+        if cls is Environment:
+            counts["str in environments"] += sum(
+                isinstance(value, str) for value in obj.values.values()
+            )
+    return counts
+
+
+class MemoryProfiler:
+    def __init__(self, top: int = 10, interval: float | None = None):
+        self.top = top
+        self.interval = interval
+        self.samples: list[Sample] = []
+        self._started_tracing = False
+        self._watching = ExitStack()
+        self._execute_start = 0
+        self._next_sample = 0.0
+
+    def hook(self, event: PhaseEvent):
+        if event.phase == "scan" and event.kind == "start":
+            self.start()
+        if event.phase == "execute" and event.kind == "start":
+            self._watch()
+        if event.phase == "execute" and event.kind == "end":
+            self._watching.close()
+        if (event.phase, event.kind) in _SAMPLE_POINTS:
+            self.sample(f"after {event.phase}")
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+
+    def stop(self):
+        self._watching.close()
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def sample(self, label: str):
+        if not tracemalloc.is_tracing():
+            return
+
+        snapshot = tracemalloc.take_snapshot().filter_traces(
+            [tracemalloc.Filter(False, tracemalloc.__file__)]
+        )
+        current, peak = tracemalloc.get_traced_memory()
+        sites = [
+            (str(statistic.traceback), statistic.size, statistic.count)
+            for statistic in snapshot.statistics("lineno")[: self.top]
+        ]
+        self.samples.append(Sample(label, current, peak, sites, count_objects()))
+
+    def _watch(self):
+        self._execute_start = interpreter.statements_executed
+        self._next_sample = 0.0
+        self._watching.enter_context(
+            budget.watch(self._during_execute, self._execute_start + 1)
+        )
+
+    def _during_execute(self, executed: int) -> int:
+        if not self.interval:
+            self.sample("during execute")
+            return executed + (executed - self._execute_start)
+
+        if time.perf_counter() >= self._next_sample:
+            self.sample("during execute")
+            self._next_sample = time.perf_counter() + self.interval
+        return executed + _STATEMENTS_BETWEEN_CHECKS
+
+    def report(self, file: TextIO = sys.stderr):
+        for sample in self.samples:
+            print(
+                f"== {sample.label}: {sample.current / 1024:.1f} KiB traced, "
+                f"peak {sample.peak / 1024:.1f} KiB",
+                file=file,
+            )
+            print("top allocation sites:", file=file)
+            for site, size, count in sample.sites:
+                print(f"  {size / 1024:10.1f} KiB {count:8} blocks  {site}", file=file)
+            print("live objects by type:", file=file)
+            for name, count in sample.objects.most_common():
+                if count:
+                    print(f"  {count:10}  {name}", file=file)
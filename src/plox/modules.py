@@ -0,0 +1,180 @@
+"""Modules and the ``import`` statement.
+
+``import "path";`` binds the variables a module declares at its top level in
+the importing environment. Paths are relative to the directory of the file
+doing the import. Each module is scanned, parsed and run at most once per
+process, with its own globals, and every import of it shares the result.
+
+Imports are lazy. The import itself only needs the names the module
+declares: it removes them from the environment and records them in
+``Environment.imports``. Lookups only consult that record once a name is
+missing, so it costs nothing until the first read or assignment of an
+imported name, which runs the module and binds all of its names that are
+still pending. A module whose names are never used is never run.
+
+A module's prepared form is cached on disk, next to it in ``__loxcache__``,
+as its flat AST together with the names it declares. The cache is used when
+the module's modification time and size are unchanged, or else when its
+SHA-256 still matches. Modules always run on the flat AST.
+"""
+
+import hashlib
+import marshal
+from dataclasses import dataclass
+from pathlib import Path
+
+import plox
+from plox import flat_ast, interpreter, natives, stmt, symbols
+from plox.environment import Environment
+from plox.scanner import Token
+
+CACHE_DIRECTORY = "__loxcache__"
+_FORMAT_VERSION = 1
+
+base_directory: Path | None = None  # of the running file; None for the cwd
+
+
+@dataclass(eq=False)
+class Module:
+    path: Path
+    names: tuple[str, ...]  # declared at the top level
+    code: bytes  # serialized flat AST
+    environment: Environment | None = None  # once it ran
+    running: bool = False
+
+
+_modules: dict[Path, Module] = {}
+
+
+def import_module(keyword: Token, path: str, environment: Environment):
+    """Bind the names of the module at ``path`` in ``environment``, lazily."""
+    module = _module(keyword, path)
+    if module.environment is not None and not module.running:
+        _bind(module, environment)
+        return
+
+    if environment.imports is None:
+        environment.imports = {}
+    pending = _PendingImport(keyword, module, environment)
+    for name in module.names:
+        symbol = symbols.intern(name)
+        environment.values.pop(symbol, None)
+        environment.imports[symbol] = pending
+
+
+@dataclass(eq=False)
+class _PendingImport:
+    keyword: Token
+    module: Module
+    environment: Environment
+
+    def __call__(self):
+        if self.module.running:
+            message = f"Circular import of '{self.module.path}'."
+            raise RuntimeError(self.keyword, message)
+        if self.module.environment is None:
+            _run(self.module)
+        _bind(self.module, self.environment, self)
+
+
+def _bind(
+    module: Module, environment: Environment, pending: _PendingImport | None = None
+):
+    """Define the module's names, only those still ``pending`` if given."""
+    imports = environment.imports or {}
+    for name in module.names:
+        symbol = symbols.intern(name)
+        if pending is not None:
+            if imports.get(symbol) is not pending:
+                continue  # imported again since
+            del imports[symbol]
+            if symbol in environment.values:
+                continue  # declared again since
+        else:
+            imports.pop(symbol, None)
+        environment.define(symbol, module.environment.values.get(symbol))
+
+
+def _run(module: Module):
+    global base_directory
+    flat = flat_ast.FlatAst.from_bytes(module.code)
+    previous = interpreter.environment, base_directory
+    module.environment = natives.define(Environment())
+    module.running = True
+    try:
+        interpreter.environment = module.environment
+        base_directory = module.path.parent
+        for index in flat.roots:
+            flat_ast.execute(flat, index)
+    except BaseException:
+        module.environment = None
+        raise
+    finally:
+        interpreter.environment, base_directory = previous
+        module.running = False
+
+
+def _module(keyword: Token, path: str) -> Module:
+    resolved = ((base_directory or Path.cwd()) / path).resolve()
+    module = _modules.get(resolved)
+    if module is None:
+        module = _modules[resolved] = _prepare(keyword, resolved)
+    return module
+
+
+def _prepare(keyword: Token, path: Path) -> Module:
+    try:
+        status = path.stat()
+        cache = path.parent / CACHE_DIRECTORY / f"{path.name}.flat"
+        record = _read_cache(cache)
+        if record is not None and record[1:3] == (status.st_mtime_ns, status.st_size):
+            return Module(path, *record[4:])
+
+        source = path.read_text()
+    except OSError as error:
+        message = f"Cannot import '{path}': {error.strerror}."
+        raise RuntimeError(keyword, message) from None
+
+    digest = hashlib.sha256(source.encode()).digest()
+    if record is not None and record[3] == digest:
+        names, code = record[4:]
+    else:
+        statements = plox.prepare(source, keep_globals=True)
+        if statements is None:
+            raise RuntimeError(keyword, f"Cannot import '{path}': it has errors.")
+        names = tuple(
+            statement.name.lexeme
+            for statement in statements
+            if isinstance(statement, stmt.Var)
+        )
+        code = flat_ast.flatten(statements).to_bytes()
+
+    record = (_version(), status.st_mtime_ns, status.st_size, digest, names, code)
+    _write_cache(cache, record)
+    return Module(path, names, code)
+
+
+def _version() -> tuple[int, int]:
+    # Not a constant: ``flat_ast`` is still loading when this module is.
+    return _FORMAT_VERSION, flat_ast._FORMAT_VERSION
+
+
+def _read_cache(cache: Path) -> tuple | None:
+    try:
+        record = marshal.loads(cache.read_bytes())
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+    if not isinstance(record, tuple) or record[:1] != (_version(),):
+        return None
+    return record
+
+
+def _write_cache(cache: Path, record: tuple):
+    # A cache that cannot be written only costs the next run some time.
+    try:
+        cache.parent.mkdir(exist_ok=True)
+        temporary = cache.with_suffix(".tmp")
+        temporary.write_bytes(marshal.dumps(record))
+        temporary.replace(cache)
+    except OSError:
+        pass
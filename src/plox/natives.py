@@ -0,0 +1,99 @@
+"""Callables and the library of native functions.
+
+Natives are Python functions that take and return Lox values, and raise
+``NativeError`` for bad arguments. Modules add theirs to the library with
+``register``, and ``define`` puts the library in a global environment, where
+programs can shadow or reassign natives like any other global.
+
+``resolve`` binds call sites to the native they call when the program can
+only be calling that native: the callee is a native's name that the program
+never declares or assigns, and the call passes as many arguments as the
+native takes. The engines still check that the callee is that native when
+the call runs, since a global of the same name may have been defined before
+the program started, but then call it without any further checks.
+"""
+
+import time
+from abc import ABC, abstractmethod
+from collections.abc import Callable
+from dataclasses import dataclass
+
+from plox import expr, stmt, symbols, visit
+from plox.environment import Environment
+
+
+class NativeError(Exception):
+    """Raised by a native; the caller reports it at the call site."""
+
+
+class LoxCallable(ABC):
+    @abstractmethod
+    def arity(self) -> int:
+        pass
+
+    @abstractmethod
+    def call(self, *arguments: object) -> object:
+        pass
+
+
+@dataclass(eq=False)
+class NativeFunction(LoxCallable):
+    name: str
+    parameters: int
+    function: Callable[..., object]
+
+    def arity(self) -> int:
+        return self.parameters
+
+    def call(self, *arguments: object) -> object:
+        return self.function(*arguments)
+
+    def __str__(self):
+        return "<native fn>"
+
+
+def _clock() -> float:
+    """Seconds since an arbitrary point in time, for measuring intervals."""
+    return time.perf_counter()
+
+
+NATIVES: dict[int, NativeFunction] = {}
+
+
+def register(*functions: NativeFunction):
+    """Add ``functions`` to the library that ``define`` installs."""
+    for function in functions:
+        NATIVES[symbols.intern(function.name)] = function
+
+
+register(NativeFunction("clock", 0, _clock))
+
+
+def define(environment: Environment) -> Environment:
+    """Define every native in ``environment``."""
+    for symbol, native in NATIVES.items():
+        environment.define(symbol, native)
+    return environment
+
+
+def resolve(statements: list[stmt.Stmt]) -> list[stmt.Stmt]:
+    """Set ``native`` on the calls that can only call a native."""
+    calls = []
+    rebound = set()
+    for node in visit.walk(statements):
+        if isinstance(node, expr.Call):
+            calls.append(node)
+        elif isinstance(node, (stmt.Var, expr.Assign)):
+            rebound.add(node.name.symbol)
+
+    for call in calls:
+        native = None
+        if isinstance(call.callee, expr.Variable):
+            symbol = call.callee.name.symbol
+            if symbol not in rebound:
+                native = NATIVES.get(symbol)
+        if native is not None and native.arity() != len(call.arguments):
+            native = None  # fails at run time, like any other bad call
+        call.native = native
+
+    return statements
@@ -0,0 +1,59 @@
+"""Lox numbers.
+
+Lox has a single number type, a double. Internally a number is a Python
+``float`` or, while its value is an integer a double holds exactly, an
+``int``: integer literals, and sums, differences and products of ints, stay
+ints, so loop counters and indexes skip the float conversions. A result that
+leaves the exact range becomes a float, which is the one the double
+arithmetic would have given, since both are correctly rounded. An int cannot
+be -0, so a product or negation that would be -0 is ``-0.0``. Division always
+gives a float.
+
+Which of the two a number is cannot be observed: ints and floats compare and
+hash equal, and ``stringfy`` formats both with ``:g``. Code that checks for a
+number must use ``is_number``, as ``bool`` is a subclass of ``int``.
+"""
+
+EXACT = 2**53  # every integer up to this magnitude is a double
+TYPES = (int, float)  # for ``value.__class__ in TYPES`` on hot paths
+
+
+def is_number(value: object) -> bool:
+    return value.__class__ in TYPES
+
+
+def literal(text: str) -> int | float:
+    value = float(text)
+    if value.is_integer() and -EXACT <= value <= EXACT:
+        return int(value)
+    return value
+
+
+def add(left: int | float, right: int | float) -> int | float:
+    result = left + right
+    if -EXACT <= result <= EXACT:
+        return result
+    return float(result)
+
+
+def subtract(left: int | float, right: int | float) -> int | float:
+    result = left - right
+    if -EXACT <= result <= EXACT:
+        return result
+    return float(result)
+
+
+def multiply(left: int | float, right: int | float) -> int | float:
+    result = left * right
+    if result.__class__ is int:
+        if not result and (left < 0 or right < 0):
+            return -0.0
+        if not -EXACT <= result <= EXACT:
+            return float(result)
+    return result
+
+
+def negate(operand: int | float) -> int | float:
+    if operand.__class__ is int and not operand:
+        return -0.0
+    return -operand
@@ -1,6 +1,31 @@
+from collections.abc import Generator
+
 import plox
 from plox import expr, stmt
+from plox.hashcons import NodeTable
 from plox.scanner import Token, TokenType
+from plox.visit import trampoline
+
+# How tightly each binary operator binds. Assignment binds loosest and groups
+# to the right, the others group to the left, and prefix operators bind
+# tighter than any of them.
+_ASSIGNMENT = 1
+_UNARY = 8
+_BINARY = {
+    TokenType.EQUAL: _ASSIGNMENT,
+    TokenType.OR: 2,
+    TokenType.AND: 3,
+    TokenType.BANG_EQUAL: 4,
+    TokenType.EQUAL_EQUAL: 4,
+    TokenType.GREATER: 5,
+    TokenType.GREATER_EQUAL: 5,
+    TokenType.LESS: 5,
+    TokenType.LESS_EQUAL: 5,
+    TokenType.MINUS: 6,
+    TokenType.PLUS: 6,
+    TokenType.SLASH: 7,
+    TokenType.STAR: 7,
+}
 
 
 class ParserError(RuntimeError):
@@ -8,22 +33,54 @@ class ParserError(RuntimeError):
 
 
 class Parser:
-    def __init__(self, tokens: list[Token]):
+    def __init__(self, tokens: list[Token], nodes: NodeTable | None = None):
         self.current = 0
         self.tokens = tokens
+        self.nodes = nodes
 
     def parse(self) -> list[stmt.Stmt]:
         statements = []
         while not self.is_at_end():
-            statements.append(self.declaration())
+            statements.append(self.declaration(top_level=True))
 
         return statements
 
-    def declaration(self) -> stmt.Stmt | None:
+    def declaration(self, top_level=False) -> stmt.Stmt | None:
+        return trampoline(self._declaration(top_level))
+
+    def statement(self) -> stmt.Stmt:
+        return trampoline(self._statement())
+
+    # The statement rules are generators run by ``visit.trampoline``: they
+    # yield the rules they nest, so nesting depth is bounded by memory rather
+    # than by the recursion limit.
+
+    def _declaration(self, top_level: bool) -> Generator:
+        steps = self._declaration_steps(top_level)
+        return steps if self.nodes is None else self._recorded(steps)
+
+    def _statement(self) -> Generator:
+        steps = self._statement_steps()
+        return steps if self.nodes is None else self._recorded(steps)
+
+    def _recorded(self, steps: Generator) -> Generator:
+        self.nodes.begin()
+        statement = None
+        try:
+            statement = yield steps
+            return statement
+        finally:
+            self.nodes.end(statement)
+
+    def _declaration_steps(self, top_level: bool) -> Generator:
         try:
             if self.match(TokenType.VAR):
                 return self.var_declaration()
-            return self.statement()
+            if self.match(TokenType.IMPORT):
+                if not top_level:
+                    self.error(self.previous(), "Can only import at the top level.")
+                return self.import_declaration()
+            return (yield self._statement())
         except ParserError as error:
             self.synchronize()
 
@@ -36,124 +93,210 @@ class Parser:
         self.consume(TokenType.SEMICOLON, "Expect ';' after variable declaration")
         return stmt.Var(name, initializer)
 
-    def statement(self) -> stmt.Stmt:
+    def import_declaration(self):
+        keyword = self.previous()
+        path = self.consume(TokenType.STRING, "Expect module path after 'import'.")
+        self.consume(TokenType.SEMICOLON, "Expect ';' after module path.")
+        return stmt.Import(keyword, path.literal)
+
+    def _statement_steps(self) -> Generator:
+        if self.match(TokenType.FOR):
+            return (yield self.for_statement())
+
+        if self.match(TokenType.IF):
+            return (yield self.if_statement())
+
         if self.match(TokenType.PRINT):
             return self.print_statement()
 
+        if self.match(TokenType.WHILE):
+            return (yield self.while_statement())
+
         if self.match(TokenType.LEFT_BRACE):
-            return stmt.Block(self.block())
+            return stmt.Block((yield self.block()))
 
         return self.expression_statement()
 
+    def for_statement(self) -> Generator:
+        self.consume(TokenType.LEFT_PAREN, "Expect '(' after 'for'.")
+        if self.match(TokenType.SEMICOLON):
+            initializer = None
+        elif self.match(TokenType.VAR):
+            initializer = self.var_declaration()
+        else:
+            initializer = self.expression_statement()
+
+        condition = None
+        if not self.check(TokenType.SEMICOLON):
+            condition = self.expression()
+        self.consume(TokenType.SEMICOLON, "Expect ';' after loop condition.")
+
+        increment = None
+        if not self.check(TokenType.RIGHT_PAREN):
+            increment = self.expression()
+        self.consume(TokenType.RIGHT_PAREN, "Expect ')' after for clauses.")
+
+        body = yield self._statement()
+
+        # The body is a statement, never a declaration, so neither the block
+        # pairing it with the increment nor one around an initializer that
+        # declares nothing needs a scope of its own.
+        if increment is not None:
+            body = stmt.Block([body, stmt.Expression(increment)], needs_scope=False)
+        if condition is None:
+            condition = self.make(expr.Literal, True)
+        body = stmt.While(condition, body)
+        if initializer is not None:
+            needs_scope = isinstance(initializer, stmt.Var)
+            body = stmt.Block([initializer, body], needs_scope=needs_scope)
+
+        return body
+
+    def if_statement(self) -> Generator:
+        self.consume(TokenType.LEFT_PAREN, "Expect '(' after 'if'.")
+        condition = self.expression()
+        self.consume(TokenType.RIGHT_PAREN, "Expect ')' after if condition.")
+
+        then_branch = yield self._statement()
+        else_branch = None
+        if self.match(TokenType.ELSE):
+            else_branch = yield self._statement()
+
+        return stmt.If(condition, then_branch, else_branch)
+
     def print_statement(self):
         value = self.expression()
         self.consume(TokenType.SEMICOLON, "Expect ';' after value.")
         return stmt.Print(value)
 
-    def block(self):
+    def block(self) -> Generator:
         statements = []
         while not self.check(TokenType.RIGHT_BRACE) and not self.is_at_end():
-            statements.append(self.declaration())
+            statements.append((yield self._declaration(top_level=False)))
 
         self.consume(TokenType.RIGHT_BRACE, "Expect '}' after block.")
         return statements
 
+    def while_statement(self) -> Generator:
+        self.consume(TokenType.LEFT_PAREN, "Expect '(' after 'while'.")
+        condition = self.expression()
+        self.consume(TokenType.RIGHT_PAREN, "Expect ')' after condition.")
+        return stmt.While(condition, (yield self._statement()))
+
     def expression_statement(self):
         value = self.expression()
         self.consume(TokenType.SEMICOLON, "Expect ';' after value.")
         return stmt.Expression(value)
 
-    def expression(self):
-        return self.assignment()
-
-    def assignment(self):
-        expression = self.equality()
-
-        if self.match(TokenType.EQUAL):
-            equals = self.previous()
-            value = self.assignment()
-
-            if isinstance(expression, expr.Variable):
-                name = expression.name
-                return expr.Assign(name, value)
-
-            self.error(equals, "Invalid assignment target.")
-
-        return expression
-
-    def equality(self):
-        expression = self.comparison()
-
-        while self.match(TokenType.BANG_EQUAL, TokenType.EQUAL_EQUAL):
-            operator = self.previous()
-            right = self.comparison()
-            expression = expr.Binary(expression, operator, right)
-
-        return expression
-
-    def comparison(self):
-        expression = self.term()
-
-        while self.match(
-            TokenType.GREATER,
-            TokenType.GREATER_EQUAL,
-            TokenType.LESS,
-            TokenType.LESS_EQUAL,
+    def expression(self) -> expr.Expr:
+        """Parse an expression by precedence climbing over explicit stacks.
+
+        Builds the same nodes, in the same order and with the same errors, as
+        recursive descent over the grammar's precedence levels would, but
+        keeps each enclosing grouping or call argument list on a stack of its
+        own rather than on Python's, so nesting is bounded by memory.
+        """
+        # Each enclosing grouping or argument list, innermost last, with the
+        # operand and operator stacks of the expression it interrupted and
+        # the call it belongs to, None for a grouping.
+        enclosing = []
+        operands = []
+        operators = []
+        while True:
+            while self.match(TokenType.BANG, TokenType.MINUS):
+                operators.append((_UNARY, self.previous()))
+            if self.match(TokenType.LEFT_PAREN):
+                enclosing.append((operands, operators, None))
+                operands, operators = [], []
+                continue
+            operand = self.primary()
+
+            while True:
+                if self.match(TokenType.LEFT_PAREN):
+                    if not self.check(TokenType.RIGHT_PAREN):
+                        enclosing.append((operands, operators, (operand, [])))
+                        operands, operators = [], []
+                        break
+                    paren = self.advance()
+                    operand = self.make(expr.Call, operand, paren, [])
+                    continue
+                operands.append(operand)
+
+                precedence = _BINARY.get(self.peek().type)
+                if precedence is not None:
+                    operator = self.advance()
+                    self._reduce(operands, operators, precedence)
+                    operators.append((precedence, operator))
+                    break
+
+                self._reduce(operands, operators, 0)
+                expression = operands.pop()
+                if not enclosing:
+                    return expression
+                operands, operators, call = enclosing.pop()
+                if call is None:
+                    self.consume(TokenType.RIGHT_PAREN, "Expect ')' after expression")
+                    operand = self.make(expr.Grouping, expression)
+                    continue
+                callee, arguments = call
+                arguments.append(expression)
+                if self.match(TokenType.COMMA):
+                    if len(arguments) >= 255:
+                        self.error(self.peek(), "Can't have more than 255 arguments.")
+                    enclosing.append((operands, operators, call))
+                    operands, operators = [], []
+                    break
+                paren = self.consume(
+                    TokenType.RIGHT_PAREN, "Expect ')' after arguments."
+                )
+                operand = self.make(expr.Call, callee, paren, arguments)
+
+    def _reduce(self, operands: list, operators: list, precedence: int):
+        """Apply the pending operators that bind at least as tightly as
+        ``precedence``, assignments only if they bind more tightly, since they
+        group to the right."""
+        while operators and (
+            operators[-1][0] > precedence
+            or operators[-1][0] == precedence != _ASSIGNMENT
         ):
-            operator = self.previous()
-            right = self.term()
-            expression = expr.Binary(expression, operator, right)
-
-        return expression
-
-    def term(self):
-        expression = self.factor()
-
-        while self.match(TokenType.MINUS, TokenType.PLUS):
-            operator = self.previous()
-            right = self.factor()
-            expression = expr.Binary(expression, operator, right)
-
-        return expression
-
-    def factor(self):
-        expression = self.unary()
-
-        while self.match(TokenType.SLASH, TokenType.STAR):
-            operator = self.previous()
-            right = self.unary()
-            expression = expr.Binary(expression, operator, right)
-
-        return expression
-
-    def unary(self):
-        if self.match(TokenType.BANG, TokenType.MINUS):
-            operator = self.previous()
-            right = self.unary()
-            return expr.Unary(operator, right)
-
-        return self.primary()
+            level, operator = operators.pop()
+            right = operands.pop()
+            if level == _UNARY:
+                operands.append(self.make(expr.Unary, operator, right))
+            elif level == _ASSIGNMENT:
+                target = operands.pop()
+                if isinstance(target, expr.Variable):
+                    operands.append(self.make(expr.Assign, target.name, right))
+                else:
+                    self.error(operator, "Invalid assignment target.")
+                    operands.append(target)
+            elif operator.type in (TokenType.OR, TokenType.AND):
+                left = operands.pop()
+                operands.append(self.make(expr.Logical, left, operator, right))
+            else:
+                left = operands.pop()
+                operands.append(self.make(expr.Binary, left, operator, right))
 
     def primary(self):
         if self.match(TokenType.FALSE):
-            return expr.Literal(False)
+            return self.make(expr.Literal, False)
         if self.match(TokenType.TRUE):
-            return expr.Literal(True)
+            return self.make(expr.Literal, True)
         if self.match(TokenType.NIL):
-            return expr.Literal(None)
+            return self.make(expr.Literal, None)
         if self.match(TokenType.IDENTIFIER):
-            return expr.Variable(self.previous())
+            return self.make(expr.Variable, self.previous())
 
         if self.match(TokenType.NUMBER, TokenType.STRING):
-            return expr.Literal(self.previous().literal)
-
-        if self.match(TokenType.LEFT_PAREN):
-            expression = self.expression()
-            self.consume(TokenType.RIGHT_PAREN, "Expect ')' after expression")
-            return expr.Grouping(expression)
+            return self.make(expr.Literal, self.previous().literal)
 
         raise self.error(self.peek(), "Expect expression.")
 
+    def make(self, cls: type[expr.Expr], *fields):
+        if self.nodes is None:
+            return cls(*fields)
+        return self.nodes.make(cls, fields, self.previous().line)
+
     def match(self, *types: TokenType):
         for type_ in types:
             if self.check(type_):
@@ -205,6 +348,7 @@ class Parser:
                     TokenType.CLASS
                     | TokenType.FUN
                     | TokenType.VAR
+                    | TokenType.IMPORT
                     | TokenType.FOR
                     | TokenType.IF
                     | TokenType.WHILE
@@ -0,0 +1,164 @@
+import sys
+import time
+from collections.abc import Callable
+
+import plox
+from plox import interpreter, natives, stmt
+from plox.budget import Budget, BudgetExceeded
+from plox.environment import Environment
+from plox.stats import RunStats
+
+PROMPT = "> "
+CONTINUATION_PROMPT = "... "
+CACHE_SIZE = 256
+
+
+class Session:
+    """An interactive session with persistent globals.
+
+    Input is buffered until brackets, strings and block comments are closed,
+    so an entry can span several lines. Prepared statements are cached by
+    their source text, which makes re-running an entry from history skip
+    scanning, parsing and the analysis passes.
+    """
+
+    def __init__(
+        self,
+        engine: str = "tree",
+        stats: RunStats | None = None,
+        optimize=1,
+        verbose=False,
+        budget: Budget | None = None,
+        environment: Environment | None = None,
+    ):
+        self.engine = engine
+        self.budget = budget
+        self.optimize = optimize
+        self.verbose = verbose
+        self.stats = stats if stats is not None else RunStats()
+        if environment is None:
+            environment = natives.define(Environment())
+        self.environment = environment
+        self.cache: dict[str, list[stmt.Stmt]] = {}
+        self.timing = False
+        self.pending: list[str] = []
+
+    @property
+    def prompt(self) -> str:
+        return CONTINUATION_PROMPT if self.pending else PROMPT
+
+    def run(self, read: Callable[[str], str] = input):
+        while True:
+            try:
+                line = read(self.prompt)
+            except EOFError:
+                print("Exiting...")
+                break
+            except KeyboardInterrupt:
+                print()
+                self.pending.clear()
+                continue
+
+            self.feed(line)
+
+    def feed(self, line: str) -> bool:
+        """Add a line of input and run it once the entry is complete.
+
+        Returns False while more lines are needed.
+        """
+        if not self.pending and line.strip().startswith(":"):
+            self.command(line.strip())
+            return True
+
+        self.pending.append(line)
+        source = "\n".join(self.pending)
+        if needs_more_input(source):
+            return False
+
+        self.pending.clear()
+        self.evaluate(source)
+        return True
+
+    def command(self, command: str):
+        match command.split():
+            case [":time"]:
+                self.timing = not self.timing
+                print(f"timing {'on' if self.timing else 'off'}")
+            case _:
+                print(f"Unknown command {command}")
+
+    def evaluate(self, source: str):
+        plox.had_error = False
+        plox.had_runtime_error = False
+
+        statements = self.cache.get(source)
+        cached = statements is not None
+        if statements is None:
+            statements = plox.prepare(
+                source,
+                print_expressions=True,
+                stats=self.stats,
+                optimize=self.optimize,
+                verbose=self.verbose,
+            )
+            if statements is None:
+                return
+            self._remember(source, statements)
+
+        previous_environment = interpreter.environment
+        interpreter.environment = self.environment
+        start = time.perf_counter()
+        try:
+            plox.execute(
+                statements, self.engine, self.stats, self.optimize, self.budget
+            )
+        except BudgetExceeded as error:
+            print(error, file=sys.stderr)
+        finally:
+            elapsed = time.perf_counter() - start
+            interpreter.environment = previous_environment
+
+        if self.timing:
+            print(f"[{elapsed * 1000:.3f} ms{', cached' if cached else ''}]")
+
+    def _remember(self, source: str, statements: list[stmt.Stmt]):
+        if len(self.cache) >= CACHE_SIZE:
+            del self.cache[next(iter(self.cache))]
+        self.cache[source] = statements
+
+
+def needs_more_input(source: str) -> bool:
+    """Whether ``source`` ends inside a bracket, string or block comment."""
+    depth = 0
+    comments = 0
+    in_string = False
+    i = 0
+    while i < len(source):
+        c = source[i]
+        pair = source[i : i + 2]
+        if in_string:
+            in_string = c != '"'
+        elif comments:
+            if pair == "/*":
+                comments += 1
+                i += 1
+            elif pair == "*/":
+                comments -= 1
+                i += 1
+        elif pair == "//":
+            newline = source.find("\n", i)
+            if newline == -1:
+                break
+            i = newline
+        elif pair == "/*":
+            comments = 1
+            i += 1
+        elif c == '"':
+            in_string = True
+        elif c in "({":
+            depth += 1
+        elif c in ")}":
+            depth -= 1
+        i += 1
+
+    return in_string or comments > 0 or depth > 0
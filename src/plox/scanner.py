@@ -2,6 +2,7 @@ from dataclasses import dataclass
 from enum import Enum
 
 import plox
+from plox import numbers, symbols
 
 
 class Scanner:
@@ -124,7 +125,8 @@ class Scanner:
             while self.peek().isdigit():
                 self.advance()
 
-        self.add_token(TokenType.NUMBER, float(self.source[self.start : self.current]))
+        text = self.source[self.start : self.current]
+        self.add_token(TokenType.NUMBER, numbers.literal(text))
 
     def identifier(self):
         while self.peek().isalnum():
@@ -134,7 +136,12 @@ class Scanner:
         try:
             self.add_token(TokenType(text))
         except ValueError:
-            self.add_token(TokenType.IDENTIFIER)
+            symbol = symbols.intern(text)
+            self.tokens.append(
+                Token(
+                    TokenType.IDENTIFIER, symbols.name(symbol), None, self.line, symbol
+                )
+            )
 
     def add_token(self, type: "TokenType", obj: object | None = None):
         text = self.source[self.start : self.current]
@@ -160,6 +167,11 @@ class Token:
     lexeme: str
     literal: object
     line: int
+    symbol: int | None = None
+
+    def __post_init__(self):
+        if self.symbol is None and self.type is TokenType.IDENTIFIER:
+            self.symbol = symbols.intern(self.lexeme)
 
 
 class TokenType(Enum):
@@ -184,7 +196,7 @@ class TokenType(Enum):
     GREATER = ">"
     GREATER_EQUAL = ">="
     LESS = "<"
-    LESS_EQUAL = ">"
+    LESS_EQUAL = "<="
 
     # Literals.
     IDENTIFIER = "identifier"
@@ -199,6 +211,7 @@ class TokenType(Enum):
     FUN = "fun"
     FOR = "for"
     IF = "if"
+    IMPORT = "import"
     NIL = "nil"
     OR = "or"
     PRINT = "print"
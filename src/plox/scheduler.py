@@ -0,0 +1,157 @@
+"""Running many programs fairly from an asyncio host.
+
+The interpreter keeps its state in module globals and runs to completion, so
+programs cannot run concurrently, nor be suspended from the event loop. The
+``Scheduler`` instead runs each program in a worker thread and lets one hold
+the interpreter at a time. Each holds it for a turn of ``slice_seconds``:
+the budget's ``on_yield`` hook passes the interpreter to the program that
+has waited longest once the turn is up, and takes it back when its own turn
+comes again, so a runaway program delays the others by one slice at most.
+
+Every program gets its own globals, and its output is collected separately
+through ``plox.streams``, in the context of its worker thread, so the host and
+the other programs keep writing to their own streams. The time a program
+spends waiting for a turn does not count against its budget.
+"""
+
+import asyncio
+import dataclasses
+import io
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+
+import plox
+from plox import budget, interpreter, natives, streams
+from plox.budget import Budget
+from plox.environment import Environment
+
+
+@dataclass
+class Outcome:
+    output: str
+    errors: str
+    had_error: bool = False
+    had_runtime_error: bool = False
+
+
+class _Program:
+    def __init__(self):
+        self.output = io.StringIO()
+        self.errors = io.StringIO()
+        # The interpreter state while the program does not hold a turn.
+        self.state = (
+            natives.define(Environment()),
+            0,
+            False,
+            False,
+            budget.UNLIMITED,
+        )
+
+
+def _save() -> tuple:
+    return (
+        interpreter.environment,
+        interpreter.statements_executed,
+        plox.had_error,
+        plox.had_runtime_error,
+        budget.save(),
+    )
+
+
+def _restore(state: tuple):
+    (
+        interpreter.environment,
+        interpreter.statements_executed,
+        plox.had_error,
+        plox.had_runtime_error,
+        budget_state,
+    ) = state
+    budget.restore(budget_state)
+
+
+class Scheduler:
+    def __init__(self, slice_seconds: float = 0.01):
+        self.slice_seconds = slice_seconds
+        self._turns = threading.Condition()
+        self._waiting: deque[_Program] = deque()
+        self._holder: _Program | None = None
+        self._host_state: tuple | None = None
+        self._turn_start = 0.0
+
+    async def run(
+        self,
+        source: str,
+        budget: Budget | None = None,
+        engine: str = "tree",
+        optimize=1,
+    ) -> Outcome:
+        """Run ``source`` with its own globals, taking turns with the others.
+
+        Raises ``BudgetExceeded`` if the program exceeds ``budget``.
+        """
+        return await asyncio.to_thread(self._run, source, budget, engine, optimize)
+
+    def _run(
+        self, source: str, limits: Budget | None, engine: str, optimize: int
+    ) -> Outcome:
+        program = _Program()
+        limits = limits if limits is not None else Budget()
+        on_yield = limits.on_yield
+
+        def handoff():
+            if on_yield is not None:
+                on_yield()
+            if time.perf_counter() - self._turn_start >= self.slice_seconds:
+                with budget.pause():
+                    self._pass_turn(program)
+
+        self._acquire(program)
+        try:
+            with streams.redirect(program.output, program.errors):
+                plox.run(
+                    source,
+                    engine=engine,
+                    optimize=optimize,
+                    budget=dataclasses.replace(limits, on_yield=handoff),
+                )
+            return Outcome(
+                program.output.getvalue(),
+                program.errors.getvalue(),
+                plox.had_error,
+                plox.had_runtime_error,
+            )
+        finally:
+            self._release(program)
+
+    def _acquire(self, program: _Program):
+        with self._turns:
+            self._waiting.append(program)
+            self._turns.wait_for(
+                lambda: self._holder is None and self._waiting[0] is program
+            )
+            self._waiting.popleft()
+            self._holder = program
+            if self._host_state is None:
+                self._host_state = _save()
+            _restore(program.state)
+            self._turn_start = time.perf_counter()
+
+    def _release(self, program: _Program):
+        with self._turns:
+            program.state = _save()
+            self._holder = None
+            if not self._waiting:
+                # Leave the interpreter as the host had it.
+                _restore(self._host_state)
+                self._host_state = None
+            self._turns.notify_all()
+
+    def _pass_turn(self, program: _Program):
+        with self._turns:
+            if not self._waiting:
+                self._turn_start = time.perf_counter()
+                return
+        self._release(program)
+        self._acquire(program)
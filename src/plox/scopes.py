@@ -0,0 +1,16 @@
+from plox import stmt, visit
+
+
+def analyze(statements: list[stmt.Stmt]) -> list[stmt.Stmt]:
+    """Mark blocks that declare no variables so they run in their parent's scope.
+
+    Such a block cannot observe whether it got its own ``Environment``, so the
+    interpreters skip allocating one and lookups inside it stay one hop shorter.
+    """
+    for node in visit.walk(statements):
+        if isinstance(node, stmt.Block):
+            node.needs_scope = any(
+                isinstance(statement, stmt.Var) for statement in node.statements
+            )
+
+    return statements
@@ -0,0 +1,78 @@
+"""Snapshots of the global environment, for warm starts.
+
+A prelude that builds lookup tables from ``var`` declarations can be run
+once and its globals saved with ``take``. Later runs ``restore`` them instead
+of scanning, parsing and executing the prelude again. A snapshot records the
+SHA-256 of the prelude source it was taken after, and ``restore`` refuses one
+taken after any other source.
+
+Globals are stored by name, since symbol IDs differ between processes, and
+natives by the name they have in the library. Vectors are stored as raw
+doubles in machine byte order, so like flat AST caches a snapshot is meant
+for the same platform, and slices no longer share a buffer once restored.
+"""
+
+import hashlib
+import marshal
+from array import array
+
+from plox import natives, symbols
+from plox.environment import Environment
+from plox.natives import NativeFunction
+from plox.vector import Vector
+
+_FORMAT_VERSION = 1
+
+_VALUE = 0
+_VECTOR = 1
+_NATIVE = 2
+
+
+def digest(source: str) -> bytes:
+    return hashlib.sha256(source.encode()).digest()
+
+
+def take(source: str, environment: Environment) -> bytes:
+    """Serialize the values of ``environment``, taken after running ``source``.
+
+    Only the environment's own values are saved, not those it encloses.
+    """
+    entries = []
+    for symbol, value in environment.values.items():
+        if value is None or isinstance(value, (bool, int, float, str)):
+            entry = (_VALUE, value)
+        elif isinstance(value, Vector):
+            entry = (_VECTOR, value.data.tobytes())
+        elif isinstance(value, NativeFunction) and value is natives.NATIVES.get(
+            symbols.intern(value.name)
+        ):
+            entry = (_NATIVE, value.name)
+        else:
+            raise ValueError(
+                f"Cannot snapshot the value of {symbols.name(symbol)}: {value}."
+            )
+        entries.append((symbols.name(symbol), *entry))
+
+    return marshal.dumps((_FORMAT_VERSION, digest(source), tuple(entries)))
+
+
+def restore(data: bytes, source: str, environment: Environment) -> Environment:
+    """Define the globals of a snapshot taken after running ``source``."""
+    try:
+        version, source_digest, entries = marshal.loads(data)
+    except (EOFError, ValueError, TypeError):
+        raise ValueError("Not a snapshot.") from None
+    if version != _FORMAT_VERSION:
+        raise ValueError(f"Unsupported snapshot format version {version}.")
+    if source_digest != digest(source):
+        raise ValueError("Snapshot was not taken after this prelude.")
+
+    for name, kind, payload in entries:
+        if kind == _VECTOR:
+            values = array("d")
+            values.frombytes(payload)
+            payload = Vector(memoryview(values))
+        elif kind == _NATIVE:
+            payload = natives.NATIVES[symbols.intern(payload)]
+        environment.define(symbols.intern(name), payload)
+    return environment
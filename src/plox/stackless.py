@@ -0,0 +1,287 @@
+"""Explicit-stack evaluator for the dataclass AST.
+
+``interpret`` runs the same tree as ``plox.interpreter`` without recursing on
+the Python stack, so the nesting depth of groupings, operators and blocks
+only grows two lists and can neither raise ``RecursionError`` nor overflow
+the C stack. The parser and the analysis passes do not recurse either, so
+``--engine stackless`` runs programs of any nesting depth from source.
+
+``work`` is a stack of ``(handler, node)`` steps and ``values`` a stack of
+results. A node's handler pushes a step that finishes the node under steps
+for its operands, so their values are on top of ``values`` when it runs.
+Statements are counted against the budget, and scopes and loop environments
+are created, exactly as the tree interpreter does, so results, errors and
+statistics match it. The JIT does not apply to this engine.
+"""
+
+from collections.abc import Callable
+
+import plox
+from plox import budget, expr, interpreter, modules, numbers, stmt, streams
+from plox.environment import Environment
+from plox.inference import LoxType
+from plox.natives import NativeError
+from plox.scanner import TokenType
+
+Work = list[tuple[Callable, object]]
+
+
+def interpret(statements: list[stmt.Stmt]):
+    previous_environment = interpreter.environment
+    work: Work = []
+    _push_statements(work, statements)
+    try:
+        _run(work)
+    except RuntimeError as error:
+        plox.runtime_error(error)
+    finally:
+        interpreter.environment = previous_environment
+
+
+def evaluate(expression: expr.Expr) -> object:
+    values = _run([(_HANDLERS[expression.__class__], expression)])
+    return values.pop()
+
+
+def _run(work: Work) -> list:
+    values = []
+    pop = work.pop
+    while work:
+        handler, node = pop()
+        handler(node, work, values)
+    return values
+
+
+def _push(work: Work, node: expr.Expr | stmt.Stmt):
+    work.append((_HANDLERS[node.__class__], node))
+
+
+def _push_statements(work: Work, statements: list[stmt.Stmt]):
+    work.extend((_HANDLERS[s.__class__], s) for s in reversed(statements))
+
+
+def _count():
+    interpreter.statements_executed += 1
+    if interpreter.statements_executed >= budget.next_check:
+        budget.checkpoint(interpreter.statements_executed)
+
+
+# Expressions
+
+
+def _binary(binary: expr.Binary, work: Work, values: list):
+    work.append((_finish_binary, binary))
+    _push(work, binary.right)
+    _push(work, binary.left)
+
+
+def _finish_binary(binary: expr.Binary, work: Work, values: list):
+    right = values.pop()
+    if binary.operand_type is LoxType.NUMBER:
+        operation = interpreter.UNCHECKED_BINARY_OPERATIONS[binary.operator.type]
+        try:
+            values[-1] = operation(values[-1], right)
+        except ZeroDivisionError:
+            raise interpreter.division_by_zero(binary.operator) from None
+    else:
+        values[-1] = interpreter.binary_operation(binary.operator, values[-1], right)
+
+
+def _grouping(grouping: expr.Grouping, work: Work, values: list):
+    _push(work, grouping.expression)
+
+
+def _literal(literal: expr.Literal, work: Work, values: list):
+    values.append(literal.value)
+
+
+def _unary(unary: expr.Unary, work: Work, values: list):
+    work.append((_finish_unary, unary))
+    _push(work, unary.right)
+
+
+def _finish_unary(unary: expr.Unary, work: Work, values: list):
+    if unary.operand_type is not None:
+        values[-1] = numbers.negate(values[-1])
+    else:
+        values[-1] = interpreter.unary_operation(unary.operator, values[-1])
+
+
+def _variable(variable: expr.Variable, work: Work, values: list):
+    values.append(interpreter.environment.get(variable.name, variable.cache))
+
+
+def _logical(logical: expr.Logical, work: Work, values: list):
+    work.append((_finish_logical, logical))
+    _push(work, logical.left)
+
+
+def _finish_logical(logical: expr.Logical, work: Work, values: list):
+    left = values[-1]
+    if logical.operator.type is TokenType.OR:
+        if left is not None and left is not False:
+            return
+    elif left is None or left is False:
+        return
+
+    values.pop()
+    _push(work, logical.right)
+
+
+def _call(call: expr.Call, work: Work, values: list):
+    work.append((_finish_call, call))
+    for argument in reversed(call.arguments):
+        _push(work, argument)
+    _push(work, call.callee)
+
+
+def _finish_call(call: expr.Call, work: Work, values: list):
+    count = len(call.arguments) + 1
+    callee, *arguments = values[-count:]
+    del values[-count:]
+    if callee is call.native and callee is not None:
+        # The arity was checked when the call was resolved.
+        try:
+            values.append(callee.function(*arguments))
+        except NativeError as error:
+            raise RuntimeError(call.paren, str(error)) from None
+    else:
+        values.append(interpreter.call_value(call.paren, callee, *arguments))
+
+
+def _assign(assign: expr.Assign, work: Work, values: list):
+    work.append((_finish_assign, assign))
+    _push(work, assign.value)
+
+
+def _finish_assign(assign: expr.Assign, work: Work, values: list):
+    interpreter.environment.assign(assign.name, values[-1], assign.cache)
+
+
+# Statements
+
+
+def _expression(statement: stmt.Expression, work: Work, values: list):
+    _count()
+    work.append((_discard, statement))
+    _push(work, statement.expression)
+
+
+def _discard(statement: stmt.Expression, work: Work, values: list):
+    values.pop()
+
+
+def _print(statement: stmt.Print, work: Work, values: list):
+    _count()
+    work.append((_finish_print, statement))
+    _push(work, statement.expression)
+
+
+def _finish_print(statement: stmt.Print, work: Work, values: list):
+    print(interpreter.stringfy(values.pop()), file=streams.output())
+
+
+def _var(var: stmt.Var, work: Work, values: list):
+    _count()
+    work.append((_finish_var, var))
+    if var.initializer:
+        _push(work, var.initializer)
+    else:
+        values.append(None)
+
+
+def _finish_var(var: stmt.Var, work: Work, values: list):
+    interpreter.environment.define(var.name.symbol, values.pop())
+
+
+def _block(block: stmt.Block, work: Work, values: list):
+    _count()
+    if block.needs_scope:
+        work.append((_set_environment, interpreter.environment))
+        interpreter.environment = Environment(interpreter.environment)
+    _push_statements(work, block.statements)
+
+
+def _set_environment(environment: Environment, work: Work, values: list):
+    interpreter.environment = environment
+
+
+def _if(if_: stmt.If, work: Work, values: list):
+    _count()
+    work.append((_finish_if, if_))
+    _push(work, if_.condition)
+
+
+def _finish_if(if_: stmt.If, work: Work, values: list):
+    condition = values.pop()
+    if condition is not None and condition is not False:
+        _push(work, if_.then_branch)
+    elif if_.else_branch is not None:
+        _push(work, if_.else_branch)
+
+
+class _Loop:
+    """A running ``while``, with the environment reused by a scoped body."""
+
+    __slots__ = ("statement", "outer", "environment", "scoped", "after")
+
+    def __init__(self, statement: stmt.While):
+        self.statement = statement
+        self.outer = interpreter.environment
+        self.environment = None
+        self.scoped, self.after = interpreter.loop_scope(statement.body)
+        if self.scoped is not None:
+            self.environment = Environment(self.outer)
+
+
+def _while(while_: stmt.While, work: Work, values: list):
+    _count()
+    work.append((_iterate, _Loop(while_)))
+    _push(work, while_.condition)
+
+
+def _iterate(loop: _Loop, work: Work, values: list):
+    condition = values.pop()
+    if condition is None or condition is False:
+        return
+
+    work.append((_iterate, loop))
+    _push(work, loop.statement.condition)
+    if loop.environment is None:
+        _push(work, loop.statement.body)
+        return
+
+    # As in the tree interpreter, the body blocks themselves are not executed
+    # but count as statements, and the scope is cleared for every iteration.
+    _count()
+    if loop.after:
+        _count()
+        _push_statements(work, loop.after)
+    work.append((_set_environment, loop.outer))
+    loop.environment.values.clear()
+    interpreter.environment = loop.environment
+    _push_statements(work, loop.scoped.statements)
+
+
+def _import(import_: stmt.Import, work: Work, values: list):
+    _count()
+    modules.import_module(import_.keyword, import_.path, interpreter.environment)
+
+
+_HANDLERS: dict[type, Callable[[object, Work, list], None]] = {
+    expr.Binary: _binary,
+    expr.Grouping: _grouping,
+    expr.Literal: _literal,
+    expr.Unary: _unary,
+    expr.Variable: _variable,
+    expr.Logical: _logical,
+    expr.Call: _call,
+    expr.Assign: _assign,
+    stmt.Expression: _expression,
+    stmt.Print: _print,
+    stmt.Var: _var,
+    stmt.Block: _block,
+    stmt.If: _if,
+    stmt.While: _while,
+    stmt.Import: _import,
+}
@@ -0,0 +1,154 @@
+import gc
+import json
+import sys
+import time
+from collections.abc import Callable
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+from plox import environment, interpreter, stmt, visit
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - not available on Windows
+    resource = None
+
+
+@dataclass
+class PhaseTiming:
+    wall: float = 0.0
+    cpu: float = 0.0
+    collections: int = 0  # cyclic garbage collector passes
+    gc_seconds: float = 0.0  # spent in those passes
+
+
+class _GcMeter:
+    """Counts collections and their time through ``gc.callbacks``.
+
+    The callback is only installed while some phase is being timed.
+    """
+
+    def __init__(self):
+        self.collections = 0
+        self.seconds = 0.0
+        self.users = 0
+        self.started = 0.0
+
+    def __call__(self, phase: str, info: dict):
+        if phase == "start":
+            self.started = time.perf_counter()
+        else:
+            self.collections += 1
+            self.seconds += time.perf_counter() - self.started
+
+    def acquire(self):
+        if not self.users:
+            gc.callbacks.append(self)
+        self.users += 1
+
+    def release(self):
+        self.users -= 1
+        if not self.users:
+            gc.callbacks.remove(self)
+
+
+_gc_meter = _GcMeter()
+
+
+@dataclass
+class PhaseEvent:
+    phase: str
+    kind: str  # "start" or "end"
+    timing: PhaseTiming
+    stats: "RunStats"
+
+
+@dataclass
+class RunStats:
+    """Counters and phase timings for a single ``plox.run``.
+
+    Stats passed to several runs add up, as over the entries of a REPL
+    session: ``tokens`` and ``nodes`` count every program prepared with them.
+    Hooks are called with a ``PhaseEvent`` when each phase starts and ends, so
+    embedders can observe a run while it is still in progress.
+    """
+
+    hooks: list[Callable[[PhaseEvent], None]] = field(default_factory=list)
+    phases: dict[str, PhaseTiming] = field(default_factory=dict)
+    tokens: int = 0
+    statements_executed: int = 0
+    environments_created: int = 0
+    max_environment_depth: int = 0
+    nodes: int = 0  # in the prepared programs, after the passes
+    frozen_objects: int = 0  # moved out of collections, see ``plox.collector``
+
+    def count_nodes(self, statements: list[stmt.Stmt]):
+        self.nodes += sum(1 for _ in visit.walk(statements))
+
+    @property
+    def peak_rss(self) -> int | None:
+        """Peak resident set size of the process in bytes, if known."""
+        if resource is None:
+            return None
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+    @contextmanager
+    def phase(self, name: str):
+        timing = self.phases.setdefault(name, PhaseTiming())
+        self._emit(name, "start", timing)
+        _gc_meter.acquire()
+        collections, gc_seconds = _gc_meter.collections, _gc_meter.seconds
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield timing
+        finally:
+            timing.wall += time.perf_counter() - wall
+            timing.cpu += time.process_time() - cpu
+            timing.collections += _gc_meter.collections - collections
+            timing.gc_seconds += _gc_meter.seconds - gc_seconds
+            _gc_meter.release()
+            self._emit(name, "end", timing)
+
+    @contextmanager
+    def execution(self):
+        """Count interpreter work done while the block runs."""
+        statements = interpreter.statements_executed
+        environments = environment.environments_created
+        environment.max_depth = interpreter.environment.depth
+        try:
+            yield
+        finally:
+            self.statements_executed += interpreter.statements_executed - statements
+            self.environments_created += environment.environments_created - environments
+            self.max_environment_depth = max(
+                self.max_environment_depth, environment.max_depth
+            )
+
+    def _emit(self, phase: str, kind: str, timing: PhaseTiming):
+        for hook in self.hooks:
+            hook(PhaseEvent(phase, kind, timing, self))
+
+    def as_dict(self) -> dict:
+        return {
+            "phases": {
+                name: {
+                    "wall": timing.wall,
+                    "cpu": timing.cpu,
+                    "collections": timing.collections,
+                    "gc_seconds": timing.gc_seconds,
+                }
+                for name, timing in self.phases.items()
+            },
+            "tokens": self.tokens,
+            "nodes": self.nodes,
+            "statements_executed": self.statements_executed,
+            "environments_created": self.environments_created,
+            "max_environment_depth": self.max_environment_depth,
+            "frozen_objects": self.frozen_objects,
+            "peak_rss": self.peak_rss,
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.as_dict())
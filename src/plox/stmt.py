@@ -1,10 +1,14 @@
 from abc import ABC, abstractmethod
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from functools import singledispatch
+from typing import TYPE_CHECKING
 
 from plox.expr import Expr
 from plox.scanner import Token
 
+if TYPE_CHECKING:
+    from plox.jit import Trace
+
 
 class Stmt(ABC):
     pass
@@ -29,3 +33,25 @@ class Var(Stmt):
 @dataclass
 class Block(Stmt):
     statements: list[Stmt]
+    needs_scope: bool = field(default=True, compare=False)
+    executions: int = field(default=0, compare=False, repr=False)
+    trace: "Trace | None" = field(default=None, compare=False, repr=False)
+
+
+@dataclass
+class If(Stmt):
+    condition: Expr
+    then_branch: Stmt
+    else_branch: Stmt | None
+
+
+@dataclass
+class While(Stmt):
+    condition: Expr
+    body: Stmt
+
+
+@dataclass
+class Import(Stmt):
+    keyword: Token
+    path: str
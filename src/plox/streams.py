@@ -0,0 +1,39 @@
+"""Where programs print and report their errors.
+
+Programs write to ``sys.stdout`` and ``sys.stderr``, looked up on every
+write, unless ``redirect`` has given the current context streams of its own.
+Context variables keep that per thread and per task, so a host running many
+programs, like ``plox.scheduler``, collects the output of each without
+touching the process-wide streams the others and the host write to.
+"""
+
+import sys
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import TextIO
+
+_output: ContextVar[TextIO | None] = ContextVar("output", default=None)
+_errors: ContextVar[TextIO | None] = ContextVar("errors", default=None)
+
+
+def output() -> TextIO:
+    """The stream ``print`` statements write to."""
+    return _output.get() or sys.stdout
+
+
+def errors() -> TextIO:
+    """The stream errors are reported to."""
+    return _errors.get() or sys.stderr
+
+
+@contextmanager
+def redirect(output: TextIO, errors: TextIO) -> Iterator[None]:
+    """Send output and errors from the current context to these streams."""
+    output_token = _output.set(output)
+    errors_token = _errors.set(errors)
+    try:
+        yield
+    finally:
+        _errors.reset(errors_token)
+        _output.reset(output_token)
@@ -0,0 +1,20 @@
+"""Process-wide identifier table.
+
+Every identifier is interned once and gets a small integer ID. Environments
+key their values on these IDs; the names are only needed for error messages.
+"""
+
+_ids: dict[str, int] = {}
+_names: list[str] = []
+
+
+def intern(name: str) -> int:
+    symbol = _ids.get(name)
+    if symbol is None:
+        symbol = _ids[name] = len(_names)
+        _names.append(name)
+    return symbol
+
+
+def name(symbol: int) -> str:
+    return _names[symbol]
@@ -0,0 +1,189 @@
+"""Numeric vectors.
+
+A ``Vector`` is a ``memoryview`` over an ``array('d')``. Arithmetic operators
+apply elementwise when either operand is a vector, with a number operand
+broadcast to every element, and the reductions run over the whole buffer.
+Each of these is a single call into a C loop (``map`` over an ``operator``
+function, ``sum``, ``math.sumprod``) rather than a Lox loop.
+
+Slices are views sharing the buffer of the vector they were taken from, so a
+slice costs the same whatever its length. Vectors are saved to and loaded
+from files as raw doubles in machine byte order.
+"""
+
+import math
+import operator
+from array import array
+from itertools import repeat
+
+from plox import natives, numbers
+from plox.natives import NativeError, NativeFunction
+from plox.scanner import Token, TokenType
+
+_PREVIEW = 8  # elements shown when printing
+
+_OPERATIONS = {
+    TokenType.PLUS: operator.add,
+    TokenType.MINUS: operator.sub,
+    TokenType.STAR: operator.mul,
+    TokenType.SLASH: operator.truediv,
+}
+
+
+class Vector:
+    __slots__ = ("data",)
+
+    def __init__(self, data: memoryview):
+        self.data = data
+
+    @classmethod
+    def of(cls, values) -> "Vector":
+        return cls(memoryview(array("d", values)))
+
+    def __len__(self):
+        return len(self.data)
+
+    def __str__(self):
+        items = [f"{value:g}" for value in self.data[:_PREVIEW]]
+        if len(self.data) > _PREVIEW:
+            items.append("...")
+        return f"[{', '.join(items)}]"
+
+
+def binary_operation(operator: Token, left: object, right: object) -> Vector:
+    """``left operator right`` where at least one operand is a vector."""
+    function = _OPERATIONS.get(operator.type)
+    if function is None:
+        raise RuntimeError(operator, "Operands must be numbers.")
+
+    if isinstance(left, Vector) and isinstance(right, Vector):
+        if len(left) != len(right):
+            raise RuntimeError(operator, "Vectors must have the same length.")
+        values = map(function, left.data, right.data)
+    elif isinstance(left, Vector) and numbers.is_number(right):
+        values = map(function, left.data, repeat(right))
+    elif numbers.is_number(left) and isinstance(right, Vector):
+        values = map(function, repeat(left), right.data)
+    else:
+        raise RuntimeError(operator, "Operands must be numbers or vectors.")
+
+    try:
+        return Vector.of(values)
+    except ZeroDivisionError:
+        raise RuntimeError(operator, "Division by zero.") from None
+
+
+def negate(vector: Vector) -> Vector:
+    return Vector.of(map(operator.neg, vector.data))
+
+
+# Natives
+
+
+def _vector(value: object, name: str = "Argument") -> Vector:
+    if not isinstance(value, Vector):
+        raise NativeError(f"{name} must be a vector.")
+    return value
+
+
+def _integer(value: object, name: str) -> int:
+    if value.__class__ is int:
+        return value
+    if value.__class__ is not float or not value.is_integer():
+        raise NativeError(f"{name} must be an integer.")
+    return int(value)
+
+
+def _path(value: object) -> str:
+    if not isinstance(value, str):
+        raise NativeError("Path must be a string.")
+    return value
+
+
+def _new(size: object, fill: object) -> Vector:
+    size = _integer(size, "Size")
+    if size < 0:
+        raise NativeError("Size must not be negative.")
+    if not numbers.is_number(fill):
+        raise NativeError("Fill value must be a number.")
+    return Vector(memoryview(array("d", [fill]) * size))
+
+
+def _size(vector: object) -> int:
+    return len(_vector(vector))
+
+
+def _at(vector: object, index: object) -> float:
+    data = _vector(vector).data
+    index = _integer(index, "Index")
+    if not 0 <= index < len(data):
+        raise NativeError("Index out of range.")
+    return data[index]
+
+
+def _slice(vector: object, start: object, end: object) -> Vector:
+    data = _vector(vector).data
+    start, end = _integer(start, "Start"), _integer(end, "End")
+    if not 0 <= start <= end <= len(data):
+        raise NativeError("Slice out of range.")
+    return Vector(data[start:end])
+
+
+def _sum(vector: object) -> float:
+    return float(sum(_vector(vector).data))
+
+
+def _min(vector: object) -> float:
+    data = _vector(vector).data
+    if not data:
+        raise NativeError("Vector is empty.")
+    return min(data)
+
+
+def _max(vector: object) -> float:
+    data = _vector(vector).data
+    if not data:
+        raise NativeError("Vector is empty.")
+    return max(data)
+
+
+def _dot(left: object, right: object) -> float:
+    left, right = _vector(left, "Left operand"), _vector(right, "Right operand")
+    if len(left) != len(right):
+        raise NativeError("Vectors must have the same length.")
+    return float(math.sumprod(left.data, right.data))
+
+
+def _load(path: object) -> Vector:
+    values = array("d")
+    try:
+        with open(_path(path), "rb") as file:
+            values.frombytes(file.read())
+    except OSError as error:
+        raise NativeError(f"Cannot load vector: {error.strerror}.") from None
+    except ValueError:
+        raise NativeError("File does not hold a whole number of doubles.") from None
+    return Vector(memoryview(values))
+
+
+def _save(vector: object, path: object) -> None:
+    data = _vector(vector).data
+    try:
+        with open(_path(path), "wb") as file:
+            file.write(data)
+    except OSError as error:
+        raise NativeError(f"Cannot save vector: {error.strerror}.") from None
+
+
+natives.register(
+    NativeFunction("vector", 2, _new),
+    NativeFunction("size", 1, _size),
+    NativeFunction("at", 2, _at),
+    NativeFunction("slice", 3, _slice),
+    NativeFunction("sum", 1, _sum),
+    NativeFunction("min", 1, _min),
+    NativeFunction("max", 1, _max),
+    NativeFunction("dot", 2, _dot),
+    NativeFunction("load", 1, _load),
+    NativeFunction("save", 2, _save),
+)
@@ -0,0 +1,75 @@
+from collections.abc import Generator, Iterable, Iterator
+from dataclasses import fields
+from functools import cache
+from types import GeneratorType
+
+from plox.expr import Expr
+from plox.stmt import Stmt
+
+Node = Expr | Stmt
+
+
+@cache
+def _field_names(cls: type) -> tuple[str, ...]:
+    return tuple(field.name for field in fields(cls) if field.compare)
+
+
+def children(node: Node) -> Iterator[Node]:
+    for name in _field_names(type(node)):
+        value = getattr(node, name)
+        if isinstance(value, (Expr, Stmt)):
+            yield value
+        elif isinstance(value, list):
+            yield from (item for item in value if isinstance(item, (Expr, Stmt)))
+
+
+def walk(nodes: Iterable[Node]) -> Iterator[Node]:
+    """Yield every node reachable from ``nodes`` in pre-order, without recursion."""
+    stack = list(reversed(list(nodes)))
+    while stack:
+        node = stack.pop()
+        if node is None:
+            continue
+        yield node
+        stack.extend(reversed(list(children(node))))
+
+
+def trampoline(steps: Generator | object) -> object:
+    """Run a recursive computation written as generators, without recursion.
+
+    A generator asks for the value of a nested computation by yielding it:
+    either another such generator, which runs to completion first and whose
+    return value is sent back, or a value that is sent straight back, for
+    computations that never nest. Exceptions propagate from a nested
+    generator into the one that yielded it, as they would from a call, so
+    handlers and ``finally`` blocks work as in the recursive version. Nesting
+    is bounded by memory rather than by the recursion limit.
+    """
+    if not isinstance(steps, GeneratorType):
+        return steps
+    stack = [steps]
+    value = error = None
+    while True:
+        try:
+            if error is None:
+                request = stack[-1].send(value)
+            else:
+                raised, error = error, None
+                request = stack[-1].throw(raised)
+        except StopIteration as stop:
+            stack.pop()
+            if not stack:
+                return stop.value
+            value = stop.value
+            continue
+        except Exception as raised:
+            stack.pop()
+            if not stack:
+                raise
+            error = raised
+            continue
+        if isinstance(request, GeneratorType):
+            stack.append(request)
+            value = None
+        else:
+            value = request
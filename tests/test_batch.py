@@ -0,0 +1,117 @@
+from array import array
+from unittest import mock
+
+import pytest
+
+import plox
+from plox import interpreter, natives
+from plox.batch import Formula, RowError, evaluate_batch
+from plox.environment import Environment
+from plox.parser import Parser
+from plox.scanner import Scanner
+
+
+def expression(source: str):
+    return Parser(Scanner(source).scan_tokens()).expression()
+
+
+class TestBatch:
+    def setup_method(self):
+        plox.had_error = plox.had_runtime_error = False
+        interpreter.environment = natives.define(Environment())
+
+    def test_arithmetic_on_number_columns(self):
+        result = evaluate_batch(
+            expression("(a + b) * 2 - -a / 4"),
+            {"a": array("d", [4, 8, 12]), "b": [1.0, 2.0, 3.0]},
+        )
+        assert isinstance(result, array)
+        assert list(result) == [11, 22, 33]
+
+    def test_integer_arrays_are_numbers(self):
+        result = evaluate_batch(expression("a / 2"), {"a": array("i", [1, 2])})
+        assert list(result) == [0.5, 1.0]
+
+    def test_comparisons_and_equality(self):
+        result = evaluate_batch(
+            expression('a < 2 == (b == "x")'), {"a": [1.0, 2.0, 3.0], "b": ["x"] * 3}
+        )
+        assert result == [True, False, False]
+
+    def test_strings_and_mixed_columns(self):
+        result = evaluate_batch(expression('s + "!"'), {"s": ["a", "b"]})
+        assert result == ["a!", "b!"]
+
+    def test_constant_expression_fills_the_column(self):
+        assert list(evaluate_batch(expression("1 + 2"), {}, size=3)) == [3, 3, 3]
+
+    def test_globals_are_constants(self):
+        plox.run("var scale = 10;")
+        result = evaluate_batch(expression("a * scale"), {"a": [1.0, 2.0]})
+        assert list(result) == [10, 20]
+
+    def test_logical_evaluates_right_only_where_needed(self):
+        result = evaluate_batch(
+            expression('a > 0 and "big" or -s'), {"a": [1.0, -1.0], "s": [None, 3.0]}
+        )
+        assert result == ["big", -3.0]
+
+    def test_calls(self):
+        result = evaluate_batch(
+            expression("sum(vector(n, x))"), {"n": [1.0, 2.0], "x": [2.0, 3.0]}
+        )
+        assert list(result) == [2.0, 6.0]
+
+    def test_error_names_the_row(self):
+        with pytest.raises(RowError) as raised:
+            evaluate_batch(expression("a - 1"), {"a": [1.0, 2.0, "three", 4.0]})
+        assert raised.value.row == 2
+        assert raised.value.args[1] == "Operands must be numbers. (row 2)"
+
+    def test_error_row_in_short_circuited_operand(self):
+        with pytest.raises(RowError) as raised:
+            evaluate_batch(expression("a or -b"), {"a": [1.0, None], "b": ["x", "y"]})
+        assert raised.value.row == 1
+
+    def test_division_by_zero(self):
+        with pytest.raises(RowError, match="Division by zero"):
+            evaluate_batch(expression("1 / a"), {"a": array("d", [1, 0])})
+
+    def test_error_is_reported_like_runtime_errors(self, capsys):
+        with pytest.raises(RowError) as raised:
+            evaluate_batch(expression("-a"), {"a": [1.0, "x"]})
+        plox.runtime_error(raised.value)
+        assert capsys.readouterr().err == "Operand must be numbers. (row 1)\n[line 1]\n"
+
+    def test_columns_must_have_the_same_length(self):
+        with pytest.raises(ValueError):
+            evaluate_batch(expression("a + b"), {"a": [1.0], "b": [1.0, 2.0]})
+
+    def test_size_or_column_is_required(self):
+        with pytest.raises(ValueError, match="size or at least one column"):
+            evaluate_batch(expression("1 + 2"), {})
+
+    def test_assignment_is_rejected(self):
+        with pytest.raises(ValueError, match="Assign"):
+            Formula(expression("a = 1"))
+
+    def test_matches_row_by_row_evaluation(self):
+        source = "(a * 2 + b) / 3 > 1 and a < b or a == 5"
+        columns = {
+            "a": [float(i) for i in range(20)],
+            "b": [float(20 - i) for i in range(20)],
+        }
+        formula = Formula(expression(source))
+        result = formula.evaluate(columns)
+
+        for row in range(20):
+            interpreter.environment = natives.define(Environment())
+            plox.run(f"var a = {row}; var b = {20 - row};")
+            assert interpreter.evaluate(expression(source)) == result[row]
+
+    def test_compiles_once(self):
+        formula = Formula(expression("a + 1"))
+        with mock.patch("plox.batch._compile") as compile_:
+            formula.evaluate({"a": [1.0]})
+            formula.evaluate({"a": [2.0]})
+        compile_.assert_not_called()
@@ -0,0 +1,158 @@
+import asyncio
+from unittest import mock
+
+import pytest
+
+import plox
+from plox import budget, interpreter, jit, natives
+from plox.budget import Budget, BudgetExceeded, enforce
+from plox.environment import Environment
+from plox.parser import Parser
+from plox.scanner import Scanner
+from plox.scheduler import Scheduler
+
+LOOP = "var i = 0; while (true) { var j = i; i = j + 1; }"
+
+
+def parse(source: str):
+    return Parser(Scanner(source).scan_tokens()).parse()
+
+
+class TestBudget:
+    def setup_method(self):
+        plox.had_error = False
+        plox.had_runtime_error = False
+        interpreter.environment = natives.define(Environment())
+        interpreter.statements_executed = 0
+
+    @pytest.mark.parametrize("engine", ["tree", "stackless", "flat", "ir"])
+    @pytest.mark.parametrize("optimize", [0, 1, 2])
+    def test_statements(self, engine, optimize):
+        with pytest.raises(BudgetExceeded, match="budget of 5000 statements"):
+            plox.run(
+                LOOP, engine=engine, optimize=optimize, budget=Budget(statements=5000)
+            )
+        assert 5000 < interpreter.statements_executed <= 5000 + 10
+        assert budget.next_check == budget.UNLIMITED[1]
+
+    def test_statements_in_compiled_block(self):
+        setup, assignment, block = parse(
+            "var n = 0; n = 1000000; { var i = 0; while (i < n) i = i + 1; }"
+        )
+        jit.enable(threshold=2)
+        try:
+            interpreter.interpret([setup])
+            for _ in range(3):
+                interpreter.interpret([block])
+            assert block.trace.function is not None
+
+            interpreter.interpret([assignment])
+            with enforce(Budget(statements=100), interpreter.statements_executed):
+                with pytest.raises(BudgetExceeded):
+                    interpreter.interpret([block])
+        finally:
+            jit.disable()
+
+    @pytest.mark.parametrize("engine", ["tree", "stackless", "flat", "ir"])
+    def test_seconds(self, engine):
+        with mock.patch("time.perf_counter", side_effect=range(0, 10**6, 10)):
+            with pytest.raises(BudgetExceeded, match="budget of 30 seconds"):
+                plox.run(LOOP, engine=engine, budget=Budget(seconds=30, interval=1))
+
+    @pytest.mark.parametrize("engine", ["tree", "stackless", "flat", "ir"])
+    def test_depth(self, engine, capsys):
+        source = "{ print 1; " * 20 + "var a = 1; print a;" + "}" * 20
+        with pytest.raises(BudgetExceeded, match="budget of 10 nested"):
+            plox.run(source, engine=engine, optimize=0, budget=Budget(depth=10))
+        assert capsys.readouterr().out == "1\n" * 10
+
+    @pytest.mark.parametrize("engine", ["tree", "stackless", "flat", "ir"])
+    @pytest.mark.parametrize("optimize", [0, 1])
+    def test_string_length(self, engine, optimize):
+        source = 'var s = "ab"; while (true) s = s + s;'
+        with pytest.raises(BudgetExceeded, match="budget of 100 characters"):
+            plox.run(
+                source,
+                engine=engine,
+                optimize=optimize,
+                budget=Budget(string_length=100),
+            )
+
+    def test_within_budget(self, capsys):
+        plox.run("print 1 + 2;", budget=Budget(statements=10, depth=1))
+        assert capsys.readouterr().out == "3\n"
+        assert not plox.had_runtime_error
+
+    def test_on_yield(self):
+        on_yield = mock.Mock()
+        with pytest.raises(BudgetExceeded):
+            plox.run(
+                LOOP, budget=Budget(statements=1000, interval=100, on_yield=on_yield)
+            )
+        assert on_yield.call_count == 10
+
+    def test_limits_are_lifted_afterwards(self, capsys):
+        with pytest.raises(BudgetExceeded):
+            plox.run(LOOP, budget=Budget(statements=100, depth=5, string_length=5))
+        plox.run('{{{{{{ print "abc" + "def"; }}}}}}')
+        assert capsys.readouterr().out == "abcdef\n"
+
+
+class TestScheduler:
+    def test_programs_take_turns(self, capsys):
+        source = "var i = 0; while (i < 3000) { print i; i = i + 1; }"
+        scheduler = Scheduler(slice_seconds=0)
+        order = []
+
+        def recorder(name):
+            return Budget(interval=500, on_yield=lambda: order.append(name))
+
+        async def main():
+            return await asyncio.gather(
+                scheduler.run(source, recorder("a")),
+                scheduler.run(source, recorder("b")),
+            )
+
+        first, second = asyncio.run(main())
+        expected = "".join(f"{i}\n" for i in range(3000))
+        assert first.output == second.output == expected
+        assert "a" in order and "b" in order
+        assert order != sorted(order)
+        assert capsys.readouterr().out == ""
+
+    def test_host_output_is_not_collected(self, capsys):
+        source = "var i = 0; while (i < 3000) { print i; i = i + 1; }"
+        printed = 0
+
+        async def main():
+            nonlocal printed
+            run = asyncio.ensure_future(Scheduler().run(source))
+            while not run.done():
+                print("host")
+                printed += 1
+                await asyncio.sleep(0)
+            return await run
+
+        outcome = asyncio.run(main())
+        assert outcome.output == "".join(f"{i}\n" for i in range(3000))
+        assert capsys.readouterr().out == "host\n" * printed
+
+    def test_runaway_program(self):
+        scheduler = Scheduler(slice_seconds=0)
+
+        async def main():
+            return await asyncio.gather(
+                scheduler.run(LOOP, Budget(statements=10000)),
+                scheduler.run("print 1 + 2;"),
+                return_exceptions=True,
+            )
+
+        exceeded, outcome = asyncio.run(main())
+        assert isinstance(exceeded, BudgetExceeded)
+        assert outcome.output == "3\n"
+
+    def test_errors_are_collected(self):
+        outcome = asyncio.run(Scheduler().run('print -"a";'))
+        assert outcome.had_runtime_error
+        assert outcome.errors == "Operand must be numbers.\n[line 1]\n"
+        assert not plox.had_runtime_error
@@ -0,0 +1,73 @@
+import gc
+
+import plox
+from plox import collector, interpreter, natives
+from plox.environment import Environment
+from plox.stats import RunStats, _gc_meter
+
+SOURCE = "var a = 1; { var b = 2; { print a + b; } }"
+
+
+class TestCollector:
+    def setup_method(self):
+        plox.had_error = plox.had_runtime_error = False
+        interpreter.environment = natives.define(Environment())
+        gc.unfreeze()  # in case the Python startup froze objects
+
+    def test_paused_restores_the_collector(self):
+        with collector.paused():
+            assert not gc.isenabled()
+        assert gc.isenabled()
+
+        gc.disable()
+        try:
+            with collector.paused():
+                pass
+            assert not gc.isenabled()
+        finally:
+            gc.enable()
+
+    def test_frozen_counts_and_unfreezes(self):
+        stats = RunStats()
+        with collector.frozen(stats):
+            assert gc.get_freeze_count() > 0
+        assert stats.frozen_objects > 0
+        assert gc.get_freeze_count() == 0
+
+    def test_objects_frozen_before_stay_frozen(self):
+        gc.freeze()
+        try:
+            with collector.frozen(RunStats()):
+                pass
+            assert gc.get_freeze_count() > 0
+        finally:
+            gc.unfreeze()
+
+    def test_nested_frozen_keeps_the_outer_freeze(self):
+        with collector.frozen(RunStats()):
+            with collector.frozen(RunStats()):
+                pass
+            assert gc.get_freeze_count() > 0
+        assert gc.get_freeze_count() == 0
+
+    def test_phases_count_collections(self):
+        stats = RunStats()
+        with stats.phase("collect"):
+            gc.collect()
+        timing = stats.phases["collect"]
+        assert timing.collections >= 1
+        assert 0 <= timing.gc_seconds <= timing.wall
+        assert _gc_meter not in gc.callbacks  # only while timing
+
+    def test_bulk_run(self, capsys):
+        thresholds = gc.get_threshold()
+        gc.set_threshold(1)  # collect on every allocation unless paused
+        try:
+            stats = plox.run(SOURCE, bulk=True)
+        finally:
+            gc.set_threshold(*thresholds)
+        assert capsys.readouterr().out == "3\n"
+        assert stats.phases["scan"].collections == 0
+        assert stats.phases["parse"].collections == 0
+        assert stats.frozen_objects > 0
+        assert gc.isenabled() and gc.get_freeze_count() == 0
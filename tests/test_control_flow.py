@@ -0,0 +1,129 @@
+from unittest import mock
+
+import pytest
+
+import plox
+from plox import interpreter, jit
+from plox.environment import Environment
+from plox.parser import Parser
+from plox.scanner import Scanner
+from plox.stmt import Block, Expression, If, Var, While
+
+SOURCE = """
+var total = 0;
+for (var i = 0; i < 5; i = i + 1) {
+    var square = i * i;
+    if (square > 4 and i != 4) total = total + square;
+    else { total = total - 1; }
+}
+print total;
+var n = 0;
+while (n < 3) n = n + 1;
+print n;
+print nil or "default";
+print false and undefined;
+if (0) print "zero is truthy";
+"""
+
+OUTPUT = "5\n3\ndefault\nFalse\nzero is truthy\n"
+
+
+def parse(source: str):
+    return Parser(Scanner(source).scan_tokens()).parse()
+
+
+class TestParse:
+    def test_for_is_desugared_into_while(self):
+        [loop] = parse("for (var i = 0; i < 2; i = i + 1) print i;")
+        assert isinstance(loop, Block) and loop.needs_scope
+        initializer, while_ = loop.statements
+        assert isinstance(initializer, Var)
+        assert isinstance(while_, While)
+        assert not while_.body.needs_scope
+        assert isinstance(while_.body.statements[-1], Expression)
+
+    def test_for_without_clauses(self):
+        [while_] = parse("for (;;) print 1;")
+        assert isinstance(while_, While)
+        assert while_.condition.value is True
+
+    def test_dangling_else_binds_to_nearest_if(self):
+        [outer] = parse("if (true) if (false) print 1; else print 2;")
+        assert outer.else_branch is None
+        assert isinstance(outer.then_branch, If)
+        assert outer.then_branch.else_branch is not None
+
+
+class TestInterpret:
+    def setup_method(self):
+        plox.had_error = False
+        plox.had_runtime_error = False
+        interpreter.environment = Environment()
+        interpreter.statements_executed = 0
+
+    @pytest.mark.parametrize("engine", ["tree", "stackless", "flat", "ir"])
+    @pytest.mark.parametrize("optimize", [0, 1, 2])
+    def test_engines_agree(self, capsys, engine, optimize):
+        plox.run(SOURCE, optimize=optimize)
+        expected = capsys.readouterr().out, interpreter.statements_executed
+
+        interpreter.environment = Environment()
+        interpreter.statements_executed = 0
+        plox.run(SOURCE, engine=engine, optimize=optimize)
+        assert (capsys.readouterr().out, interpreter.statements_executed) == expected
+        assert expected[0] == OUTPUT
+
+    def test_jit_agrees(self, capsys):
+        source = "var t = 0; { for (var i = 0; i < 4; i = i + 1) t = t + i; }"
+        *setup, block = parse(source)
+        interpreter.interpret(setup)
+        for _ in range(3):
+            interpreter.interpret([block])
+        expected = interpreter.environment.values.copy()
+        executed = interpreter.statements_executed
+
+        jit.enable(threshold=1)
+        try:
+            interpreter.environment = Environment()
+            interpreter.statements_executed = 0
+            *setup, block = parse(source)
+            interpreter.interpret(setup)
+            for _ in range(3):
+                interpreter.interpret([block])
+        finally:
+            jit.disable()
+        assert block.trace.function is not None
+        assert interpreter.environment.values == expected
+        assert interpreter.statements_executed == executed
+
+    def test_logical_operators_return_operands(self, capsys):
+        plox.run('print 1 and "two"; print nil or false; print false or 0;')
+        assert capsys.readouterr().out == "two\nFalse\n0\n"
+
+    def test_loop_body_scope_is_fresh_each_iteration(self, capsys):
+        plox.run(
+            "var i = 0; while (i < 2) { var seen; print seen; seen = i; i = i + 1; }"
+        )
+        assert capsys.readouterr().out == "nil\nnil\n"
+
+    def test_loop_reuses_one_environment(self):
+        statements = parse("var i = 0; while (i < 3) { var j = i; i = j + 1; }")
+        with mock.patch.object(
+            interpreter, "Environment", wraps=interpreter.Environment
+        ) as environment:
+            interpreter.interpret(statements)
+        assert environment.call_count == 1
+
+    @pytest.mark.parametrize("engine", ["tree", "flat", "stackless"])
+    def test_for_loop_reuses_one_environment(self, engine, capsys):
+        loop = "for (var i = 0; i < 3; i = i + 1) { var i = 10 + i; print i; }"
+        stats = plox.run(loop, engine=engine)
+        # One for the initializer's scope, one shared by every iteration.
+        assert stats.environments_created == 2
+        assert stats.statements_executed == 18
+        assert capsys.readouterr().out == "10\n11\n12\n"
+
+    def test_runtime_error_in_loop_condition(self, capsys):
+        with mock.patch("plox.error"):
+            plox.run('var i = 0; while (i < "x") i = i + 1;')
+        assert plox.had_runtime_error
@@ -0,0 +1,134 @@
+from unittest import mock
+
+import plox
+from plox import deadcode, inference, interpreter
+from plox.ast_printer import ast_printer
+from plox.environment import Environment
+from plox.parser import Parser
+from plox.scanner import Scanner
+from plox.stmt import Block, Expression, Print, Var
+
+
+def eliminate(source: str, keep_globals=False):
+    statements = Parser(Scanner(source).scan_tokens()).parse()
+    inference.infer(statements)
+    return deadcode.eliminate(statements, keep_globals=keep_globals)
+
+
+class TestEliminate:
+    def test_pure_expression_statements_are_removed(self):
+        statements, removals = eliminate('1 + 2; "a" + "b"; (nil); print 3;')
+        assert [type(s) for s in statements] == [Print]
+        assert len(removals) == 3
+
+    def test_unused_variable_is_removed(self):
+        statements, removals = eliminate("var a = 1; print 2;")
+        assert [type(s) for s in statements] == [Print]
+        assert [str(r) for r in removals] == ["[line 1] removed unused variable 'a'"]
+
+    def test_overwritten_store_is_removed(self):
+        statements, removals = eliminate("var a = 1; a = 2; a = 3; print a;")
+        assert [type(s) for s in statements] == [Var, Expression, Print]
+        assert statements[0].initializer is None
+        assert "removed dead store to 'a'" in [r.description for r in removals]
+
+    def test_dead_initializer_is_dropped(self):
+        statements, _ = eliminate("var a = 1; a = clock; print a;")
+        var, _, _ = statements
+        assert var.initializer is None
+
+    def test_read_variable_is_kept(self):
+        statements, removals = eliminate("var a = 1; print a;")
+        assert [type(s) for s in statements] == [Var, Print]
+        assert removals == []
+
+    def test_shadowed_variable_is_tracked_per_declaration(self):
+        statements, _ = eliminate("var a = 1; { var a = 2; } print a;")
+        assert [type(s) for s in statements] == [Var, Print]
+
+    def test_store_to_outer_variable_from_block_is_kept(self):
+        statements, _ = eliminate("var a = 1; { a = 2; } print a;")
+        var, block, _ = statements
+        assert var.initializer is None
+        assert isinstance(block, Block)
+
+    def test_empty_blocks_are_removed(self):
+        statements, _ = eliminate("{ var a = 1; { 2; } } print 3;")
+        assert [type(s) for s in statements] == [Print]
+
+    def test_expression_that_may_raise_is_kept(self):
+        statements, _ = eliminate("var a = -b; 1 + nil; print 1;")
+        assert [ast_printer(s.expression) for s in statements] == [
+            "(- b)",
+            "(+ 1.0 None)",
+            "1.0",
+        ]
+
+    def test_division_by_zero_is_kept(self):
+        statements, _ = eliminate("1 / 0; 1 / 2; print 1;")
+        assert [ast_printer(s.expression) for s in statements] == ["(/ 1.0 0.0)", "1.0"]
+
+    def test_side_effect_in_dead_store_is_kept(self):
+        statements, _ = eliminate("var a = 1; var b = 2; b = a = 3; print a;")
+        assert ast_printer(statements[-2].expression) == "(= a 3.0)"
+
+    def test_unknown_globals_are_unsafe_to_read(self):
+        statements, _ = eliminate("a; print 1;")
+        assert isinstance(statements[0], Expression)
+
+    def test_literal_conditions_remove_branches_and_loops(self):
+        statements, _ = eliminate(
+            "if (nil) print 1; else print 2; while (false) print 3;"
+        )
+        assert [ast_printer(s.expression) for s in statements] == ["2.0"]
+
+    def test_store_read_by_next_iteration_is_kept(self):
+        statements, _ = eliminate(
+            "var i = 0; var a = 0; while (i < 3) { print a; a = i; i = i + 1; }"
+        )
+        assert len(statements[-1].body.statements) == 3
+
+    def test_store_before_a_loop_that_may_not_run_is_kept(self):
+        statements, _ = eliminate(
+            "var i = 0; var a = 1; while (i < 0) { a = 2; i = i + 1; } print a;"
+        )
+        assert statements[1].initializer is not None
+
+    def test_store_read_on_one_branch_is_kept(self):
+        statements, _ = eliminate("var a = 1; a = 2; if (true and a) print a;")
+        assert isinstance(statements[1], Expression)
+
+    def test_keep_globals(self):
+        statements, removals = eliminate("var a = 1; a = 2; { var b = a; }", True)
+        assert [type(s) for s in statements] == [Var, Expression]
+        assert [r.description for r in removals] == [
+            "removed empty block",
+            "removed unused variable 'b'",
+        ]
+
+
+class TestRun:
+    def setup_method(self):
+        plox.had_error = False
+        plox.had_runtime_error = False
+        interpreter.environment = Environment()
+
+    def test_output_is_unchanged(self, capsys):
+        source = "var a = 1; var b = a + 1; a = b * 2; { var a = 10; a; } print a;"
+        plox.run(source)
+        expected = capsys.readouterr().out
+        plox.run(source, optimize=2)
+        assert capsys.readouterr().out == expected == "4\n"
+
+    def test_runtime_error_is_preserved(self, capsys):
+        with mock.patch("plox.error"):
+            plox.run('var a = -"x"; print 1;', optimize=2)
+        assert plox.had_runtime_error
+        assert capsys.readouterr().out == ""
+
+    def test_verbose_reports_removals(self, capsys):
+        plox.run("var a = 1;\n2 + 2;\nprint 3;", optimize=2, verbose=True)
+        assert capsys.readouterr().err == (
+            "[line 1] removed unused variable 'a'\n"
+            "[line 2] removed unused expression\n"
+        )
@@ -0,0 +1,89 @@
+import plox
+from plox import differential, interpreter, natives
+from plox.differential import Outcome, Path, Report, Result
+from plox.environment import Environment
+from plox.parser import Parser
+from plox.scanner import Scanner
+
+
+class TestDifferential:
+    def setup_method(self):
+        plox.had_error = False
+        plox.had_runtime_error = False
+        interpreter.environment = natives.define(Environment())
+
+    def test_generated_programs_parse(self):
+        for seed in range(50):
+            source = str(differential.generate(seed))
+            Parser(Scanner(source).scan_tokens()).parse()
+            assert not plox.had_error, source
+
+    def test_generation_is_deterministic(self):
+        assert str(differential.generate(7)) == str(differential.generate(7))
+
+    def test_paths_agree(self):
+        report = differential.run(programs=10, size=20)
+        assert report.programs == 10
+        assert report.failures == []
+        assert set(report.timings) == set(differential.PATHS)
+
+    def test_outcomes_have_exit_codes(self):
+        path = Path("plain", "tree", 1)
+        assert differential.run_path(path, "print 1;") == Outcome("1\n", 0)
+        assert differential.run_path(path, "print 1 +;").code == 65
+        assert differential.run_path(path, 'print 1; print -"a";') == Outcome(
+            "1\n", 70, "Operand must be numbers.\n[line 1]\n"
+        )
+
+    def test_errors_are_compared(self):
+        outcomes = {
+            Path("plain", "tree", 1): Outcome("", 70, "Division by zero.\n[line 1]\n"),
+            Path("plain", "ir", 1): Outcome("", 70, "Division by zero.\n[line 2]\n"),
+        }
+        assert Result("", outcomes).failed
+
+    def test_front_ends_report_the_same_errors(self):
+        parse_error = "print 1;\nprint (2;\nprint 3;\n"
+        runtime_error = "var b = 1;\nprint 1 / b;\nb = 0;\nprint 1 / b;\n"
+        for source in (parse_error, runtime_error):
+            result = differential.check(source)
+            assert not result.failed, result.describe()
+        outcome = result.outcomes[Path("hashcons", "tree", 1)]
+        assert outcome.errors == "Division by zero.\n[line 4]\n"
+
+    def test_runaway_programs_are_skipped(self):
+        assert differential.check("while (true) {}") is None
+
+    def test_discrepancy_is_minimized(self):
+        program = differential.generate(3, size=40)
+        source = str(program)
+        assert "print" in source
+
+        # Pretend that an engine mishandles every print of a subtraction.
+        def failing(source: str) -> bool:
+            return any(
+                line.startswith("print ") and " - " in line
+                for line in source.splitlines()
+            )
+
+        program.parts.append(differential.Fragment(["print 2 - 1;\n"]))
+        reproducer = differential.minimize(program, failing)
+        assert failing(reproducer)
+        assert len(reproducer) < len(source)
+        assert reproducer.count("\n") <= 2
+
+    def test_table(self):
+        report = Report(
+            timings={Path("plain", "tree", 0): 2.0, Path("plain", "ir", 2): 1.0}
+        )
+        assert report.table().splitlines() == [
+            "path             seconds  relative",
+            "plain tree -O0     2.000      1.00",
+            "plain ir -O2       1.000      0.50",
+        ]
+
+    def test_main(self, capsys):
+        assert differential.main(["--programs", "2", "--size", "5"]) == 0
+        out = capsys.readouterr().out
+        assert "2 programs, 0 skipped, 0 failed" in out
+        assert "plain stackless -O2" in out
@@ -0,0 +1,107 @@
+import io
+import sys
+
+import pytest
+
+from plox import dump, expr, stmt
+from plox.ast_printer import ast_printer
+from plox.parser import Parser
+from plox.scanner import Scanner
+
+SOURCE = """
+var a = 1;
+var b;
+var s = "text";
+for (var i = 0; i < 3; i = i + 1) {
+    if (i > a or !nil) print clock(); else a = -(a * 2);
+    while (false) {}
+}
+print f(a, s)(true);
+"""
+
+
+def parse(source: str):
+    return Parser(Scanner(source).scan_tokens()).parse()
+
+
+def deep(depth: int) -> stmt.Print:
+    """``print - - ... 1;``, built without the recursive parser."""
+    [statement] = parse("print -1;")
+    minus = statement.expression
+    expression = minus.right
+    for _ in range(depth):
+        expression = expr.Unary(minus.operator, expression)
+    return stmt.Print(expression)
+
+
+class TestText:
+    def test_statements(self):
+        file = io.StringIO()
+        dump.write_text(parse("var a; var b = 1; { print b; } if (a) b = 2;"), file)
+        assert file.getvalue() == (
+            "(var a)\n"
+            "(var b 1.0)\n"
+            "(block (print b))\n"
+            "(if a (expr (= b 2.0)))\n"
+        )
+
+    def test_expressions_match_ast_printer(self):
+        [statement] = parse("-(1 + 2) * f(x, nil) or (y = !true);")
+        assert dump.text(statement.expression) == (
+            "(or (* (- (group (+ 1.0 2.0))) (call f x None)) (group (= y (! True))))"
+        )
+        assert ast_printer(statement.expression) == dump.text(statement.expression)
+
+    def test_deep_tree_does_not_recurse(self):
+        depth = sys.getrecursionlimit() * 2
+        assert dump.text(deep(depth)) == f"(print {'(- ' * depth}1.0{')' * depth})"
+
+
+class TestJson:
+    def round_trip(self, statements):
+        file = io.StringIO()
+        dump.write_json(statements, file)
+        file.seek(0)
+        return dump.read_json(file)
+
+    def test_round_trip(self):
+        statements = parse(SOURCE)
+        loaded = self.round_trip(statements)
+        assert loaded == statements
+        assert [s.needs_scope for s in loaded if hasattr(s, "needs_scope")] == [
+            s.needs_scope for s in statements if hasattr(s, "needs_scope")
+        ]
+        assert loaded[0].name.symbol == statements[0].name.symbol
+
+    def test_one_record_per_line(self):
+        file = io.StringIO()
+        dump.write_json(parse("var a; print 1 + a;"), file)
+        assert file.getvalue().splitlines() == [
+            "null",
+            '["Var",["IDENTIFIER","a",1]]',
+            '["Literal",1]',
+            '["Variable",["IDENTIFIER","a",1]]',
+            '["Binary",["PLUS","+",1]]',
+            '["Print"]',
+        ]
+
+    def test_deep_tree_does_not_recurse(self):
+        statement = deep(sys.getrecursionlimit() * 2)
+        [loaded] = self.round_trip([statement])
+        assert dump.text(loaded) == dump.text(statement)
+
+    def test_writes_incrementally(self):
+        class File(io.StringIO):
+            writes = 0
+
+            def write(self, text):
+                self.writes += 1
+                return super().write(text)
+
+        file = File()
+        dump.write_json(parse("print 1;" * 5000), file)
+        assert file.writes > 1
+
+    def test_invalid_record(self):
+        with pytest.raises(ValueError, match="line 2"):
+            dump.read_json(['["Literal",1.0]', '["Binary",["PLUS","+",1]]'])
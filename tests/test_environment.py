@@ -0,0 +1,96 @@
+import pytest
+
+import plox
+from plox import expr, interpreter, natives, symbols
+from plox.environment import Environment, GlobalCache
+from plox.scanner import Token, TokenType
+
+
+def name(lexeme: str) -> Token:
+    return Token(TokenType.IDENTIFIER, lexeme, None, 1)
+
+
+class TestGlobalCache:
+    def setup_method(self):
+        plox.had_error = plox.had_runtime_error = False
+        interpreter.environment = natives.define(Environment())
+
+    def nested(self, globals_: Environment, depth: int = 3) -> Environment:
+        environment = globals_
+        for _ in range(depth):
+            environment = Environment(environment)
+        return environment
+
+    def test_hit_reads_the_globals_directly(self):
+        globals_ = Environment()
+        globals_.define(symbols.intern("cached"), 1)
+        inner = self.nested(globals_)
+        cache = GlobalCache()
+
+        assert inner.get(name("cached"), cache) == 1
+        assert cache.version == Environment.version
+        # Only ``define`` can shadow a global, so a hit does not walk the
+        # chain and would not see a value put there behind its back.
+        inner.values[symbols.intern("cached")] = "unseen"
+        assert inner.get(name("cached"), cache) == 1
+
+    def test_nested_definition_invalidates(self):
+        globals_ = Environment()
+        globals_.define(symbols.intern("shadowed"), "global")
+        inner = self.nested(globals_)
+        cache = GlobalCache()
+        assert inner.get(name("shadowed"), cache) == "global"
+
+        inner.enclosing.define(symbols.intern("shadowed"), "local")
+        assert cache.version != Environment.version
+        assert inner.get(name("shadowed"), cache) == "local"
+        assert globals_.get(name("shadowed"), cache) == "global"
+
+    def test_assign(self):
+        globals_ = Environment()
+        globals_.define(symbols.intern("counter"), 0)
+        inner = self.nested(globals_)
+        cache = GlobalCache()
+        for value in range(3):
+            inner.assign(name("counter"), value, cache)
+        assert globals_.values[symbols.intern("counter")] == 2
+        assert cache.version == Environment.version
+
+    def test_site_shared_between_globals(self):
+        cache = GlobalCache()
+        for value in ("first", "second"):
+            globals_ = Environment()
+            globals_.define(symbols.intern("shared"), value)
+            assert self.nested(globals_).get(name("shared"), cache) == value
+
+    def test_missing_global_falls_back(self):
+        cache = GlobalCache()
+        globals_ = Environment()
+        globals_.define(symbols.intern("gone"), 1)
+        globals_.get(name("gone"), cache)
+        del globals_.values[symbols.intern("gone")]
+        with pytest.raises(RuntimeError, match="Undefined variable gone."):
+            globals_.get(name("gone"), cache)
+
+    def test_nodes_have_their_own_cache(self):
+        first, second = expr.Variable(name("a")), expr.Variable(name("a"))
+        assert first == second
+        assert first.cache is not second.cache
+
+    @pytest.mark.parametrize("engine", ["tree", "stackless", "flat"])
+    def test_programs(self, engine, capsys):
+        source = """
+        var x = "global";
+        var i = 0;
+        while (i < 3) {
+            { { print x; x = x + "!"; } }
+            var x = "local";
+            { print x; }
+            i = i + 1;
+        }
+        print x;
+        """
+        plox.run(source, engine=engine)
+        assert capsys.readouterr().out == (
+            "global\nlocal\nglobal!\nlocal\nglobal!!\nlocal\nglobal!!!\n"
+        )
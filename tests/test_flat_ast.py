@@ -0,0 +1,83 @@
+from plox import flat_ast, interpreter
+from plox.ast_printer import ast_printer, flat_ast_printer
+from plox.environment import Environment
+from plox.flat_ast import FlatAst, Kind
+from plox.parser import Parser
+from plox.scanner import Scanner
+
+SOURCE = """
+var a = 1;
+var b = "two";
+{
+    var c = a + 2 * (3 - 1);
+    print c;
+    print b + "!";
+}
+print -a;
+print !nil;
+"""
+
+
+def parse(source: str):
+    return Parser(Scanner(source).scan_tokens()).parse()
+
+
+class TestFlatten:
+    def test_round_trip(self):
+        statements = parse(SOURCE)
+        assert flat_ast.unflatten(flat_ast.flatten(statements)) == statements
+
+    def test_node_layout(self):
+        flat = flat_ast.flatten(parse("print 1 + 2;"))
+        assert list(flat.kinds) == [Kind.LITERAL, Kind.LITERAL, Kind.BINARY, Kind.PRINT]
+        assert flat.constants == [1.0, 2.0]
+        assert flat.token(2).lexeme == "+"
+        assert list(flat.roots) == [3]
+
+    def test_control_flow_round_trip(self):
+        statements = parse(
+            "for (var i = 0; i < 2; i = i + 1) if (i or nil) print i; else print 0;"
+        )
+        assert flat_ast.unflatten(flat_ast.flatten(statements)) == statements
+
+    def test_constants_are_deduplicated(self):
+        flat = flat_ast.flatten(parse("print 1 + 1 + 1;"))
+        assert flat.constants == [1.0]
+
+    def test_constants_keep_types_apart(self):
+        flat = flat_ast.flatten(parse("print true == 1;"))
+        assert flat.constants == [True, 1.0]
+
+    def test_serialization_round_trip(self):
+        statements = parse(SOURCE)
+        restored = FlatAst.from_bytes(flat_ast.flatten(statements).to_bytes())
+        assert flat_ast.unflatten(restored) == statements
+
+
+class TestFlatInterpreter:
+    def test_same_output_as_tree_walker(self, capsys):
+        statements = parse(SOURCE)
+
+        interpreter.environment = Environment()
+        interpreter.interpret(statements)
+        expected = capsys.readouterr().out
+
+        interpreter.environment = Environment()
+        flat_ast.interpret(flat_ast.flatten(statements))
+        assert capsys.readouterr().out == expected == "5\ntwo!\n-1\nTrue\n"
+
+    def test_block_scope_is_restored(self, capsys):
+        interpreter.environment = Environment()
+        flat_ast.interpret(flat_ast.flatten(parse("{ var inner = 1; }")))
+        assert interpreter.environment.values == {}
+
+
+class TestFlatAstPrinter:
+    def test_matches_tree_printer(self):
+        statements = parse("(1 + 2) * -x; y = 3;")
+        flat = flat_ast.flatten(statements)
+        for statement, root in zip(statements, flat.roots):
+            expression = flat.first[root]
+            assert flat_ast_printer(flat, expression) == ast_printer(
+                statement.expression
+            )
@@ -0,0 +1,100 @@
+import plox
+from plox import inference, interpreter
+from plox.environment import Environment
+from plox.hashcons import NodeTable
+from plox.inference import LoxType
+from plox.parser import Parser
+from plox.scanner import Scanner
+
+
+def parse(source: str, nodes: NodeTable):
+    return Parser(Scanner(source).scan_tokens(), nodes).parse()
+
+
+class TestHashConsing:
+    def test_identical_subtrees_are_shared(self):
+        nodes = NodeTable()
+        first, second = parse("print i + 1;\nprint i + 1;", nodes)
+        assert first.expression is second.expression
+
+    def test_different_subtrees_are_not_shared(self):
+        nodes = NodeTable()
+        first, second = parse("print i + 1; print i - 1;", nodes)
+        assert first.expression is not second.expression
+        assert first.expression.left is second.expression.left
+        assert first.expression.right is second.expression.right
+
+    def test_literals_keep_their_types(self):
+        nodes = NodeTable()
+        [statement] = parse("print 1 == true;", nodes)
+        assert statement.expression.left is not statement.expression.right
+
+    def test_positions_side_table(self):
+        nodes = NodeTable()
+        first, _, third = parse("print x;\nprint y;\nprint x;", nodes)
+        assert nodes.lines(first.expression) == [1, 3]
+        assert third.expression is first.expression
+
+    def test_positions_are_the_lines_of_the_operators(self):
+        nodes = NodeTable()
+        first, second = parse("print a\n+ b;\nprint a +\nb;", nodes)
+        assert first.expression is second.expression
+        assert nodes.lines(first.expression) == [2, 3]
+
+    def test_runtime_errors_are_reported_at_their_occurrence(self, capsys):
+        source = "var a = 1;\nvar b = 1;\nprint a / b;\nb = 0;\n{\n  print a / b;\n}"
+        nodes = NodeTable()
+        statements = parse(source, nodes)
+        assert statements[2].expression is statements[4].statements[0].expression
+        plox.had_runtime_error = False
+        interpreter.environment = Environment()
+        interpreter.nodes = nodes
+        try:
+            interpreter.interpret(statements)
+        finally:
+            interpreter.nodes = None
+        assert capsys.readouterr().err == "Division by zero.\n[line 6]\n"
+
+    def test_for_loop_errors_are_reported_at_their_occurrence(self, capsys):
+        source = "var b = 1;\nprint 1 / b;\nfor (b = 0;\n     1 / b;) {}"
+        nodes = NodeTable()
+        statements = parse(source, nodes)
+        plox.had_runtime_error = False
+        interpreter.environment = Environment()
+        interpreter.nodes = nodes
+        try:
+            interpreter.interpret(statements)
+        finally:
+            interpreter.nodes = None
+        assert capsys.readouterr() == ("1\n", "Division by zero.\n[line 4]\n")
+
+    def test_calls_with_the_same_arguments_are_shared(self):
+        nodes = NodeTable()
+        first, second, third = parse("f(a, 1); f(a, 1); f(a);", nodes)
+        assert first.expression is second.expression
+        assert third.expression is not first.expression
+
+    def test_same_result_as_plain_parse(self):
+        source = "var a = 1; { var b = a + a * 2; print (b + b) - (a + a); }"
+        assert parse(source, NodeTable()) == parse(source, None)
+
+    def test_executes_like_the_plain_tree(self, capsys):
+        interpreter.environment = Environment()
+        interpreter.interpret(parse("var a = 2; print a * a + a * a;", NodeTable()))
+        assert capsys.readouterr().out == "8\n"
+
+
+class TestSharedAnnotations:
+    def test_annotated_only_when_every_occurrence_is_proven(self):
+        nodes = NodeTable()
+        statements = parse('var a = 1; print a + a; a = "s"; print a + a;', nodes)
+        inference.infer(statements)
+        shared = statements[1].expression
+        assert shared is statements[3].expression
+        assert shared.operand_type is None
+
+    def test_annotated_when_all_agree(self):
+        nodes = NodeTable()
+        statements = parse("var a = 1; print a + a; a = 2; print a + a;", nodes)
+        inference.infer(statements)
+        assert statements[1].expression.operand_type is LoxType.NUMBER
@@ -0,0 +1,120 @@
+import random
+from unittest import mock
+
+import plox
+from plox.incremental import Document, Edit, Reparse
+from plox.parser import Parser
+from plox.scanner import Scanner
+
+SOURCE = """var a = 1;
+var b = "two
+lines";
+{ var c = a + 2; print c; }
+/* comment */ print a * b;
+print (1 + 2);
+"""
+
+
+def full_parse(source: str):
+    tokens = Scanner(source).scan_tokens()
+    return tokens, Parser(tokens).parse()
+
+
+def token_tuples(tokens):
+    return [(t.type, t.lexeme, t.literal, t.line) for t in tokens]
+
+
+class TestDocument:
+    def test_initial_parse(self):
+        document = Document(SOURCE)
+        tokens, statements = full_parse(SOURCE)
+        assert token_tuples(document.tokens) == token_tuples(tokens)
+        assert document.statements == statements
+
+    def test_edit_inside_one_declaration(self):
+        document = Document(SOURCE)
+        before = document.statements
+        start = SOURCE.index("a + 2")
+        result = document.apply(Edit(start, start + 1, "b"))
+
+        assert result.declarations_parsed == 1
+        assert result.tokens_scanned <= 3
+        after = document.statements
+        assert after[2] is not before[2]
+        assert all(after[i] is before[i] for i in (0, 1, 3, 4))
+        assert after == full_parse(document.source)[1]
+
+    def test_lines_after_the_edit_are_shifted(self):
+        document = Document(SOURCE)
+        last_print = document.statements[-1]
+        document.apply(Edit(0, 0, "\n\n"))
+        assert document.statements[-1] is last_print
+        assert document.tokens[-2].line == 8
+        assert token_tuples(document.tokens) == token_tuples(
+            Scanner(document.source).scan_tokens()
+        )
+
+    def test_edit_cost_does_not_grow_with_the_file(self):
+        def costs(copies: int) -> list[Reparse]:
+            source = SOURCE * copies
+            document = Document(source)
+            start = len(SOURCE) * (copies // 2) + SOURCE.index("a + 2")
+            document.apply(Edit(start, start + 1, "b"))  # the previous edit
+            edits = [
+                Edit(start, start + 1, "a"),
+                Edit(start, start, "\n"),
+                Edit(start, start + 1, ""),
+            ]
+            return [document.apply(edit) for edit in edits]
+
+        small = costs(10)
+        assert small == costs(1000)
+        assert all(cost.declarations_moved == 0 for cost in small)
+
+    def test_edit_opening_a_comment(self):
+        document = Document(SOURCE)
+        start = SOURCE.index("{")
+        document.apply(Edit(start, start, "/*"))
+        assert document.statements == full_parse(document.source)[1]
+
+    def test_digits_after_a_dot_join_the_number(self):
+        document = Document("print 1.;")
+        document.apply(Edit(8, 8, "5"))
+        assert document.statements == full_parse("print 1.5;")[1]
+
+    def test_parse_errors_are_kept_per_declaration(self, capsys):
+        plox.had_error = False
+        document = Document("print 1;\nprint ;\nprint 2 +;\n")
+        assert [str(error) for error in document.errors] == [
+            "[line 2] Error at ';': Expect expression.",
+            "[line 3] Error at ';': Expect expression.",
+        ]
+        assert capsys.readouterr().err == ""
+        assert not plox.had_error
+
+        document.apply(Edit(0, 0, "\n"))  # the errors move down a line
+        document.apply(Edit(16, 16, "2"))  # and the first is fixed
+        assert document.source == "\nprint 1;\nprint 2;\nprint 2 +;\n"
+        assert [str(error) for error in document.errors] == [
+            "[line 4] Error at ';': Expect expression."
+        ]
+        assert document.declarations[2].errors == document.errors
+        assert not plox.had_error
+
+    @mock.patch("plox.error")
+    def test_random_edits_match_a_full_reparse(self, error):
+        fragments = ["1", " ", "\n", ";", "x", '"', "/*", "*/", "{", "}", "print "]
+        rng = random.Random(0)
+        for _ in range(200):
+            document = Document(SOURCE)
+            source = SOURCE
+            for _ in range(4):
+                start = rng.randint(0, len(source))
+                end = min(len(source), start + rng.randint(0, 4))
+                text = "".join(rng.choices(fragments, k=rng.randint(0, 2)))
+                document.apply(Edit(start, end, text))
+                source = source[:start] + text + source[end:]
+
+                tokens, statements = full_parse(source)
+                assert token_tuples(document.tokens) == token_tuples(tokens)
+                assert document.statements == statements
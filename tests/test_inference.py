@@ -0,0 +1,85 @@
+import pytest
+
+import plox
+from plox import flat_ast, inference, interpreter
+from plox.environment import Environment
+from plox.inference import LoxType
+from plox.parser import Parser
+from plox.scanner import Scanner
+
+
+def infer(source: str):
+    return inference.infer(Parser(Scanner(source).scan_tokens()).parse())
+
+
+class TestInference:
+    def test_numeric_literals(self):
+        [statement] = infer("print 1 + 2 * 3;")
+        binary = statement.expression
+        assert binary.operand_type is LoxType.NUMBER
+        assert binary.right.operand_type is LoxType.NUMBER
+
+    def test_string_concatenation(self):
+        [statement] = infer('print "a" + "b";')
+        assert statement.expression.operand_type is LoxType.STRING
+
+    def test_mixed_plus_is_not_proven(self):
+        [statement] = infer('print "a" + 1;')
+        assert statement.expression.operand_type is None
+
+    def test_variables_carry_their_type(self):
+        _, statement = infer("var a = 1; print a - 1;")
+        assert statement.expression.operand_type is LoxType.NUMBER
+
+    def test_assignment_changes_the_type(self):
+        _, _, statement = infer('var a = 1; a = "s"; print -a;')
+        assert statement.expression.operand_type is None
+
+    def test_shadowing_is_scoped(self):
+        _, block, statement = infer(
+            'var a = 1; { var a = "s"; print a + a; } print a * 2;'
+        )
+        assert block.statements[1].expression.operand_type is LoxType.STRING
+        assert statement.expression.operand_type is LoxType.NUMBER
+
+    def test_unknown_globals_stay_unproven(self):
+        [statement] = infer("print x * 2;")
+        assert statement.expression.operand_type is None
+
+    def test_arithmetic_result_is_a_number(self):
+        _, statement = infer("var a = 3 * 2; print a + 1;")
+        assert statement.expression.operand_type is LoxType.NUMBER
+
+    def test_arithmetic_on_unknown_operand_may_be_a_vector(self):
+        _, statement = infer("var a = x * 2; print a + 1;")
+        assert statement.expression.operand_type is None
+
+    def test_comparisons_are_booleans(self):
+        _, statement = infer("var a = 1 < 2; print -a;")
+        assert statement.expression.operand_type is None
+
+
+class TestExecution:
+    def setup_method(self):
+        plox.had_error = plox.had_runtime_error = False
+        interpreter.environment = Environment()
+
+    @pytest.mark.parametrize("engine", ["tree", "stackless", "flat"])
+    def test_proven_operations(self, engine, capsys):
+        statements = infer(
+            'var a = 4; var s = "x"; print a / 2 - 1; print s + s; print -a;'
+        )
+        if engine == "flat":
+            flat_ast.interpret(flat_ast.flatten(statements))
+        else:
+            interpreter.interpret(statements)
+        assert capsys.readouterr().out == "1\nxx\n-4\n"
+
+    def test_unproven_errors_are_unchanged(self, capsys):
+        plox.run('var a = "s"; print a - 1;')
+        assert plox.had_runtime_error
+        assert capsys.readouterr().err == "Operands must be numbers.\n[line 1]\n"
+
+    def test_comparison_operators(self, capsys):
+        plox.run("print 1 <= 1; print 2 <= 1; print 1 == 1; print 1 != 1;")
+        assert capsys.readouterr().out == "True\nFalse\nTrue\nFalse\n"
@@ -0,0 +1,138 @@
+from unittest import mock
+
+import plox
+from plox import inference, interpreter, ir
+from plox.environment import Environment
+from plox.ir import Op
+from plox.parser import Parser
+from plox.scanner import Scanner
+
+SOURCE = """
+var a = 1 + 2;
+var b = "two";
+{
+    var c = a * 2;
+    var d = a * 2;
+    c = c + d;
+    print c;
+    print b + "!";
+}
+print -a;
+print !nil;
+"""
+
+
+def lower(source: str) -> ir.Program:
+    statements = Parser(Scanner(source).scan_tokens()).parse()
+    inference.infer(statements)
+    return ir.lower(statements)
+
+
+def ops(program: ir.Program) -> list[Op]:
+    return [instruction.op for instruction in program.code]
+
+
+class TestLower:
+    def test_locals_stay_in_registers(self):
+        program = lower("{ var a = 1; print a; }")
+        assert ops(program) == [Op.ENTER, Op.CONST, Op.COPY, Op.PRINT]
+
+    def test_scopes_are_entered_at_their_depth(self):
+        program = lower("{ { print 1; } { print 2; } }")
+        assert [i.value for i in program.code if i.op is Op.ENTER] == [1, 2, 2]
+
+    def test_globals_are_defined_and_stored(self):
+        program = lower("var a = 1; a = 2; print a;")
+        assert ops(program) == [
+            Op.CONST,
+            Op.COPY,
+            Op.DEFINE,
+            Op.CONST,
+            Op.COPY,
+            Op.STORE,
+            Op.PRINT,
+        ]
+        assert program.code[-1].a == program.code[-2].a
+
+    def test_outside_names_are_loaded_once(self):
+        program = lower("print x; print x;")
+        assert ops(program) == [Op.LOAD, Op.PRINT, Op.PRINT]
+
+    def test_each_register_is_written_once(self):
+        program = lower(SOURCE)
+        dests = [i.dest for i in program.code if i.dest != ir.NONE]
+        assert len(dests) == len(set(dests)) == program.registers
+
+
+class TestPasses:
+    def test_copy_propagation(self):
+        program = lower("{ var a = 1; var b = a; print b; }")
+        ir.propagate_copies(program)
+        assert ops(program) == [Op.ENTER, Op.CONST, Op.PRINT]
+        assert program.code[2].a == program.code[1].dest
+
+    def test_constant_propagation_across_statements(self):
+        program = lower("var a = 1 + 2; var b = a * 3; print b;")
+        ir.optimize(program)
+        assert [i.value for i in program.code if i.op is Op.CONST] == [3.0, 9.0]
+        assert Op.BINARY not in ops(program)
+
+    def test_constant_errors_are_left_for_run_time(self):
+        program = lower('print -"a"; print 1 / 0;')
+        ir.optimize(program)
+        assert ops(program).count(Op.UNARY) == ops(program).count(Op.BINARY) == 1
+
+    def test_common_subexpressions(self):
+        program = lower("print (x < 2) == (x < 2);")
+        ir.optimize(program)
+        assert ops(program) == [Op.LOAD, Op.CONST, Op.BINARY, Op.BINARY, Op.PRINT]
+
+    def test_arithmetic_that_could_make_vectors_is_not_merged(self):
+        program = lower("print -v == -v;")
+        ir.optimize(program)
+        assert ops(program).count(Op.UNARY) == 2
+
+    def test_negative_zero_is_not_merged_with_zero(self):
+        program = lower("print 0 * -1; print 0;")
+        ir.optimize(program)
+        values = [i.value for i in program.code if i.op is Op.CONST]
+        assert sorted(str(value) for value in values) == ["-0.0", "0"]
+
+    def test_dead_values_are_removed(self):
+        program = lower("{ var a = 1; var b = 2; print a; }")
+        ir.optimize(program)
+        assert ops(program) == [Op.ENTER, Op.CONST, Op.PRINT]
+
+
+class TestInterpret:
+    def setup_method(self):
+        plox.had_error = False
+        plox.had_runtime_error = False
+        interpreter.environment = Environment()
+        interpreter.statements_executed = 0
+
+    def test_same_output_as_tree_walker(self, capsys):
+        plox.run(SOURCE)
+        expected = capsys.readouterr().out
+        interpreter.environment = Environment()
+        plox.run(SOURCE, engine="ir", optimize=2)
+        assert capsys.readouterr().out == expected
+
+    def test_globals_reach_the_environment(self):
+        plox.run("var a = 1; { a = a + 1; }", engine="ir")
+        assert interpreter.environment.values == {
+            Scanner("a").scan_tokens()[0].symbol: 2.0
+        }
+
+    def test_statements_executed_matches_tree_walker(self):
+        program = lower(SOURCE)
+        ir.optimize(program)
+        ir.interpret(program)
+        assert interpreter.statements_executed == 10
+
+    def test_runtime_error(self, capsys):
+        with mock.patch("plox.error"):
+            plox.run('print 1; print -"a"; print 2;', engine="ir", optimize=2)
+        assert plox.had_runtime_error
+        assert capsys.readouterr().out == "1\n"
+        assert interpreter.statements_executed == 2
@@ -0,0 +1,111 @@
+from unittest import mock
+
+import plox
+from plox import interpreter, jit
+from plox.environment import Environment
+from plox.parser import Parser
+from plox.scanner import Scanner
+
+
+def parse(source: str):
+    return Parser(Scanner(source).scan_tokens()).parse()
+
+
+class TestJit:
+    def setup_method(self):
+        plox.had_error = False
+        plox.had_runtime_error = False
+        interpreter.environment = Environment()
+        jit.enable(threshold=2)
+
+    def teardown_method(self):
+        jit.disable()
+
+    def run(self, statements: list, times: int):
+        for _ in range(times):
+            interpreter.interpret(statements)
+
+    def test_hot_block_is_compiled(self, capsys):
+        setup, block = parse("var a = 1; { var b = a + 1; a = b; print a; }")
+        interpreter.interpret([setup])
+        self.run([block], 4)
+        assert block.trace.function is not None
+        assert capsys.readouterr().out == "2\n3\n4\n5\n"
+
+    def test_cold_block_is_not_compiled(self):
+        setup, block = parse("var a = 1; { a = a + 1; }")
+        interpreter.interpret([setup])
+        self.run([block], 1)
+        assert block.trace is None
+
+    def test_compiled_block_creates_no_environment(self):
+        setup, block = parse("var a = 1; { var b = a; a = b + 1; }")
+        interpreter.interpret([setup])
+        self.run([block], 2)
+        with mock.patch.object(interpreter, "Environment") as environment:
+            self.run([block], 1)
+        environment.assert_not_called()
+
+    def test_same_output_and_counts_as_interpreter(self, capsys):
+        source = """
+        var a = 0;
+        var s = "x";
+        { var b = a + 1; a = b * 2; { print -a; print (s = s + "y") + "!"; } }
+        """
+        jit.disable()
+        *setup, block = parse(source)
+        interpreter.interpret(setup)
+        interpreter.statements_executed = 0
+        self.run([block], 5)
+        expected = capsys.readouterr().out, interpreter.statements_executed
+
+        jit.enable(threshold=2)
+        interpreter.environment = Environment()
+        *setup, block = parse(source)
+        interpreter.interpret(setup)
+        interpreter.statements_executed = 0
+        self.run([block], 5)
+        assert block.trace.function is not None
+        assert (capsys.readouterr().out, interpreter.statements_executed) == expected
+
+    def test_guard_failure_falls_back(self, capsys):
+        setup, block = parse("var a = 1; { print a + a; }")
+        interpreter.interpret([setup])
+        self.run([block], 2)
+        interpreter.interpret(parse('a = "s";'))
+        self.run([block], 1)
+        assert block.trace.guard_failures == 1
+        assert capsys.readouterr().out == "2\n2\nss\n"
+
+    def test_shape_guard(self, capsys):
+        setup, block = parse("var a = 1; { print a; }")
+        interpreter.interpret([setup])
+        interpreter.environment = Environment(interpreter.environment)
+        self.run([block], 2)
+        interpreter.environment.define(setup.name.symbol, 2.0)
+        self.run([block], 1)
+        assert block.trace.guard_failures == 1
+        assert capsys.readouterr().out == "1\n1\n2\n"
+
+    def test_block_is_traced_again_after_failing_guards(self):
+        setup, block = parse("var a = 1; { print a; }")
+        interpreter.interpret([setup])
+        self.run([block], 2)
+        interpreter.interpret(parse('a = "s";'))
+        self.run([block], 4)
+        assert "__class__ is not str" in block.trace.source
+
+    def test_runtime_errors_match(self, capsys):
+        setup, block = parse('var a = 1; { a = a + 1; print -"x"; }')
+        interpreter.interpret([setup])
+        with mock.patch("plox.error"):
+            self.run([block], 3)
+        assert block.trace.function is not None
+        assert capsys.readouterr().err.count("Operand must be numbers.") == 3
+        assert interpreter.environment.get(setup.name) == 4.0
+
+    def test_undefined_variable_is_not_compiled(self, capsys):
+        [block] = parse("{ print missing; }")
+        self.run([block], 3)
+        assert block.trace.function is None
+        assert capsys.readouterr().err.count("Undefined variable missing.") == 3
@@ -0,0 +1,74 @@
+import io
+
+import plox
+from plox import budget, interpreter
+from plox.environment import Environment
+from plox.memprofile import MemoryProfiler
+from plox.stats import RunStats
+
+
+class TestMemoryProfiler:
+    def setup_method(self):
+        plox.had_error = plox.had_runtime_error = False
+        interpreter.environment = Environment()
+
+    def run(self, source: str, profiler: MemoryProfiler):
+        try:
+            plox.run(source, stats=RunStats(hooks=[profiler.hook]))
+        finally:
+            profiler.stop()
+
+    def test_samples_at_phase_boundaries(self, capsys):
+        profiler = MemoryProfiler()
+        self.run("var a = 1; print a; print a;", profiler)
+        # During execution after the first, second and fourth statement.
+        assert [sample.label for sample in profiler.samples] == [
+            "after scan",
+            "after parse",
+            "during execute",
+            "during execute",
+            "after execute",
+        ]
+
+    def test_counts_plox_objects(self, capsys):
+        profiler = MemoryProfiler()
+        self.run('var s = "x"; { var t = s + "y"; print t; }', profiler)
+        after_scan, after_parse, *during, _ = profiler.samples
+        assert after_scan.objects["Token"] >= 12
+        assert after_parse.objects["Block"] >= 1
+        assert after_parse.objects["Var"] >= 1
+        # The fourth statement, the print, runs with both strings defined.
+        last = during[-1]
+        assert last.label == "during execute"
+        assert last.objects["Environment"] >= 2
+        assert last.objects["str in environments"] >= 2
+
+    def test_report_lists_sites_and_objects(self, capsys):
+        profiler = MemoryProfiler(top=3)
+        self.run("print 1;", profiler)
+        out = io.StringIO()
+        profiler.report(out)
+        assert "== after parse" in out.getvalue()
+        assert "live objects by type:" in out.getvalue()
+
+    def test_periodic_sampling_stops_with_execution(self, capsys):
+        profiler = MemoryProfiler(interval=0.001)
+        self.run("var i = 0; while (i < 5000) i = i + 1;", profiler)
+        labels = [sample.label for sample in profiler.samples]
+        assert labels[-1] == "after execute"
+        assert labels.count("during execute") >= 1
+        assert budget._watcher is None
+
+    def test_samples_under_a_budget(self, capsys):
+        profiler = MemoryProfiler()
+        limits = budget.Budget(statements=100)
+        try:
+            plox.run(
+                "print 1; print 2;",
+                stats=RunStats(hooks=[profiler.hook]),
+                budget=limits,
+            )
+        finally:
+            profiler.stop()
+        assert capsys.readouterr().out == "1\n2\n"
+        assert [s.label for s in profiler.samples].count("during execute") == 2
@@ -0,0 +1,131 @@
+import os
+from unittest import mock
+
+import pytest
+
+import plox
+from plox import interpreter, modules, natives
+from plox.environment import Environment
+from plox.parser import Parser
+from plox.scanner import Scanner
+from plox.stmt import Import
+
+MATH = """
+print "loading math";
+var pi = 3;
+var tau = pi * 2;
+"""
+
+
+@pytest.fixture(autouse=True)
+def directory(tmp_path, monkeypatch):
+    plox.had_error = plox.had_runtime_error = False
+    interpreter.environment = natives.define(Environment())
+    monkeypatch.setattr(modules, "_modules", {})
+    monkeypatch.setattr(modules, "base_directory", tmp_path)
+    (tmp_path / "math.lox").write_text(MATH)
+    return tmp_path
+
+
+class TestParse:
+    def test_import(self):
+        [statement] = Parser(Scanner('import "a/b.lox";').scan_tokens()).parse()
+        assert statement == Import(statement.keyword, "a/b.lox")
+
+    def test_only_at_the_top_level(self):
+        with mock.patch("plox.error") as error:
+            Parser(Scanner('{ import "a.lox"; }').scan_tokens()).parse()
+        assert error.call_args.args[1] == "Can only import at the top level."
+
+
+class TestImport:
+    @pytest.mark.parametrize("engine", ["tree", "stackless", "flat", "ir"])
+    @pytest.mark.parametrize("optimize", [1, 2])
+    def test_module_runs_on_first_use(self, engine, optimize, capsys):
+        plox.run(
+            'import "math.lox"; print "before"; print tau; print pi;',
+            engine=engine,
+            optimize=optimize,
+        )
+        assert capsys.readouterr().out == "before\nloading math\n6\n3\n"
+
+    def test_unused_module_never_runs(self, capsys):
+        plox.run('import "math.lox"; print "done";')
+        assert capsys.readouterr().out == "done\n"
+
+    def test_module_runs_once(self, capsys):
+        plox.run('import "math.lox"; print pi;')
+        interpreter.environment = natives.define(Environment())
+        plox.run('import "math.lox"; import "math.lox"; print tau;')
+        assert capsys.readouterr().out == "loading math\n3\n6\n"
+
+    def test_assignment_loads_the_module(self, capsys):
+        plox.run('import "math.lox"; pi = 4; print pi; print tau;')
+        assert capsys.readouterr().out == "loading math\n4\n6\n"
+
+    def test_import_replaces_earlier_bindings(self, capsys):
+        plox.run('var pi = "pie"; import "math.lox"; print pi + 1;')
+        assert capsys.readouterr().out == "loading math\n4\n"
+
+    def test_later_declaration_wins(self, capsys):
+        plox.run('import "math.lox"; var pi = "pie"; print tau; print pi;')
+        assert capsys.readouterr().out == "loading math\n6\npie\n"
+
+    def test_types_are_forgotten(self, directory, capsys):
+        (directory / "text.lox").write_text('var a = "text";')
+        plox.run('var a = 1; import "text.lox"; print a - 1;', optimize=2)
+        assert capsys.readouterr().err == "Operands must be numbers.\n[line 1]\n"
+
+    def test_paths_are_relative_to_the_importer(self, directory, capsys):
+        (directory / "lib").mkdir()
+        (directory / "lib" / "circle.lox").write_text(
+            'import "../math.lox"; var area = pi * 2 * 2;'
+        )
+        plox.run('import "lib/circle.lox"; print area;')
+        assert capsys.readouterr().out == "loading math\n12\n"
+
+    def test_missing_module(self, capsys):
+        plox.run('import "missing.lox";')
+        assert "Cannot import" in capsys.readouterr().err
+        assert plox.had_runtime_error
+
+    def test_module_with_errors(self, directory, capsys):
+        (directory / "broken.lox").write_text("var = 1;")
+        plox.run('import "broken.lox";')
+        assert "it has errors" in capsys.readouterr().err
+
+    def test_circular_import(self, directory, capsys):
+        (directory / "a.lox").write_text('import "b.lox"; var a = b;')
+        (directory / "b.lox").write_text('import "a.lox"; var b = 1; print a;')
+        plox.run('import "a.lox"; print a;')
+        assert "Circular import" in capsys.readouterr().err
+
+
+class TestCache:
+    def run_fresh(self, source: str):
+        modules._modules.clear()
+        interpreter.environment = natives.define(Environment())
+        plox.run(source)
+
+    def test_cache_is_written_and_used(self, directory, capsys):
+        plox.run('import "math.lox"; print pi;')
+        assert (directory / "__loxcache__" / "math.lox.flat").exists()
+
+        with mock.patch("plox.prepare", wraps=plox.prepare) as prepare:
+            self.run_fresh('import "math.lox"; print tau;')
+        assert prepare.call_count == 1  # only the program itself
+        assert capsys.readouterr().out == "loading math\n3\nloading math\n6\n"
+
+    def test_touched_module_is_checked_by_hash(self, directory):
+        plox.run('import "math.lox";')
+        path = directory / "math.lox"
+        os.utime(path, ns=(0, 0))
+        with mock.patch("plox.prepare", wraps=plox.prepare) as prepare:
+            self.run_fresh('import "math.lox";')
+        assert prepare.call_count == 1
+
+    def test_changed_module_is_prepared_again(self, directory, capsys):
+        plox.run('import "math.lox"; print pi;')
+        (directory / "math.lox").write_text("var pi = 3.14159;")
+        self.run_fresh('import "math.lox"; print pi;')
+        assert capsys.readouterr().out == "loading math\n3\n3.14159\n"
@@ -0,0 +1,107 @@
+from unittest import mock
+
+import pytest
+
+import plox
+from plox import interpreter, jit, natives
+from plox.environment import Environment
+from plox.expr import Call
+from plox.parser import Parser
+from plox.repl import Session
+from plox.scanner import Scanner
+
+
+def parse(source: str):
+    return Parser(Scanner(source).scan_tokens()).parse()
+
+
+class TestParse:
+    def test_call_arguments(self):
+        [statement] = parse("f(1, g(2))(3);")
+        outer = statement.expression
+        assert isinstance(outer, Call) and len(outer.arguments) == 1
+        inner = outer.callee
+        assert isinstance(inner, Call) and len(inner.arguments) == 2
+        assert isinstance(inner.arguments[1], Call)
+
+    def test_too_many_arguments(self):
+        arguments = ", ".join("1" for _ in range(256))
+        with mock.patch("plox.error") as error:
+            parse(f"f({arguments});")
+        error.assert_called_once()
+        assert error.call_args.args[1] == "Can't have more than 255 arguments."
+
+
+class TestResolve:
+    def test_call_is_bound_to_native(self):
+        [statement] = natives.resolve(parse("print clock();"))
+        assert (
+            statement.expression.native
+            is natives.NATIVES[statement.expression.callee.name.symbol]
+        )
+
+    def test_rebound_name_is_not_bound(self):
+        statements = natives.resolve(parse("{ var clock = 1; } print clock();"))
+        assert statements[-1].expression.native is None
+
+    def test_wrong_arity_is_not_bound(self):
+        [statement] = natives.resolve(parse("print clock(1);"))
+        assert statement.expression.native is None
+
+
+class TestCall:
+    def setup_method(self):
+        plox.had_error = False
+        plox.had_runtime_error = False
+        interpreter.environment = natives.define(Environment())
+
+    @pytest.mark.parametrize("engine", ["tree", "stackless", "flat", "ir"])
+    @pytest.mark.parametrize("optimize", [0, 1, 2])
+    def test_clock(self, capsys, engine, optimize):
+        source = "var a = clock(); var b = clock(); print b >= a; print clock;"
+        plox.run(source, engine=engine, optimize=optimize)
+        assert capsys.readouterr().out == "True\n<native fn>\n"
+
+    @pytest.mark.parametrize("engine", ["tree", "stackless", "flat", "ir"])
+    @pytest.mark.parametrize(
+        "source, message",
+        [
+            ("clock(1);", "Expected 0 arguments but got 1."),
+            ('"clock"();', "Can only call functions and classes."),
+            ("nil();", "Can only call functions and classes."),
+        ],
+    )
+    def test_runtime_errors(self, capsys, engine, source, message):
+        with mock.patch("plox.error"):
+            plox.run(source, engine=engine)
+        assert plox.had_runtime_error
+        assert capsys.readouterr().err == f"{message}\n[line 1]\n"
+
+    def test_shadowed_native_is_checked_at_run_time(self, capsys):
+        plox.run("var clock = 1;")
+        with mock.patch("plox.error"):
+            plox.run("clock();")
+        assert capsys.readouterr().err.startswith("Can only call")
+
+    def test_bound_call_skips_checks(self):
+        with mock.patch.object(interpreter, "call_value") as call_value:
+            plox.run("clock();")
+            call_value.assert_not_called()
+            plox.run("clock();", optimize=0)
+            call_value.assert_called_once()
+
+    def test_jit_skips_call_checks(self):
+        *setup, block = parse("var t = 0; { t = clock(); }")
+        natives.resolve(setup + [block])
+        interpreter.interpret(setup)
+        jit.enable(threshold=1)
+        try:
+            interpreter.interpret([block])
+        finally:
+            jit.disable()
+        assert "_native(" in block.trace.source
+        assert isinstance(interpreter.environment.get(setup[0].name), float)
+
+    def test_repl_defines_natives(self, capsys):
+        Session().evaluate("clock() > 0;")
+        assert capsys.readouterr().out == "True\n"
@@ -0,0 +1,94 @@
+import pytest
+
+import plox
+from plox import interpreter, jit, natives, numbers, symbols
+from plox.environment import Environment
+from plox.scanner import Scanner
+
+PROGRAM = """
+var i = 0;
+var total = 0;
+while (i < 100) {
+    total = total + i * i - 1;
+    i = i + 1;
+}
+print total;
+print -0;
+print 0 * -1;
+print 9007199254740992 + 1;
+print 94906267 * 94906267;
+print 0 / -5;
+"""
+
+
+class TestNumbers:
+    def setup_method(self):
+        plox.had_error = plox.had_runtime_error = False
+        interpreter.environment = natives.define(Environment())
+
+    def value(self, name: str):
+        return interpreter.environment.values[symbols.intern(name)]
+
+    @pytest.mark.parametrize(
+        "text, value",
+        [("12", 12), ("12.0", 12), ("12.5", 12.5), ("1" * 20, float("1" * 20))],
+    )
+    def test_literals(self, text, value):
+        [token, _] = Scanner(text).scan_tokens()
+        assert token.literal == value
+        assert token.literal.__class__ is value.__class__
+
+    def test_results_leave_the_exact_range_as_doubles(self):
+        assert numbers.add(numbers.EXACT, 1) == float(numbers.EXACT)
+        assert numbers.add(numbers.EXACT, 1).__class__ is float
+        assert numbers.subtract(-numbers.EXACT, 3) == -float(numbers.EXACT) - 3.0
+        big = 94906267
+        assert numbers.multiply(big, big) == float(big) * float(big)
+
+    def test_negative_zero(self):
+        for value in (numbers.negate(0), numbers.multiply(0, -2)):
+            assert value.__class__ is float and str(value) == "-0.0"
+        assert numbers.multiply(0, 2).__class__ is int
+
+    @pytest.mark.parametrize("engine", ["tree", "stackless", "flat", "ir"])
+    @pytest.mark.parametrize("optimize", [0, 2])
+    def test_engines_keep_counters_exact(self, engine, optimize, capsys):
+        plox.run(PROGRAM, engine=engine, optimize=optimize)
+        assert capsys.readouterr().out == (
+            "328250\n-0\n-0\n9.0072e+15\n9.0072e+15\n-0\n"
+        )
+        assert self.value("i").__class__ is int
+
+    def test_jit_keeps_counters_exact(self, capsys):
+        jit.enable(threshold=2)
+        try:
+            plox.run(PROGRAM, optimize=2)
+        finally:
+            jit.disable()
+        assert capsys.readouterr().out.startswith("328250\n")
+        assert self.value("total").__class__ is int
+
+    def test_ints_and_doubles_are_indistinguishable(self, capsys):
+        plox.run(
+            "print 1 == 1.0; print 2 / 2; print 3 - 0.5; print size(vector(2, 1.5));"
+            "print at(vector(3, 1) * 2, 2 - 0.0);"
+        )
+        assert capsys.readouterr().out == "True\n1\n2.5\n2\n2\n"
+
+    @pytest.mark.parametrize("engine", ["tree", "stackless", "flat", "ir"])
+    @pytest.mark.parametrize("optimize", [0, 2])
+    def test_division_by_zero_is_a_runtime_error(self, engine, optimize, capsys):
+        plox.run("var a = 0; print 1 / a;", engine=engine, optimize=optimize)
+        assert plox.had_runtime_error
+        assert capsys.readouterr().err == "Division by zero.\n[line 1]\n"
+
+    def test_jit_division_by_zero_is_a_runtime_error(self, capsys):
+        jit.enable(threshold=2)
+        try:
+            plox.run(
+                "var t = 0; for (var i = 0; i < 5; i = i + 1) { t = 1 / (3 - i); }"
+            )
+        finally:
+            jit.disable()
+        assert plox.had_runtime_error
+        assert capsys.readouterr().err == "Division by zero.\n[line 1]\n"
@@ -0,0 +1,102 @@
+import pytest
+
+import plox
+from plox import interpreter
+from plox.repl import Session, needs_more_input
+
+
+@pytest.fixture
+def session():
+    plox.had_error = plox.had_runtime_error = False
+    return Session()
+
+
+class TestNeedsMoreInput:
+    @pytest.mark.parametrize(
+        "source",
+        ["{", "print (1 +", '"unterminated', "/* open", "{ // }"],
+    )
+    def test_incomplete(self, source):
+        assert needs_more_input(source)
+
+    @pytest.mark.parametrize(
+        "source",
+        ["print 1;", "{ print 1; }", '"{"', "/* { */", "// {"],
+    )
+    def test_complete(self, source):
+        assert not needs_more_input(source)
+
+
+class TestSession:
+    def test_globals_persist_between_entries(self, session, capsys):
+        session.feed("var a = 1;")
+        session.feed("a + 1;")
+        assert capsys.readouterr().out == "2\n"
+
+    def test_multi_line_entry(self, session, capsys):
+        assert session.feed("{") is False
+        assert session.prompt == "... "
+        assert session.feed("  print 1;") is False
+        assert session.feed("}") is True
+        assert session.prompt == "> "
+        assert capsys.readouterr().out == "1\n"
+
+    def test_errors_reset_between_entries(self, session, capsys):
+        session.feed("print ;")
+        assert plox.had_error
+        session.feed("print 2;")
+        assert not plox.had_error
+        assert capsys.readouterr().out == "2\n"
+
+    def test_runtime_error_keeps_the_session(self, session, capsys):
+        session.feed("var a = 1;")
+        session.feed("{ var b = 1; print -nil; }")
+        session.feed("print a;")
+        captured = capsys.readouterr()
+        assert "Operand must be numbers." in captured.err
+        assert captured.out == "1\n"
+
+    def test_stats_add_up_over_entries(self, session, capsys):
+        entries = ["var a = 1;", "{ print a + 2; }"]
+        separately = [plox.run(entry, print_expressions=True) for entry in entries]
+        for entry in entries:
+            session.feed(entry)
+        session.feed(entries[0])  # cached, so neither scanned nor parsed again
+        assert session.stats.tokens == sum(stats.tokens for stats in separately)
+        assert session.stats.nodes == sum(stats.nodes for stats in separately)
+        assert session.stats.statements_executed == 4
+
+    def test_history_entries_are_cached(self, session, capsys):
+        session.feed("var a = 1;")
+        session.feed("a = a + 1;")
+        cached = session.cache["a = a + 1;"]
+        session.feed("a = a + 1;")
+        assert session.cache["a = a + 1;"] is cached
+        assert capsys.readouterr().out == "2\n3\n"
+
+    def test_time_command(self, session, capsys):
+        session.feed(":time")
+        session.feed("print 1;")
+        session.feed("print 1;")
+        lines = capsys.readouterr().out.splitlines()
+        assert lines[0] == "timing on"
+        assert lines[2].endswith(" ms]")
+        assert lines[4].endswith(" ms, cached]")
+
+    def test_session_has_its_own_globals(self, session, capsys):
+        previous = interpreter.environment
+        session.feed("var a = 1;")
+        assert interpreter.environment is previous
+        assert session.environment.values
+
+    def test_run_reads_until_eof(self, session, capsys):
+        lines = iter(["var a = 3;", "a;"])
+
+        def read(prompt):
+            try:
+                return next(lines)
+            except StopIteration:
+                raise EOFError
+
+        session.run(read)
+        assert capsys.readouterr().out == "3\nExiting...\n"
@@ -0,0 +1,51 @@
+from unittest import mock
+
+from plox import flat_ast, interpreter, scopes
+from plox.environment import Environment
+from plox.parser import Parser
+from plox.scanner import Scanner
+
+
+def analyze(source: str):
+    return scopes.analyze(Parser(Scanner(source).scan_tokens()).parse())
+
+
+class TestAnalyze:
+    def test_block_without_declarations_needs_no_scope(self):
+        [block] = analyze("{ print 1; }")
+        assert not block.needs_scope
+
+    def test_block_with_declaration_needs_scope(self):
+        [block] = analyze("{ var a = 1; print a; }")
+        assert block.needs_scope
+
+    def test_nested_blocks_are_marked_independently(self):
+        [outer] = analyze("{ { var a = 1; } { print 2; } }")
+        assert not outer.needs_scope
+        assert outer.statements[0].needs_scope
+        assert not outer.statements[1].needs_scope
+
+
+class TestExecution:
+    def setup_method(self):
+        interpreter.environment = Environment()
+
+    def test_no_environment_for_declaration_free_block(self, capsys):
+        statements = analyze("var a = 1; { { a = a + 1; } print a; }")
+        with mock.patch.object(interpreter, "Environment") as environment:
+            interpreter.interpret(statements)
+        environment.assert_not_called()
+        assert capsys.readouterr().out == "2\n"
+
+    def test_declarations_stay_local(self, capsys):
+        statements = analyze("var a = 1; { var a = 2; print a; } print a;")
+        interpreter.interpret(statements)
+        assert capsys.readouterr().out == "2\n1\n"
+
+    def test_flat_ast_keeps_the_marking(self, capsys):
+        statements = analyze("var a = 1; { a = 3; } print a;")
+        flat = flat_ast.flatten(statements)
+        assert flat_ast.unflatten(flat)[1].needs_scope is False
+
+        flat_ast.interpret(flat)
+        assert capsys.readouterr().out == "3\n"
@@ -0,0 +1,97 @@
+from unittest import mock
+
+import pytest
+
+import plox
+from plox import interpreter, natives, snapshot, symbols
+from plox.environment import Environment
+from plox.scanner import Token, TokenType
+
+PRELUDE = """
+var table = vector(3, 1) * 2;
+var name = "lox";
+var flag = true;
+var nothing;
+var now = clock;
+var unused = 42;
+"""
+
+
+def value(environment: Environment, name: str):
+    return environment.get(Token(TokenType.IDENTIFIER, name, None, 1))
+
+
+class TestSnapshot:
+    def setup_method(self):
+        plox.had_error = plox.had_runtime_error = False
+        interpreter.environment = natives.define(Environment())
+
+    def test_round_trip(self):
+        plox.run(PRELUDE)
+        data = snapshot.take(PRELUDE, interpreter.environment)
+
+        environment = snapshot.restore(data, PRELUDE, Environment())
+        assert list(value(environment, "table").data) == [2.0, 2.0, 2.0]
+        assert value(environment, "name") == "lox"
+        assert value(environment, "flag") is True
+        assert value(environment, "nothing") is None
+        assert value(environment, "now") is natives.NATIVES[symbols.intern("clock")]
+
+    def test_other_source_is_rejected(self):
+        data = snapshot.take(PRELUDE, Environment())
+        with pytest.raises(ValueError, match="not taken after this prelude"):
+            snapshot.restore(data, PRELUDE + " ", Environment())
+
+    def test_garbage_is_rejected(self):
+        with pytest.raises(ValueError, match="Not a snapshot"):
+            snapshot.restore(b"\x00garbage", PRELUDE, Environment())
+
+    def test_unsupported_value(self):
+        environment = Environment()
+        environment.define(symbols.intern("odd"), object())
+        with pytest.raises(ValueError, match="Cannot snapshot the value of odd"):
+            snapshot.take(PRELUDE, environment)
+
+
+class TestRunPrelude:
+    def setup_method(self):
+        plox.had_error = plox.had_runtime_error = False
+        interpreter.environment = natives.define(Environment())
+
+    @pytest.fixture
+    def prelude(self, tmp_path):
+        path = tmp_path / "prelude.lox"
+        path.write_text(PRELUDE)
+        return path
+
+    def test_snapshot_is_taken_then_restored(self, prelude, tmp_path, capsys):
+        snapshot_path = tmp_path / "prelude.snapshot"
+        assert plox.run_prelude(prelude, snapshot_path, optimize=2)
+        assert snapshot_path.exists()
+
+        interpreter.environment = natives.define(Environment())
+        with mock.patch("plox.prepare") as prepare:
+            assert plox.run_prelude(prelude, snapshot_path, optimize=2)
+        prepare.assert_not_called()
+
+        plox.run("print sum(table); print name; print unused;", optimize=2)
+        assert capsys.readouterr().out == "6\nlox\n42\n"
+
+    def test_stale_snapshot_is_replaced(self, prelude, tmp_path):
+        snapshot_path = tmp_path / "prelude.snapshot"
+        plox.run_prelude(prelude, snapshot_path)
+        prelude.write_text(PRELUDE + "var extra = 1;")
+
+        interpreter.environment = natives.define(Environment())
+        assert plox.run_prelude(prelude, snapshot_path)
+        assert value(interpreter.environment, "extra") == 1.0
+        data = snapshot_path.read_bytes()
+        snapshot.restore(data, prelude.read_text(), Environment())
+
+    def test_failing_prelude(self, tmp_path, capsys):
+        path = tmp_path / "prelude.lox"
+        path.write_text('var a = -"a";')
+        snapshot_path = tmp_path / "prelude.snapshot"
+        assert not plox.run_prelude(path, snapshot_path)
+        assert not snapshot_path.exists()
+        assert "Operand must be numbers." in capsys.readouterr().err
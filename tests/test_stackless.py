@@ -0,0 +1,93 @@
+import io
+import sys
+
+import pytest
+
+import plox
+from plox import dump, interpreter, natives, stackless
+from plox.environment import Environment
+from plox.parser import Parser
+from plox.scanner import Scanner
+
+SOURCE = """
+var a = 1;
+var s = "x";
+for (var i = 0; i < 5; i = i + 1) {
+    var b = i * 2;
+    if (b > 4 and a < 100) a = a * b; else { a = a + 1; s = s + "y"; }
+    while (false) print "never";
+    print nil or a;
+}
+print -(a / 3) == sum(vector(2, a)) or s;
+print s;
+"""
+
+
+def parse(source: str):
+    return Parser(Scanner(source).scan_tokens()).parse()
+
+
+def deep_grouping(depth: int) -> str:
+    """``((...(1 + 1)...) + 1)`` with ``depth`` groupings."""
+    return "(" * depth + "1" + " + 1)" * depth
+
+
+def deep_blocks(depth: int) -> str:
+    """``{ var x = x + 1; { ... print x; } }`` with ``depth`` blocks."""
+    return "{ var x = x + 1; " * depth + "print x;" + "}" * depth
+
+
+# Programs nested well past the recursion limit, and what they print.
+DEPTH = sys.getrecursionlimit() * 5
+DEEP_PROGRAMS = {
+    "grouping": (f"print {deep_grouping(DEPTH)};", f"{DEPTH + 1}\n"),
+    "blocks": (f"var x = 0; {deep_blocks(DEPTH)}", f"{DEPTH}\n"),
+    "unary": ("print " + "-" * (DEPTH + 1) + "1;", "-1\n"),
+    "calls": ("print " + "at(vector(1, " * DEPTH + "1" + "), 0)" * DEPTH + ";", "1\n"),
+    "if": ("if (true) " * DEPTH + "print 1;", "1\n"),
+    "assign": ("var a; " + "a = " * DEPTH + "1; print a;", "1\n"),
+}
+
+
+class TestStackless:
+    def setup_method(self):
+        plox.had_error = plox.had_runtime_error = False
+        interpreter.environment = natives.define(Environment())
+        interpreter.statements_executed = 0
+
+    @pytest.mark.parametrize("optimize", [0, 1, 2])
+    def test_matches_the_tree_interpreter(self, optimize, capsys):
+        plox.run(SOURCE, engine="tree", optimize=optimize)
+        expected, executed = capsys.readouterr(), interpreter.statements_executed
+
+        self.setup_method()
+        plox.run(SOURCE, engine="stackless", optimize=optimize)
+        assert capsys.readouterr() == expected
+        assert interpreter.statements_executed == executed
+
+    @pytest.mark.parametrize("optimize", [0, 1, 2])
+    @pytest.mark.parametrize("program", DEEP_PROGRAMS)
+    def test_deep_program(self, program, optimize, capsys):
+        source, expected = DEEP_PROGRAMS[program]
+        plox.run(source, engine="stackless", optimize=optimize)
+        assert capsys.readouterr() == (expected, "")
+        assert not plox.had_error and not plox.had_runtime_error
+        assert interpreter.environment.enclosing is None
+
+    @pytest.mark.parametrize("optimize", [1, 2])
+    def test_deep_tree_read_from_json(self, optimize, capsys):
+        written = io.StringIO()
+        dump.write_json(parse(f"var x = 0; {deep_blocks(DEPTH)}"), written)
+        statements = dump.read_json(io.StringIO(written.getvalue()))
+        stackless.interpret(plox.analyze(statements, optimize=optimize))
+        assert capsys.readouterr().out == f"{DEPTH}\n"
+
+    def test_runtime_error_restores_the_environment(self, capsys):
+        globals_ = interpreter.environment
+        stackless.interpret(parse("{ var a = 1; { print -a; print -nil; } }"))
+        assert capsys.readouterr().err == "Operand must be numbers.\n[line 1]\n"
+        assert interpreter.environment is globals_
+
+    def test_evaluate(self):
+        [statement] = parse(f"{deep_grouping(DEPTH)};")
+        assert stackless.evaluate(statement.expression) == DEPTH + 1
@@ -0,0 +1,74 @@
+import json
+
+import plox
+from plox import interpreter
+from plox.environment import Environment
+from plox.stats import RunStats
+
+SOURCE = "var a = 1; { var b = 2; { print a + b; } }"
+
+
+class TestRunStats:
+    def setup_method(self):
+        plox.had_error = plox.had_runtime_error = False
+        interpreter.environment = Environment()
+
+    def test_run_returns_counters(self, capsys):
+        stats = plox.run(SOURCE)
+        assert capsys.readouterr().out == "3\n"
+        assert stats.tokens == 20
+        assert stats.nodes == 10
+        assert stats.statements_executed == 5
+        assert stats.environments_created == 1
+        assert stats.max_environment_depth == 1
+
+    def test_nodes_are_counted_without_passes(self, capsys):
+        assert plox.run(SOURCE, optimize=0).nodes == 10
+
+    def test_phases_are_timed(self, capsys):
+        stats = plox.run(SOURCE)
+        assert list(stats.phases) == ["scan", "parse", "passes", "execute"]
+        assert all(timing.wall >= 0 for timing in stats.phases.values())
+
+    def test_flat_engine_counts_statements(self, capsys):
+        stats = plox.run(SOURCE, engine="flat")
+        assert stats.statements_executed == 5
+
+    def test_hook_receives_phase_events(self, capsys):
+        events = []
+        stats = RunStats(hooks=[lambda event: events.append((event.phase, event.kind))])
+        plox.run(SOURCE, stats=stats)
+        assert events == [
+            ("scan", "start"),
+            ("scan", "end"),
+            ("parse", "start"),
+            ("parse", "end"),
+            ("passes", "start"),
+            ("passes", "end"),
+            ("execute", "start"),
+            ("execute", "end"),
+        ]
+
+    def test_json_record(self, capsys):
+        record = json.loads(plox.run(SOURCE).to_json())
+        assert set(record) == {
+            "phases",
+            "tokens",
+            "nodes",
+            "statements_executed",
+            "environments_created",
+            "max_environment_depth",
+            "frozen_objects",
+            "peak_rss",
+        }
+        assert set(record["phases"]["scan"]) == {
+            "wall",
+            "cpu",
+            "collections",
+            "gc_seconds",
+        }
+
+    def test_parse_errors_skip_execution(self, capsys):
+        stats = plox.run("print ;")
+        assert "execute" not in stats.phases
+        assert plox.had_error
@@ -0,0 +1,41 @@
+import pytest
+
+from plox import symbols
+from plox.environment import Environment
+from plox.scanner import Scanner, Token, TokenType
+
+
+class TestSymbols:
+    def test_identifiers_share_one_id(self):
+        first, _, second, _ = Scanner("name + name").scan_tokens()
+        assert first.symbol == second.symbol == symbols.intern("name")
+
+    def test_lexemes_are_deduplicated(self):
+        first, _, second, _ = Scanner("name + name").scan_tokens()
+        assert first.lexeme is second.lexeme
+
+    def test_name_of_symbol(self):
+        assert symbols.name(symbols.intern("other")) == "other"
+
+    def test_keywords_have_no_symbol(self):
+        [keyword, _] = Scanner("var").scan_tokens()
+        assert keyword.symbol is None
+
+    def test_tokens_built_by_hand_are_interned(self):
+        token = Token(TokenType.IDENTIFIER, "manual", None, 1)
+        assert token.symbol == symbols.intern("manual")
+
+
+class TestEnvironment:
+    def test_values_are_keyed_by_symbol(self):
+        [name, _] = Scanner("x").scan_tokens()
+        environment = Environment()
+        environment.define(name.symbol, 1.0)
+        assert environment.values == {symbols.intern("x"): 1.0}
+        assert Environment(environment).get(name) == 1.0
+
+    def test_undefined_variable_reports_the_name(self):
+        [name, _] = Scanner("missing").scan_tokens()
+        with pytest.raises(RuntimeError) as error:
+            Environment().get(name)
+        assert error.value.args == (name, "Undefined variable missing.")
@@ -0,0 +1,99 @@
+from unittest import mock
+
+import pytest
+
+import plox
+from plox import interpreter, jit, natives, symbols
+from plox.environment import Environment
+from plox.vector import Vector
+
+
+def run(source: str, **options):
+    plox.run(source, **options)
+
+
+class TestVector:
+    def setup_method(self):
+        plox.had_error = False
+        plox.had_runtime_error = False
+        interpreter.environment = natives.define(Environment())
+
+    def value(self, name: str):
+        return interpreter.environment.values[symbols.intern(name)]
+
+    @pytest.mark.parametrize("engine", ["tree", "stackless", "flat", "ir"])
+    @pytest.mark.parametrize("optimize", [0, 1, 2])
+    def test_elementwise_arithmetic(self, capsys, engine, optimize):
+        source = """
+        var v = vector(3, 2);
+        var w = v * v - 1;
+        print w;
+        print 1 / w;
+        print -(w + v);
+        print sum(w) + dot(v, w);
+        """
+        run(source, engine=engine, optimize=optimize)
+        assert capsys.readouterr().out == (
+            "[3, 3, 3]\n[0.333333, 0.333333, 0.333333]\n[-5, -5, -5]\n27\n"
+        )
+
+    @pytest.mark.parametrize("engine", ["tree", "stackless", "flat", "ir"])
+    def test_equality_is_identity(self, capsys, engine):
+        source = (
+            "var v = vector(2, 1); print v == v; print v == vector(2, 1); print v != 1;"
+        )
+        run(source, engine=engine, optimize=2)
+        assert capsys.readouterr().out == "True\nFalse\nTrue\n"
+
+    def test_jit_keeps_vector_results_generic(self, capsys):
+        source = "var t = 0; for (var i = 0; i < 3; i = i + 1) { t = sum(vector(2, i) * 2 + 1); }"
+        run(source)
+        expected = self.value("t")
+        jit.enable(threshold=1)
+        try:
+            run(source)
+        finally:
+            jit.disable()
+        assert self.value("t") == expected == 10
+
+    def test_reductions(self, capsys):
+        interpreter.environment.define(symbols.intern("v"), Vector.of([3.0, -1.0, 2.0]))
+        run("print sum(v); print min(v); print max(v); print size(v); print at(v, 2);")
+        assert capsys.readouterr().out == "4\n-1\n3\n3\n2\n"
+
+    def test_slices_share_the_buffer(self):
+        run("var v = vector(10, 1); var s = slice(v, 2, 5);")
+        whole, part = self.value("v"), self.value("s")
+        assert len(part) == 3
+        assert part.data.obj is whole.data.obj
+
+    def test_save_and_load(self, tmp_path, capsys):
+        path = str(tmp_path / "v.bin")
+        run(f'save(vector(4, 1.5), "{path}"); print load("{path}");')
+        assert capsys.readouterr().out == "[1.5, 1.5, 1.5, 1.5]\n"
+        assert (tmp_path / "v.bin").stat().st_size == 4 * 8
+
+    def test_long_vectors_print_a_preview(self, capsys):
+        run("print vector(20, 0);")
+        assert capsys.readouterr().out == "[0, 0, 0, 0, 0, 0, 0, 0, ...]\n"
+
+    @pytest.mark.parametrize(
+        "source, message",
+        [
+            ("vector(2, 1) + vector(3, 1);", "Vectors must have the same length."),
+            ('vector(2, 1) + "s";', "Operands must be numbers or vectors."),
+            ("vector(2, 1) < 1;", "Operands must be numbers."),
+            ("vector(2, 1) / 0;", "Division by zero."),
+            ("at(vector(2, 1), 2);", "Index out of range."),
+            ("slice(vector(2, 1), 1, 0);", "Slice out of range."),
+            ("vector(1.5, 0);", "Size must be an integer."),
+            ("min(vector(0, 0));", "Vector is empty."),
+            ("sum(1);", "Argument must be a vector."),
+            ('load("/nonexistent/v.bin");', "Cannot load vector"),
+        ],
+    )
+    def test_errors(self, capsys, source, message):
+        with mock.patch("plox.error"):
+            run(source)
+        assert plox.had_runtime_error
+        assert capsys.readouterr().err.startswith(message)